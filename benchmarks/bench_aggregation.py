@@ -0,0 +1,64 @@
+"""Time the plain-Python and vectorised BenchmarkIndex.compare paths.
+
+Run from the repository root:
+
+    python benchmarks/bench_aggregation.py --sizes 8,64,512,100000
+
+That both paths agree is checked by tests/test_aggregation.py. Timings show
+where the vectorised compare starts to pay off, which is what
+BENCHMARK_VECTOR_THRESHOLD should be set to.
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+from benchmarking import benchmark_index
+
+
+def comparison_inputs(count, seed):
+    """Random rows over every industry/metric ID plus unknown (-1) IDs and missing values."""
+    rng = random.Random(seed)
+    index = benchmark_index()
+    rows = []
+    for _ in range(count):
+        industry_id = rng.randrange(-1, len(index.industries))
+        metric_id = rng.randrange(-1, len(index.metrics))
+        pair = index._pairs.get((industry_id, metric_id))
+        value = float('nan') if rng.random() < 0.02 else round((pair[0] if pair else 1.0) * rng.uniform(0.5, 1.5), 2)
+        if pair and rng.random() < 0.05:
+            value = pair[0]
+        rows.append((industry_id, metric_id, value))
+    return [list(column) for column in zip(*rows)]
+
+
+def best_of(repeat, func):
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - started)
+    return min(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', default='8,32,64,128,512,5000,100000')
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    index = benchmark_index()
+    print(f"{'rows':>8}  {'python':>10}  {'numpy':>10}  {'faster':>7}")
+    for size in (int(size) for size in args.sizes.split(',')):
+        industry_ids, metric_ids, values = comparison_inputs(size, args.seed)
+        rows = best_of(args.repeat, lambda: index.compare(industry_ids, metric_ids, values, vectorised=False))
+        vector = best_of(args.repeat, lambda: index.compare(industry_ids, metric_ids, values, vectorised=True))
+        print(f"{size:>8}  {rows * 1e3:>8.3f}ms  {vector * 1e3:>8.3f}ms  {'python' if rows < vector else 'numpy':>7}")
+
+
+if __name__ == '__main__':
+    main()
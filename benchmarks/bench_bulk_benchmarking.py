@@ -0,0 +1,43 @@
+"""Measure `bulk_benchmark` throughput on a synthetic multi-site, multi-period table.
+
+Run from the repository root:
+
+    python benchmarks/bench_bulk_benchmarking.py --sites 500 --periods 36
+
+The table is in wide form (one column per metric); throughput is reported in
+compared metric rows per second.
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+from benchmarking import bulk_benchmark
+from synthetic import synthetic_benchmark_table
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sites', type=int, default=500)
+    parser.add_argument('--periods', type=int, default=36)
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    table = synthetic_benchmark_table(args.sites, args.periods, args.seed)
+    timings = []
+    for _ in range(args.repeat):
+        started = time.perf_counter()
+        results, _ = bulk_benchmark(table)
+        timings.append(time.perf_counter() - started)
+    best = min(timings)
+    print(f"input rows:   {len(table):,} (site x period)")
+    print(f"metric rows:  {len(results):,}")
+    print(f"best time:    {best:.3f}s")
+    print(f"throughput:   {len(results) / best:,.0f} metric rows/s")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,86 @@
+"""Measure NearDuplicateIndex throughput, memory and accuracy on an upload with re-worded copies.
+
+Run from the repository root:
+
+    python benchmarks/bench_dedup.py --reports 1000000 --threshold 0.8
+
+Synthetic reports are interleaved with re-worded copies (see
+synthetic_near_duplicates) and shuffled, then fed to one index in
+INGEST_BATCH_SIZE batches, as an upload would be. Throughput is reported per
+tenth of the run, so it shows whether the cost per report grows with the
+index; memory is what the index holds (NearDuplicateIndex.nbytes) and what
+tracemalloc saw allocated at peak. Recall is the share of copies merged into
+an earlier report of their own group; precision the share of merges that did.
+"""
+import argparse
+import os
+import random
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+import numpy as np
+
+from dedup import NearDuplicateIndex
+from ingest import INGEST_BATCH_SIZE
+from synthetic import synthetic_near_duplicates, synthetic_reports
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--reports', type=int, default=1000000, help="total reports, copies included")
+    parser.add_argument('--duplicate-rate', type=float, default=0.2)
+    parser.add_argument('--threshold', type=float, default=0.8)
+    parser.add_argument('--batch-size', type=int, default=INGEST_BATCH_SIZE)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    originals = synthetic_reports(int(args.reports * (1 - args.duplicate_rate)), seed=args.seed)
+    reports, sources = synthetic_near_duplicates(originals, args.duplicate_rate, seed=args.seed)
+    groups = [index if source < 0 else source for index, source in enumerate(sources)]
+    order = list(range(len(reports)))
+    random.Random(args.seed).shuffle(order)
+    reports = [reports[index] for index in order]
+    groups = np.array([groups[index] for index in order])
+
+    index = NearDuplicateIndex(threshold=args.threshold)
+    tracemalloc.start()
+    duplicate_of = []
+    tenth, marks = max(len(reports) // 10, 1), []
+    started = last = time.perf_counter()
+    for start in range(0, len(reports), args.batch_size):
+        duplicate_of.append(index.add(reports[start:start + args.batch_size]))
+        done = start + args.batch_size
+        if done // tenth > len(marks) or done >= len(reports):
+            now = time.perf_counter()
+            marks.append((min(done, len(reports)), now - last))
+            last = now
+    seconds = time.perf_counter() - started
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    duplicate_of = np.concatenate(duplicate_of)
+    kept = np.flatnonzero(duplicate_of < 0)
+    merged = np.flatnonzero(duplicate_of >= 0)
+    _, first = np.unique(groups, return_index=True)
+    copies = len(groups) - len(first)
+    correct = np.count_nonzero(groups[kept[duplicate_of[merged]]] == groups[merged])
+
+    print(f"reports:        {len(reports):,} ({copies:,} copies), threshold {args.threshold}, "
+          f"{index.bands} bands x {index.rows} rows")
+    print(f"throughput:     {len(reports) / seconds:,.0f} reports/s ({seconds:.1f}s)")
+    previous = 0
+    for done, elapsed in marks:
+        print(f"  up to {done:>9,}: {(done - previous) / elapsed:>10,.0f} reports/s")
+        previous = done
+    print(f"index memory:   {index.nbytes() / 2 ** 20:.1f} MiB "
+          f"({index.nbytes() / index.size:.0f} B per indexed report), peak traced {peak / 2 ** 20:.1f} MiB")
+    print(f"merged:         {len(merged):,}")
+    print(f"recall:         {correct / copies if copies else 1.0:.4f}")
+    print(f"precision:      {correct / len(merged) if len(merged) else 1.0:.4f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,83 @@
+"""Measure the memory and label-count time of dict records versus IncidentColumns.
+
+Run from the repository root:
+
+    python benchmarks/bench_incident_memory.py --reports 1000000
+
+The same synthetic reports are triaged into (a) the previous in-memory layout,
+one dict per incident filed in _MemoryPostings, and (b) IncidentColumns filed
+in the in-memory repository's column store. tracemalloc reports the memory each
+layout allocates; the report strings themselves are created beforehand and
+shared by both, so they are not counted. Label counting compares
+count_incident_labels over the dicts with the bitmask counts of the columns.
+"""
+import argparse
+import gc
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+from storage import _IncidentColumnPostings, _MemoryPostings, count_incident_labels, incident_index_keys
+from synthetic import synthetic_reports
+from triage import automated_incident_triage, triage_batch
+
+
+def traced(build):
+    """Return (result, bytes allocated by `build` and still held)."""
+    gc.collect()
+    tracemalloc.start()
+    result = build()
+    held = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return result, held
+
+
+def build_dict_store(reports):
+    store = _MemoryPostings()
+    store.add(automated_incident_triage(reports, 0), incident_index_keys)
+    return store
+
+
+def build_column_store(reports):
+    store = _IncidentColumnPostings()
+    store.add(triage_batch(reports, 0, max_workers=1))
+    return store
+
+
+def best_of(repeat, func):
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - started)
+    return min(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--reports', type=int, default=1000000)
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    reports = synthetic_reports(args.reports, seed=args.seed)
+    dict_store, dict_bytes = traced(lambda: build_dict_store(reports))
+    dict_seconds = best_of(args.repeat, lambda: count_incident_labels(dict_store.records))
+    del dict_store
+
+    column_store, column_bytes = traced(lambda: build_column_store(reports))
+    column_seconds = best_of(args.repeat, column_store.columns.label_counts)
+
+    print(f"incidents:            {args.reports:,}")
+    print(f"dict records:         {dict_bytes / 2 ** 20:9.1f} MiB  ({dict_bytes / args.reports:6.1f} B/incident)")
+    print(f"incident columns:     {column_bytes / 2 ** 20:9.1f} MiB  ({column_bytes / args.reports:6.1f} B/incident)")
+    print(f"reduction:            {dict_bytes / column_bytes:9.1f}x")
+    print(f"label counts (dicts): {dict_seconds * 1000:9.1f} ms")
+    print(f"label counts (masks): {column_seconds * 1000:9.1f} ms")
+
+
+if __name__ == '__main__':
+    main()
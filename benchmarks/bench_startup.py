@@ -0,0 +1,77 @@
+"""Measure import time and time to first request, with and without LAZY_IMPORTS.
+
+Run from the repository root:
+
+    python benchmarks/bench_startup.py --runs 5
+
+Every run starts a fresh interpreter, imports the app (in eager mode also
+building the shared tables, as gunicorn.conf.py does), then sends one request
+to each route in ROUTES through the Flask test client, in order. The first
+route needs no pandas, numpy or figure; the others pull them in one at a time,
+so in lazy mode their timings show where the deferred cost lands. Medians over
+--runs are reported; --output also writes them as JSON.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+ROUTES = ['/api/incidents', '/', '/benchmarking', '/risk_navigator']
+
+# Runs in the child interpreter; prints one JSON line of timings.
+CHILD = """
+import json, resource, sys, time
+started = time.perf_counter()
+import app, startup
+if not startup.LAZY_IMPORTS:
+    startup.preload_shared_tables()
+timings = {'import': time.perf_counter() - started}
+client = app.app.test_client()
+for route in %(routes)r:
+    started = time.perf_counter()
+    client.get(route)
+    timings[route] = time.perf_counter() - started
+timings['max_rss_mb'] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+print(json.dumps(timings))
+"""
+
+
+def run_once(lazy, workdir):
+    env = dict(os.environ, LAZY_IMPORTS='1' if lazy else '0',
+               INCIDENT_DB_PATH=os.path.join(workdir, 'incidents.sqlite3'),
+               RISK_DB_PATH=os.path.join(workdir, 'risks.sqlite3'))
+    src = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src')
+    output = subprocess.run([sys.executable, '-c', CHILD % {'routes': ROUTES}], cwd=src, env=env,
+                            capture_output=True, text=True, check=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--output', help="write the medians as JSON to this path")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='rih-startup-')
+    columns = ['import'] + ROUTES + ['max_rss_mb']
+    results = {}
+    print(f"{'mode':<6}" + "".join(f"{column:>16}" for column in columns))
+    for mode in ('eager', 'lazy'):
+        runs = [run_once(mode == 'lazy', workdir) for _ in range(args.runs)]
+        results[mode] = {column: statistics.median(run[column] for run in runs) for column in columns}
+        cells = [f"{results[mode][column] * 1000:>14.1f}ms" for column in columns[:-1]]
+        print(f"{mode:<6}" + "".join(cells) + f"{results[mode]['max_rss_mb']:>14.1f}MB")
+    for mode in results:
+        results[mode]['first_request_ready'] = results[mode]['import'] + results[mode][ROUTES[0]]
+    print(f"\nimport + first request: eager {results['eager']['first_request_ready'] * 1000:.1f}ms, "
+          f"lazy {results['lazy']['first_request_ready'] * 1000:.1f}ms")
+    if args.output:
+        with open(args.output, 'w') as output_file:
+            json.dump({'runs': args.runs, 'routes': ROUTES, 'results': results}, output_file, indent=2)
+
+
+if __name__ == '__main__':
+    main()
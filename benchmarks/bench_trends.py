@@ -0,0 +1,80 @@
+"""Time a 90-day incident trend read from the rollups against a scan of the raw incidents.
+
+Run from the repository root:
+
+    python benchmarks/bench_trends.py --sizes 10000,100000,1000000 --store sqlite
+
+For each size a fresh store is filled with synthetic incidents whose
+occurrence times are spread over the last 90 days, then incident_trends reads
+the daily trend from the rollups and, as the reference, every incident is
+read back and counted per day (tests/test_trends.py checks that the two agree).
+The rollup read should stay flat as the store grows; the scan grows with it.
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+from collections import Counter
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+
+def scan_trends(storage, store_id, trends):
+    """Count incidents per day bucket and label from the raw rows, shaped like trends['severity'/'category']."""
+    first, width = trends['buckets'][0], storage.TREND_RESOLUTIONS['day'][0]
+    counts = Counter()
+    for incident in storage.incident_repository.iter_all(store_id):
+        index = (storage.trend_bucket(incident["occurred_at"], 'day') - first) // width
+        if 0 <= index < len(trends['buckets']):
+            for key in storage.incident_index_keys(incident):
+                counts[key + (index,)] += 1
+    return counts
+
+
+def best_of(repeat, func):
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - started)
+    return min(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', default='10000,100000,1000000')
+    parser.add_argument('--store', choices=('memory', 'sqlite'), default='sqlite')
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='rih-trends-')
+    os.environ.update(INCIDENT_STORE=args.store, INCIDENT_DB_PATH=os.path.join(workdir, 'incidents.sqlite3'),
+                      RISK_DB_PATH=os.path.join(workdir, 'risks.sqlite3'))
+    import storage
+    from ingest import INGEST_BATCH_SIZE
+    from synthetic import synthetic_reports
+    from trends import incident_trends
+    from triage import triage_batch
+
+    rng = random.Random(args.seed)
+    now = time.time()
+    print(f"{'incidents':>10}  {'rollups':>10}  {'scan':>10}")
+    for size in (int(size) for size in args.sizes.split(',')):
+        store_id = f"bench-{size}"
+        reports = synthetic_reports(size, seed=args.seed)
+        for start in range(0, size, INGEST_BATCH_SIZE):
+            batch = reports[start:start + INGEST_BATCH_SIZE]
+            storage.incident_repository.append(store_id, triage_batch(batch, start),
+                                               [now - rng.uniform(0, 90 * 86400) for _ in batch])
+        trends = incident_trends(store_id, 'day', until=now)
+        rollups = best_of(args.repeat, lambda: incident_trends(store_id, 'day', until=now))
+        scan = best_of(1, lambda: scan_trends(storage, store_id, trends))
+        print(f"{size:>10,}  {rollups * 1e3:>8.2f}ms  {scan * 1e3:>8.0f}ms")
+        storage.incident_repository.clear(store_id)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,43 @@
+"""Measure how `triage_batch` throughput scales with the number of worker processes.
+
+Run from the repository root:
+
+    python benchmarks/bench_triage_batch.py --reports 500000 --max-workers 8
+
+Each worker count triages the same synthetic batch; the process pool is warmed
+up before timing so worker start-up is not counted.
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+from synthetic import synthetic_reports
+from triage import triage_batch
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--reports', type=int, default=200000)
+    parser.add_argument('--max-workers', type=int, default=os.cpu_count() or 1)
+    parser.add_argument('--keyword-rate', type=float, default=0.12)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    reports = synthetic_reports(args.reports, args.keyword_rate, args.seed)
+
+    baseline = None
+    print(f"{'workers':>7}  {'seconds':>8}  {'reports/s':>11}  {'speedup':>7}")
+    for workers in range(1, args.max_workers + 1):
+        triage_batch(reports[:workers * 100], 0, max_workers=workers, parallel_threshold=0)
+        started = time.perf_counter()
+        triage_batch(reports, 0, max_workers=workers, parallel_threshold=0)
+        elapsed = time.perf_counter() - started
+        baseline = baseline or elapsed
+        print(f"{workers:>7}  {elapsed:>8.3f}  {args.reports / elapsed:>11,.0f}  {baseline / elapsed:>6.2f}x")
+
+
+if __name__ == '__main__':
+    main()
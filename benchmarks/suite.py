@@ -0,0 +1,268 @@
+"""Run micro-benchmarks and in-process load tests for all four modules and write the results as JSON.
+
+Run from the repository root:
+
+    python benchmarks/suite.py --sizes 1000,100000,1000000
+    python benchmarks/suite.py --sizes 1000,100000 --modules incidents,risk --compare old.json
+
+For each size, every module gets micro-benchmarks of its core functions
+(best of --repeat runs) and a load test through Flask's test client: one
+bulk request carrying that many records (upload, bulk benchmark, event log,
+risk register), then --requests page and API requests whose latency
+percentiles are reported. Each size starts from a fresh session and so from
+empty stores. The incident and risk databases live in a temporary directory.
+
+Results go to --output (default benchmarks/results/suite-<UTC time>.json)
+together with the commit, Python version and arguments of the run. With
+--compare, each result is printed next to the matching one from an earlier
+results file.
+"""
+import argparse
+import io
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+
+MODULES = ('incidents', 'benchmarking', 'routines', 'risk')
+
+
+def best_of(repeat, func):
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - started)
+    return min(timings)
+
+
+def timed_requests(count, send):
+    """Send `count` requests; return (latencies in seconds, set of status codes)."""
+    latencies, statuses = [], set()
+    for _ in range(count):
+        started = time.perf_counter()
+        response = send()
+        latencies.append(time.perf_counter() - started)
+        statuses.add(response.status_code)
+    return latencies, statuses
+
+
+class Recorder:
+    """Collects micro and load results and echoes one line per result."""
+
+    def __init__(self):
+        self.micro = []
+        self.load = []
+
+    def add_micro(self, module, name, records, seconds):
+        self.micro.append({'module': module, 'name': name, 'records': records, 'seconds': seconds,
+                           'records_per_second': records / seconds if seconds else None})
+        print(f"  micro {module:<12} {name:<34} {records:>9,}  {seconds:9.4f}s  {records / seconds:>13,.0f}/s")
+
+    def add_load(self, module, step, records, latencies, statuses):
+        ordered = sorted(latencies)
+        result = {'module': module, 'step': step, 'records': records, 'requests': len(latencies),
+                  'statuses': sorted(statuses), 'seconds_total': sum(latencies),
+                  'p50': statistics.median(ordered), 'p95': ordered[min(int(len(ordered) * 0.95), len(ordered) - 1)],
+                  'max': ordered[-1]}
+        if len(latencies) == 1:
+            result['records_per_second'] = records / latencies[0] if latencies[0] else None
+        self.load.append(result)
+        failed = '' if all(status < 400 for status in statuses) else f"  FAILED {sorted(statuses)}"
+        print(f"  load  {module:<12} {step:<34} {records:>9,}  p50 {result['p50'] * 1000:9.2f}ms  "
+              f"p95 {result['p95'] * 1000:9.2f}ms{failed}")
+
+
+def run_incidents(hub, synthetic, size, args, recorder):
+    from storage import InMemoryIncidentRepository, count_incident_labels
+    from triage import automated_incident_triage, triage_batch
+
+    reports = synthetic.synthetic_reports(size, seed=args.seed)
+    processed = automated_incident_triage(reports, 0)
+    recorder.add_micro('incidents', 'automated_incident_triage', size,
+                       best_of(args.repeat, lambda: automated_incident_triage(reports, 0)))
+    recorder.add_micro('incidents', 'triage_batch', size, best_of(args.repeat, lambda: triage_batch(reports, 0)))
+    recorder.add_micro('incidents', 'count_incident_labels', size,
+                       best_of(args.repeat, lambda: count_incident_labels(processed)))
+    columns = triage_batch(reports, 0)
+    recorder.add_micro('incidents', 'IncidentColumns.label_counts', size, best_of(args.repeat, columns.label_counts))
+    recorder.add_micro('incidents', 'InMemoryIncidentRepository.append', size,
+                       best_of(args.repeat, lambda: InMemoryIncidentRepository().append('bench', columns)))
+
+    client = hub.app.test_client()
+    upload = "\n".join(reports).encode('utf-8')
+    latencies, statuses = timed_requests(1, lambda: client.post(
+        '/upload_incidents', data={'incident_file': (io.BytesIO(upload), 'incidents.txt')},
+        content_type='multipart/form-data'))
+    recorder.add_load('incidents', 'POST /upload_incidents', size, latencies, statuses)
+    for step, url in (('GET /', '/'),
+                      ('GET /api/incidents', '/api/incidents?limit=50'),
+                      ('GET /api/incidents filtered', '/api/incidents?severity=High&sort=-recorded_at&limit=50')):
+        latencies, statuses = timed_requests(args.requests, lambda: client.get(url))
+        recorder.add_load('incidents', step, size, latencies, statuses)
+
+
+def run_benchmarking(hub, synthetic, size, args, recorder):
+    from benchmarking import benchmark_index, bulk_benchmark
+
+    table = synthetic.benchmark_table_for_metric_rows(size, seed=args.seed)
+    results, _ = bulk_benchmark(table)
+    rows = len(results)
+    recorder.add_micro('benchmarking', 'bulk_benchmark', rows, best_of(args.repeat, lambda: bulk_benchmark(table)))
+    index = benchmark_index()
+    industry_ids, metric_ids = index.codes(results["Industry"].astype('category').cat,
+                                           results["Metric"].astype('category').cat)
+    values = results["Your Value"].to_numpy()
+    recorder.add_micro('benchmarking', 'BenchmarkIndex.compare', rows,
+                       best_of(args.repeat, lambda: index.compare(industry_ids, metric_ids, values)))
+
+    client = hub.app.test_client()
+    payload = table.to_csv(index=False).encode('utf-8')
+    latencies, statuses = timed_requests(1, lambda: client.post(
+        '/benchmarking/bulk?format=csv', data={'benchmark_file': (io.BytesIO(payload), 'benchmarks.csv')},
+        content_type='multipart/form-data'))
+    recorder.add_load('benchmarking', 'POST /benchmarking/bulk', rows, latencies, statuses)
+    form = {'industry': 'Manufacturing', 'safety_incidents': '0.8', 'quality_defects': '150',
+            'maintenance_costs': '2.5', 'oee': '78', 'energy_consumption': '1.7', 'defect_rate': '0.7',
+            'on_time_delivery': '93', 'customer_satisfaction': '4.1', 'production_efficiency': '86'}
+    latencies, statuses = timed_requests(args.requests, lambda: client.post('/benchmarking', data=form))
+    recorder.add_load('benchmarking', 'POST /benchmarking', rows, latencies, statuses)
+
+
+def run_routines(hub, synthetic, size, args, recorder):
+    from routines import batch_routine_conformance, check_routine_conformance
+
+    documented = synthetic.ROUTINE_STEPS
+    cases = list(synthetic.synthetic_cases(documented, max(size // len(documented), 1), seed=args.seed))
+    events = sum(len(steps) for steps in cases)
+
+    def check_all():
+        for steps in cases:
+            check_routine_conformance(documented, steps)
+
+    recorder.add_micro('routines', 'check_routine_conformance', events, best_of(args.repeat, check_all))
+    recorder.add_micro('routines', 'batch_routine_conformance', events, best_of(
+        args.repeat, lambda: batch_routine_conformance(documented, cases, max_workers=1)))
+
+    client = hub.app.test_client()
+    rows = list(synthetic.synthetic_event_log(documented, size, seed=args.seed))
+    log = synthetic.csv_bytes(('case_id', 'activity', 'timestamp'), rows)
+    latencies, statuses = timed_requests(1, lambda: client.post(
+        '/routines/batch', data={'documented_routine': ', '.join(documented),
+                                 'event_log': (io.BytesIO(log), 'events.csv')},
+        content_type='multipart/form-data'))
+    recorder.add_load('routines', 'POST /routines/batch', len(rows), latencies, statuses)
+    form = {'ideal_routine': ', '.join(documented), 'actual_routine': ', '.join(cases[0])}
+    latencies, statuses = timed_requests(args.requests, lambda: client.post('/routines', data=form))
+    recorder.add_load('routines', 'POST /routines', len(rows), latencies, statuses)
+
+
+def run_risk(hub, synthetic, size, args, recorder):
+    from risks import score_risk_register, summarise_risk_register
+
+    register = synthetic.synthetic_risk_register(size, seed=args.seed)
+    recorder.add_micro('risk', 'score_risk_register', size,
+                       best_of(args.repeat, lambda: score_risk_register(register)))
+    scored, _ = score_risk_register(register)
+    recorder.add_micro('risk', 'summarise_risk_register', size,
+                       best_of(args.repeat, lambda: summarise_risk_register(scored)))
+
+    client = hub.app.test_client()
+    payload = register.to_csv(index=False).encode('utf-8')
+    latencies, statuses = timed_requests(1, lambda: client.post(
+        '/risk_navigator/import', data={'risk_register': (io.BytesIO(payload), 'risks.csv')},
+        content_type='multipart/form-data'))
+    recorder.add_load('risk', 'POST /risk_navigator/import', size, latencies, statuses)
+    for step, url in (('GET /risk_navigator', '/risk_navigator'),
+                      ('GET /api/risks', '/api/risks?sort=-score&limit=50'),
+                      ('GET /risk_navigator/cell', '/risk_navigator/cell?likelihood=Likely&impact=Major')):
+        latencies, statuses = timed_requests(args.requests, lambda: client.get(url))
+        recorder.add_load('risk', step, size, latencies, statuses)
+
+
+RUNNERS = {'incidents': run_incidents, 'benchmarking': run_benchmarking, 'routines': run_routines, 'risk': run_risk}
+
+
+def result_key(result):
+    return result['module'], result.get('name') or result.get('step'), result['records']
+
+
+def compare(results, baseline_path):
+    """Print each result's time next to the matching result in an earlier run."""
+    with open(baseline_path) as baseline_file:
+        baseline = json.load(baseline_file)
+    print(f"\nCompared with {baseline_path} (ratio > 1 means slower now):")
+    for kind, metric in (('micro', 'seconds'), ('load', 'p50')):
+        previous = {result_key(result): result for result in baseline.get(kind, [])}
+        for result in results[kind]:
+            before = previous.get(result_key(result))
+            if before and before[metric]:
+                module, name, records = result_key(result)
+                print(f"  {kind:<5} {module:<12} {name:<34} {records:>9,}  {metric} {before[metric]:.4f}s -> "
+                      f"{result[metric]:.4f}s  x{result[metric] / before[metric]:.2f}")
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', 'HEAD'], capture_output=True, text=True, check=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', default='1000,100000,1000000', help="comma-separated record counts")
+    parser.add_argument('--modules', default=','.join(MODULES), help="comma-separated subset of " + ', '.join(MODULES))
+    parser.add_argument('--repeat', type=int, default=3, help="runs per micro-benchmark (best is kept)")
+    parser.add_argument('--requests', type=int, default=20, help="page/API requests per load step")
+    parser.add_argument('--store', choices=('sqlite', 'memory'), default='sqlite')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', help="results JSON path")
+    parser.add_argument('--compare', help="earlier results JSON to compare against")
+    args = parser.parse_args()
+    sizes = [int(size) for size in args.sizes.split(',')]
+    modules = [module for module in args.modules.split(',') if module]
+    unknown = set(modules) - set(MODULES)
+    if unknown:
+        parser.error(f"unknown modules: {', '.join(sorted(unknown))}")
+
+    # The app reads its storage settings at import time.
+    workdir = tempfile.mkdtemp(prefix='rih-bench-')
+    os.environ['INCIDENT_STORE'] = args.store
+    os.environ['INCIDENT_DB_PATH'] = os.path.join(workdir, 'incidents.sqlite3')
+    os.environ['RISK_DB_PATH'] = os.path.join(workdir, 'risks.sqlite3')
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    import synthetic
+    import app as hub
+
+    started = datetime.now(timezone.utc)
+    recorder = Recorder()
+    for size in sizes:
+        print(f"size {size:,}")
+        for module in modules:
+            RUNNERS[module](hub, synthetic, size, args, recorder)
+
+    results = {
+        'meta': {'started': started.isoformat(), 'commit': git_commit(), 'python': platform.python_version(),
+                 'platform': platform.platform(), 'cpu_count': os.cpu_count(), 'args': vars(args)},
+        'micro': recorder.micro,
+        'load': recorder.load,
+    }
+    output = args.output or os.path.join(os.path.dirname(os.path.abspath(__file__)), 'results',
+                                         f"suite-{started.strftime('%Y%m%dT%H%M%SZ')}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w') as output_file:
+        json.dump(results, output_file, indent=2)
+    print(f"\nwrote {output}")
+    if args.compare:
+        compare(results, args.compare)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,145 @@
+"""Synthetic, seeded inputs for the benchmarks: incident text, metric tables, routine logs and risk registers.
+
+Every generator takes a `seed` and returns the same data for the same
+arguments, so runs on different commits measure identical workloads.
+"""
+import csv
+import io
+import os
+import random
+import sys
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+from benchmarking import BENCHMARKS
+from risks import IMPACT_SCORES, LIKELIHOOD_SCORES
+from triage import HIGH_SEVERITY_KEYWORDS, LOW_SEVERITY_KEYWORDS, TRIAGE_KEYWORDS
+
+FILLER_WORDS = ("the a an of during shift unit plant was were caused leak line check team after before "
+                "loss power surge room server employee new roof heavy damaged detected concern delay part").split()
+ROUTINE_STEPS = ["Setup Equipment", "Verify Lockout", "Pre-Check", "Inspect Guards", "Start Process", "Monitor",
+                 "Record Readings", "Shutdown", "Clean", "Sign Off"]
+EXTRA_STEPS = ["Call Supervisor", "Skip Checklist", "Adjust Setpoint", "Wait For Parts", "Restart Process"]
+RISK_NAME_WORDS = ("pump valve boiler conveyor crane forklift reactor compressor supplier network "
+                   "failure outage leak fire injury breach delay shortage overload spill").split()
+
+
+def synthetic_reports(count, keyword_rate=0.12, seed=0):
+    """Incident reports mixing triage/severity keywords (at `keyword_rate` per word) with filler words."""
+    rng = random.Random(seed)
+    vocabulary = [kw for kws in TRIAGE_KEYWORDS.values() for kw in kws] + HIGH_SEVERITY_KEYWORDS + LOW_SEVERITY_KEYWORDS
+    reports = []
+    for _ in range(count):
+        words = [rng.choice(vocabulary) if rng.random() < keyword_rate else rng.choice(FILLER_WORDS)
+                 for _ in range(rng.randint(8, 25))]
+        words[0] = words[0].capitalize()
+        reports.append(" ".join(words) + ".")
+    return reports
+
+
+def synthetic_near_duplicates(reports, duplicate_rate=0.2, seed=0):
+    """Interleave `reports` with re-worded copies of some of them, as several shifts reporting one event would.
+
+    About `duplicate_rate` of the output are copies, each with up to two
+    word-level edits (a dropped, repeated or re-cased word) or changed
+    punctuation, placed after their original. Returns (reports, sources),
+    where sources[i] is the position of report i's original, or -1.
+    """
+    rng = random.Random(seed)
+    output, sources = [], []
+    for report in reports:
+        original = len(output)
+        output.append(report)
+        sources.append(-1)
+        while rng.random() < duplicate_rate:
+            words = report.rstrip('.').split()
+            for _ in range(rng.randint(0, 2)):
+                position = rng.randrange(len(words))
+                change = rng.random()
+                if change < 0.4 and len(words) > 1:
+                    del words[position]
+                elif change < 0.7:
+                    words.insert(position, words[position])
+                else:
+                    words[position] = words[position].upper()
+            output.append(" ".join(words) + rng.choice([".", "!", "", "..."]))
+            sources.append(original)
+    return output, sources
+
+
+def synthetic_benchmark_table(sites, periods, seed=0):
+    """Wide site x period metric table scattered around each site's Industry Best values."""
+    rng = np.random.default_rng(seed)
+    industries = list(BENCHMARKS)
+    metrics = sorted({metric for tiers in BENCHMARKS.values() for metric in tiers["Industry Best"]})
+    site_industry = rng.choice(industries, size=sites)
+    table = pd.DataFrame({
+        "Site": np.repeat([f"SITE-{i:05d}" for i in range(sites)], periods),
+        "Period": np.tile([str(p) for p in pd.period_range("2020-01", periods=periods, freq="M")], sites),
+        "Industry": np.repeat(site_industry, periods),
+    })
+    for metric in metrics:
+        reference = np.array([BENCHMARKS[industry]["Industry Best"].get(metric, np.nan) for industry in industries])
+        base = pd.Series(reference, index=industries)[table["Industry"]].to_numpy()
+        table[metric] = np.round(base * rng.uniform(0.6, 1.4, size=len(table)), 2)
+    return table
+
+
+def benchmark_table_for_metric_rows(metric_rows, periods=36, seed=0):
+    """A synthetic benchmark table holding roughly `metric_rows` (site, period, metric) comparisons."""
+    metrics_per_row = np.mean([len(tiers["Industry Best"]) for tiers in BENCHMARKS.values()])
+    sites = max(int(round(metric_rows / (metrics_per_row * periods))), 1)
+    return synthetic_benchmark_table(sites, periods, seed)
+
+
+def synthetic_cases(documented_steps, cases, drift_rate=0.3, seed=0):
+    """Per-case step sequences: the documented routine with omissions, additions and swaps at `drift_rate`."""
+    rng = random.Random(seed)
+    for _ in range(cases):
+        steps = list(documented_steps)
+        while rng.random() < drift_rate and steps:
+            change = rng.random()
+            position = rng.randrange(len(steps))
+            if change < 0.4:
+                del steps[position]
+            elif change < 0.7:
+                steps.insert(position, rng.choice(EXTRA_STEPS))
+            elif position + 1 < len(steps):
+                steps[position], steps[position + 1] = steps[position + 1], steps[position]
+        yield steps
+
+
+def synthetic_event_log(documented_steps, events, drift_rate=0.3, seed=0):
+    """Event log rows (case_id, activity, timestamp) totalling about `events` events, one case at a time."""
+    started = datetime(2024, 1, 1)
+    cases = max(events // len(documented_steps), 1)
+    for number, steps in enumerate(synthetic_cases(documented_steps, cases, drift_rate, seed)):
+        case_start = started + timedelta(minutes=15 * number)
+        for offset, step in enumerate(steps):
+            yield f"CASE-{number:07d}", step, (case_start + timedelta(minutes=offset)).isoformat()
+
+
+def synthetic_risk_register(count, seed=0):
+    """Risk register DataFrame with uniformly drawn likelihood and impact labels."""
+    rng = np.random.default_rng(seed)
+    words = np.array(RISK_NAME_WORDS)
+    names = [f"{a.title()} {b} #{i}" for i, (a, b) in enumerate(zip(rng.choice(words, size=count),
+                                                                 rng.choice(words, size=count)))]
+    return pd.DataFrame({
+        "Risk Name": names,
+        "Likelihood": rng.choice(list(LIKELIHOOD_SCORES), size=count),
+        "Impact": rng.choice(list(IMPACT_SCORES), size=count),
+    })
+
+
+def csv_bytes(header, rows):
+    """Encode `rows` under `header` as UTF-8 CSV."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(header)
+    writer.writerows(rows)
+    return buffer.getvalue().encode('utf-8')
@@ -0,0 +1,31 @@
+"""Gunicorn settings, read automatically by the Procfile's `gunicorn --pythonpath src app:app`.
+
+With preload_app the master imports the app once and, in when_ready, builds
+the shared lookup tables (see preload_shared_tables in src/startup.py) before any
+worker forks, so the workers share those pages copy-on-write instead of each
+importing pandas and rebuilding the tables. Set GUNICORN_PRELOAD=0 to import
+the app in every worker instead, which then builds its own tables in
+post_worker_init; with LAZY_IMPORTS=1 tables are only built on first use,
+for the fastest worker boot.
+"""
+import os
+
+preload_app = os.environ.get('GUNICORN_PRELOAD', '1').lower() in ('1', 'true', 'yes', 'on')
+
+
+def _preload_shared_tables():
+    # Imported here, once the app (and src on the path) has been loaded.
+    import startup
+    if not startup.LAZY_IMPORTS:
+        startup.preload_shared_tables()
+
+
+def when_ready(server):
+    if preload_app:
+        server.app.wsgi()
+        _preload_shared_tables()
+
+
+def post_worker_init(worker):
+    if not preload_app:
+        _preload_shared_tables()
@@ -1,106 +1,186 @@
+import csv
+import json
 import os
-from flask import Flask, render_template, request, session, redirect, url_for
-import pandas as pd
-import numpy as np
+import queue
+import tempfile
+import time
+import uuid
+from collections import Counter
+from datetime import datetime, timezone
+
+from flask import Flask, g, jsonify, render_template, request, session, redirect, url_for
+from flask import before_render_template, request_finished, template_rendered
+# plotly.graph_objects already defers each trace class to its first use.
 import plotly.graph_objects as go
-import json
+
+import storage
+from benchmarking import (BENCHMARK_STATUSES, BENCHMARKS, METRIC_FORM_FIELDS, benchmark_index,
+                          benchmark_table_from_json, bulk_benchmark, read_benchmark_table)
+from dedup import INCIDENT_DEDUP
+from figures import figure_cache
+from ingest import (INCIDENT_UPLOAD_FORMATS, incident_upload_format, ingest_incident_lines, log_ingest_progress,
+                    open_incident_upload)
+from jobs import INGEST_JOB_HEARTBEAT_SECONDS, INGEST_SPOOL_DIR, IngestJob, RetriageJob, ingest_jobs
+from metrics import METRICS_ENABLED, metrics, timed
+from risks import (IMPACT_SCORES, LIKELIHOOD_SCORES, RISK_CATEGORIES, RISK_DISPLAY_GROUPS, RISK_LIST_LIMIT,
+                   RISK_MATRIX_MODE, RISK_PRIORITIES, RISK_SORTS, build_risk_cells_figure, build_risk_points_figure,
+                   calculate_risk_score, classify_risk, get_risk_category_and_advice, query_risks,
+                   read_risk_register, risk_cursor, risk_register_from_json, score_risk_register,
+                   store_scored_risks, summarise_risk_register)
+from routines import (ROUTINE_STEP_ADDED, batch_routine_conformance, check_routine_conformance, iter_cases_grouped,
+                      iter_cases_staged, iter_event_log)
+from startup import pd
+from storage import INCIDENTS_PAGE_SIZE, RISK_CELL_PAGE_SIZE, TREND_RESOLUTIONS, incident_cursor, split_page
+from trends import build_incident_trend_figure, incident_trends, parse_timestamp
+from triage import SEVERITY_LEVELS, triage_batch, triage_rules
 
 app = Flask(__name__)
 app.secret_key = os.environ.get('SECRET_KEY', 'a_very_secret_key_for_seminar_app')
 
-# --- Incident Analysis Logic (From Day 2 Project) ---
-def automated_incident_triage(incident_reports, current_total_incidents):
-    keywords = {
-        "Equipment Failure": ["malfunction", "faulty", "broke", "failure", "mechanical", "electrical", "sensor", "pump", "valve", "engine"],
-        "Human Error": ["mistake", "forgot", "misread", "missed", "oversight", "operator", "crew", "training", "procedure deviation", "communication breakdown"],
-        "Procedure/Process Issue": ["procedure", "protocol", "checklist", "SOP", "unclear", "ambiguous", "outdated", "steps", "process flow", "workflow"],
-        "Environmental Factor": ["weather", "rain", "wind", "slippery", "lighting", "visibility", "temperature", "noise", "vibration"],
-        "Maintenance Related": ["maintenance", "repair", "inspection", "servicing", "worn", "scheduled"],
-        "Communication Breakdown": ["communication", "handover", "briefing", "missed call", "misunderstood"]
-    }
-
-    action_suggestions = {
-        "Equipment Failure": "Schedule immediate inspection and maintenance; review equipment history for recurring issues.",
-        "Human Error": "Initiate procedure review; update documentation; conduct process walkthrough; provide targeted training.",
-        "Procedure/Process Issue": "Revise and simplify relevant procedures; implement stricter adherence checks; conduct process mapping.",
-        "Environmental Factor": "Develop contingency plans for adverse conditions; implement environmental monitoring systems.",
-        "Maintenance Related": "Implement predictive maintenance techniques; optimize maintenance schedules; conduct component-level failure analysis.",
-        "Communication Breakdown": "Establish clear communication protocols; implement read-back/verify procedures; improve shift handover processes."
-    }
-
-    processed_reports = []
-    start_id = current_total_incidents + 1
-    for i, report in enumerate(incident_reports):
-        inferred_categories = []
-        for category, kws in keywords.items():
-            if any(kw in report.lower() for kw in kws):
-                inferred_categories.append(category)
-
-        if not inferred_categories:
-            inferred_categories.append("Unknown")
-
-        # Simplified severity assignment for demonstration
-        severity = "Low"
-        if "major" in report.lower() or "critical" in report.lower() or "shutdown" in report.lower():
-            severity = "High"
-        elif "minor" in report.lower() or "small" in report.lower():
-            severity = "Low"
-        else:
-            severity = "Medium" # Default if no specific keywords
-
-        # Suggest action based on the first inferred category or a default
-        suggested_action = action_suggestions.get(inferred_categories[0], "Conduct full root cause analysis (RCA) to understand contributing factors.")
-
-        processed_reports.append({
-            "Report_ID": f"INC-{start_id + i:03d}",
-            "Description": report,
-            "Severity": severity,
-            "Inferred_Categories": ", ".join(inferred_categories),
-            "Suggested_Action": suggested_action
-        })
+
+def _route_label():
+    return request.url_rule.rule if request.url_rule is not None else 'unmatched'
+
+
+def _start_request_timing():
+    g.metric_started = time.perf_counter()
+    g.metric_phases = {}
+
+
+def _start_render_timing(sender, template, context, **extra):
+    g.metric_render_started = time.perf_counter()
+
+
+def _finish_render_timing(sender, template, context, **extra):
+    started = g.pop('metric_render_started', None)
+    if started is not None and 'metric_phases' in g:
+        g.metric_phases['render'] = g.metric_phases.get('render', 0.0) + time.perf_counter() - started
+
+
+def _finish_request_timing(sender, response, **extra):
+    # Runs on request_finished, after the session has been saved into Set-Cookie.
+    started = g.get('metric_started')
+    if started is None:
+        return
+    session_cookie = None
+    cookie_prefix = app.config['SESSION_COOKIE_NAME'] + '='
+    for header in response.headers.getlist('Set-Cookie'):
+        if header.startswith(cookie_prefix):
+            session_cookie = len(header.split(';', 1)[0]) - len(cookie_prefix)
+    metrics.record_request(_route_label(), request.method, str(response.status_code),
+                           time.perf_counter() - started, g.metric_phases,
+                           len(request.headers.get('Cookie', '')), session_cookie)
+
+
+if METRICS_ENABLED:
+    app.before_request(_start_request_timing)
+    request_finished.connect(_finish_request_timing, app)
+    before_render_template.connect(_start_render_timing, app)
+    template_rendered.connect(_finish_render_timing, app)
+
+
+@app.route("/metrics")
+def prometheus_metrics():
+    if not METRICS_ENABLED:
+        return jsonify({"error": "Metrics are disabled; set METRICS_ENABLED=1"}), 404
+    return app.response_class(metrics.render(), mimetype='text/plain; version=0.0.4')
+
+
+@app.route("/figure_cache_stats")
+def figure_cache_stats():
+    return jsonify(figure_cache.stats())
+
+
+@app.route("/triage_rules")
+def triage_rules_stats():
+    return jsonify(triage_rules().stats())
+
+
+def get_incident_store_id():
+    """Return the caller's incident store ID, allocating one on first use."""
+    if 'incident_store_id' not in session:
+        session['incident_store_id'] = uuid.uuid4().hex
+    return session['incident_store_id']
+
+
+def store_triaged_incidents(incident_reports):
+    """Triage `incident_reports` and append them to the caller's incident store.
+
+    The store numbers their Report_IDs as it appends them, so concurrent
+    uploads never share one.
+    """
+    store_id = get_incident_store_id()
+    processed_reports = triage_batch(incident_reports, 0)
+    storage.incident_repository.append(store_id, processed_reports)
     return processed_reports
 
+
 @app.route("/", methods=["GET", "POST"])
 def incident_analyzer_page():
     analysis_results = []
     plot_data = None
     high_severity_count = 0
+    high_severity_spike = None
+    trend_resolution = request.args.get('trend') if request.args.get('trend') in TREND_RESOLUTIONS else 'day'
 
-    if 'incidents_data' not in session:
-        session['incidents_data'] = []
+    store_id = get_incident_store_id()
 
     if request.method == "POST":
         if 'incident_description' in request.form:
             new_report = request.form['incident_description']
             if new_report.strip():
-                processed_new_report = automated_incident_triage([new_report], len(session['incidents_data']))
-                session['incidents_data'].extend(processed_new_report)
+                store_triaged_incidents([new_report])
 
-    if session['incidents_data']:
-        df = pd.DataFrame(session['incidents_data'])
+    total_incidents = storage.incident_repository.count(store_id)
+    next_cursor = None
+    category_counts = {}
 
+    if total_incidents:
+        # Further pages are fetched by the template from /api/incidents.
+        page = storage.incident_repository.query(store_id, limit=INCIDENTS_PAGE_SIZE + 1)
+        analysis_results, next_cursor = split_page(page, INCIDENTS_PAGE_SIZE, incident_cursor)
         # Aggregate data for Plotly charts
-        severity_counts = df['Severity'].value_counts().reindex(["Low", "Medium", "High"]).fillna(0)
-        category_counts = df['Inferred_Categories'].str.get_dummies(sep=', ').sum().sort_values(ascending=False)
+        with timed('aggregate'):
+            aggregates = storage.incident_repository.aggregates(store_id)
+            severity_counts = {level: aggregates['severity'].get(level, 0) for level in SEVERITY_LEVELS}
+            category_counts = dict(sorted(aggregates['category'].items(), key=lambda item: (-item[1], item[0])))
+            trends = incident_trends(store_id, trend_resolution)
 
         # Severity Distribution Chart
-        severity_fig = go.Figure(data=[go.Pie(labels=severity_counts.index, values=severity_counts.values, hole=.3)])
-        severity_fig.update_layout(title_text='Incident Severity Distribution', title_x=0.5)
+        def build_severity_figure():
+            severity_fig = go.Figure(data=[go.Pie(labels=list(severity_counts), values=list(severity_counts.values()),
+                                                  hole=.3)])
+            severity_fig.update_layout(title_text='Incident Severity Distribution', title_x=0.5)
+            return severity_fig
 
         # Category Distribution Chart (Bar Chart)
-        category_fig = go.Figure(data=[go.Bar(x=category_counts.index, y=category_counts.values)])
-        category_fig.update_layout(title_text='Incident Category Distribution', title_x=0.5,
-                                    xaxis_title="Category", yaxis_title="Number of Incidents")
+        def build_category_figure():
+            category_fig = go.Figure(data=[go.Bar(x=list(category_counts), y=list(category_counts.values()))])
+            category_fig.update_layout(title_text='Incident Category Distribution', title_x=0.5,
+                                        xaxis_title="Category", yaxis_title="Number of Incidents")
+            return category_fig
 
         plot_data = {
-            'severity_data': severity_fig.to_json(),
-            'category_data': category_fig.to_json()
+            'severity_data': figure_cache.get_or_build('severity_pie', list(severity_counts.items()),
+                                                       build_severity_figure),
+            'category_data': figure_cache.get_or_build('category_bar', list(category_counts.items()),
+                                                       build_category_figure),
+            'trend_data': figure_cache.get_or_build('incident_trend', trends,
+                                                    lambda: build_incident_trend_figure(trends))
         }
 
         # Calculate high severity count for alert
-        high_severity_count = df[df['Severity'] == 'High'].shape[0]
-
-    return render_template("incident_analyzer.html", analysis_results=session['incidents_data'], plot_data=plot_data, high_severity_count=high_severity_count)
+        high_severity_count = severity_counts["High"]
+        if trends['high_severity_spikes'] and trends['high_severity_spikes'][-1] == trends['buckets'][-1]:
+            high_severity_spike = {'count': trends['severity']["High"][-1], 'resolution': trend_resolution}
+
+    return render_template("incident_analyzer.html", analysis_results=analysis_results, plot_data=plot_data,
+                           high_severity_count=high_severity_count, high_severity_spike=high_severity_spike,
+                           trend_resolution=trend_resolution, trend_resolutions=list(TREND_RESOLUTIONS),
+                           total_incidents=total_incidents,
+                           next_cursor=next_cursor, severity_levels=SEVERITY_LEVELS,
+                           incident_categories=list(category_counts), page_size=INCIDENTS_PAGE_SIZE,
+                           last_ingest=session.pop('last_ingest', None))
 
 @app.route("/load_examples", methods=["POST"])
 def load_examples():
@@ -116,22 +196,20 @@ def load_examples():
         "Scheduled equipment servicing was delayed due to part unavailability.",
         "Unexpected vibration detected in pump, causing concern."
     ]
-    current_total_incidents = len(session.get('incidents_data', []))
-    processed_examples = automated_incident_triage(example_incidents, current_total_incidents)
-
-    if 'incidents_data' not in session:
-        session['incidents_data'] = []
-    session['incidents_data'].extend(processed_examples)
+    store_triaged_incidents(example_incidents)
 
     return redirect(url_for('incident_analyzer_page'))
 
 @app.route("/clear_incidents", methods=["POST"])
 def clear_incidents():
-    session['incidents_data'] = []
+    storage.incident_repository.clear(get_incident_store_id())
     return redirect(url_for('incident_analyzer_page'))
 
 @app.route("/upload_incidents", methods=["POST"])
 def upload_incidents():
+    if request.values.get('async'):
+        return submit_ingest_job()
+
     if 'incident_file' not in request.files:
         # Handle case where no file was uploaded
         return redirect(url_for('incident_analyzer_page'))
@@ -142,235 +220,288 @@ def upload_incidents():
         # Handle case where an empty file was submitted
         return redirect(url_for('incident_analyzer_page'))
 
-    if incident_file and incident_file.filename.endswith('.txt'):
-        file_content = incident_file.read().decode('utf-8')
-        # Assuming each incident report is on a new line
-        incident_reports_from_file = [line.strip() for line in file_content.split('\n') if line.strip()]
+    upload_format = incident_upload_format(incident_file.filename)
+    if incident_file and upload_format:
+        lines = open_incident_upload(incident_file.stream, incident_file.filename)
+        try:
+            stats = ingest_incident_lines(get_incident_store_id(), lines, upload_format, progress=log_ingest_progress)
+        except (ValueError, UnicodeDecodeError, OSError, csv.Error) as exc:
+            # Batches stored before the error are kept; report how far we got.
+            session['last_ingest'] = {'filename': incident_file.filename, 'error': str(exc)}
+        else:
+            session['last_ingest'] = {'filename': incident_file.filename, 'reports': stats['reports'],
+                                      'lines': stats['lines'], 'skipped': stats['skipped'],
+                                      'duplicates': stats['duplicates'], 'clusters': stats['clusters'],
+                                      'largest_clusters': stats['largest_clusters'], 'dedup': INCIDENT_DEDUP,
+                                      'seconds': round(stats['seconds'], 3),
+                                      'lines_per_second': round(stats['lines_per_second'])}
 
-        current_total_incidents = len(session.get('incidents_data', []))
-        processed_reports = automated_incident_triage(incident_reports_from_file, current_total_incidents)
+    return redirect(url_for('incident_analyzer_page'))
 
-        if 'incidents_data' not in session:
-            session['incidents_data'] = []
-        session['incidents_data'].extend(processed_reports)
 
-    return redirect(url_for('incident_analyzer_page'))
+def _queue_full_response():
+    response = jsonify({"error": "Ingest queue is full; retry later", **ingest_jobs.stats()})
+    response.status_code = 503
+    response.headers['Retry-After'] = str(INGEST_JOB_HEARTBEAT_SECONDS)
+    return response
+
+
+def submit_ingest_job():
+    """Spool the uploaded incident file and queue it as an ingest job (the ?async=1 upload mode)."""
+    incident_file = request.files.get('incident_file')
+    if incident_file is None or not incident_file.filename:
+        return jsonify({"error": "Upload an incident_file"}), 400
+    upload_format = incident_upload_format(incident_file.filename)
+    if upload_format is None:
+        return jsonify({"error": f"Unsupported file type (expected {', '.join(INCIDENT_UPLOAD_FORMATS)}, "
+                                 "optionally .gz)"}), 400
+    if ingest_jobs.full():
+        return _queue_full_response()
+
+    fd, path = tempfile.mkstemp(prefix='ingest-', dir=INGEST_SPOOL_DIR)
+    with os.fdopen(fd, 'wb') as spool:
+        incident_file.save(spool)
+    job = IngestJob(get_incident_store_id(), incident_file.filename, upload_format, path)
+    try:
+        ingest_jobs.submit(job)
+    except queue.Full:
+        os.unlink(path)
+        return _queue_full_response()
+    return _job_accepted_response(job)
+
+
+def _job_accepted_response(job):
+    return jsonify({"job_id": job.id, "status": job.status,
+                    "status_url": url_for('ingest_job_status', job_id=job.id),
+                    "events_url": url_for('ingest_job_events', job_id=job.id)}), 202
+
+
+@app.route("/incidents/retriage", methods=["POST"])
+def retriage_incidents():
+    """Queue a re-triage of the caller's stored incidents against the current triage rules."""
+    if ingest_jobs.full():
+        return _queue_full_response()
+    job = RetriageJob(get_incident_store_id())
+    try:
+        ingest_jobs.submit(job)
+    except queue.Full:
+        return _queue_full_response()
+    return _job_accepted_response(job)
+
+
+def _caller_ingest_job(job_id):
+    job = ingest_jobs.get(job_id)
+    if job is None or job.store_id != session.get('incident_store_id'):
+        return None
+    return job
+
+
+@app.route("/jobs/<job_id>")
+def ingest_job_status(job_id):
+    job = _caller_ingest_job(job_id)
+    if job is None:
+        return jsonify({"error": "Unknown job"}), 404
+    return jsonify(job.snapshot())
+
+
+@app.route("/jobs/<job_id>/events")
+def ingest_job_events(job_id):
+    """Stream a job's events as NDJSON, or as Server-Sent Events.
+
+    SSE is chosen by ?format=sse or an Accept: text/event-stream header. Each
+    SSE event carries its index as the event id, so a reconnecting client
+    resumes from its Last-Event-ID; NDJSON clients can resume with ?from=<index>.
+    Idle streams get a heartbeat every INGEST_JOB_HEARTBEAT_SECONDS.
+    """
+    job = _caller_ingest_job(job_id)
+    if job is None:
+        return jsonify({"error": "Unknown job"}), 404
+    sse = (request.args.get('format') == 'sse' or
+           request.accept_mimetypes.best_match(['application/x-ndjson', 'text/event-stream']) == 'text/event-stream')
+    if sse and request.headers.get('Last-Event-ID', type=int) is not None:
+        index = request.headers.get('Last-Event-ID', type=int) + 1
+    else:
+        index = max(request.args.get('from', 0, type=int), 0)
+
+    def stream(index):
+        while True:
+            events, finished = job.events_after(index, INGEST_JOB_HEARTBEAT_SECONDS)
+            if not events and not finished:
+                yield ": heartbeat\n\n" if sse else '{"event": "heartbeat"}\n'
+            for event in events:
+                if sse:
+                    yield f"id: {index}\nevent: {event['event']}\ndata: {json.dumps(event)}\n\n"
+                else:
+                    yield json.dumps(event) + "\n"
+                index += 1
+            if finished:
+                return
+
+    return app.response_class(stream(index), mimetype='text/event-stream' if sse else 'application/x-ndjson',
+                              headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
 
-# --- Performance Benchmarker Logic (From Day 3 Project) ---
-BENCHMARKS = {
-    "Manufacturing": {
-        "Industry Best": {
-            "Safety Incidents (TRIR)": 0.5,
-            "Quality Defects (PPM)": 100,
-            "Maintenance Costs (% of Revenue)": 2.0,
-            "Overall Equipment Effectiveness (OEE) (%)": 85.0,
-            "Energy Consumption (kWh/unit)": 1.5,
-            "Defect Rate (%)": 0.5,
-            "On-Time Delivery (%)": 98.0,
-            "Customer Satisfaction (Score)": 4.5,
-            "Production Efficiency (%)": 90.0 # Specific to Manufacturing
-        },
-        "World-Class Functional Best": {
-            "Safety Incidents (TRIR)": 0.1,
-            "Quality Defects (PPM)": 10,
-            "Maintenance Costs (% of Revenue)": 0.5,
-            "Overall Equipment Effectiveness (OEE) (%)": 95.0,
-            "Energy Consumption (kWh/unit)": 0.8,
-            "Defect Rate (%)": 0.1,
-            "On-Time Delivery (%)": 99.9,
-            "Customer Satisfaction (Score)": 4.9,
-            "Production Efficiency (%)": 98.0 # Specific to Manufacturing
-        }
-    },
-    "Service": {
-        "Industry Best": {
-            "Safety Incidents (TRIR)": 0.8,
-            "Quality Defects (PPM)": 50, # Reinterpreted as Service Errors per Million Interactions
-            "Maintenance Costs (% of Revenue)": 1.0, # IT/Facility maintenance relevant
-            "Overall Equipment Effectiveness (OEE) (%)": 90.0, # System uptime/availability
-            "Energy Consumption (kWh/unit)": 0.7, # Per service unit or transaction
-            "Defect Rate (%)": 0.1, # Service error rate
-            "On-Time Delivery (%)": 95.0, # Service delivery timeliness
-            "Customer Satisfaction (Score)": 4.2,
-            "Employee Turnover (%)": 15.0 # Specific to Service
-        },
-        "World-Class Functional Best": {
-            "Safety Incidents (TRIR)": 0.2,
-            "Quality Defects (PPM)": 5,
-            "Maintenance Costs (% of Revenue)": 0.2,
-            "Overall Equipment Effectiveness (OEE) (%)": 99.5,
-            "Energy Consumption (kWh/unit)": 0.3,
-            "Defect Rate (%)": 0.01,
-            "On-Time Delivery (%)": 99.0,
-            "Customer Satisfaction (Score)": 4.8,
-            "Employee Turnover (%)": 5.0 # Specific to Service
-        }
-    },
-    "Healthcare": {
-        "Industry Best": {
-            "Safety Incidents (TRIR)": 1.2, # Staff safety incidents
-            "Quality Defects (PPM)": 200, # Medical errors per patient interactions
-            "Maintenance Costs (% of Revenue)": 3.0, # Medical equipment/facility
-            "Overall Equipment Effectiveness (OEE) (%)": 80.0, # Medical device uptime
-            "Energy Consumption (kWh/unit)": 2.0, # Per bed or patient day
-            "Defect Rate (%)": 1.0, # Hospital acquired infection rate or readmission
-            "On-Time Delivery (%)": 90.0, # Timeliness of patient care
-            "Customer Satisfaction (Score)": 3.8, # Patient satisfaction
-            "Patient Wait Time (min)": 30.0, # Specific to Healthcare
-            "Bed Occupancy (%)": 85.0 # Specific to Healthcare
-        },
-        "World-Class Functional Best": {
-            "Safety Incidents (TRIR)": 0.3,
-            "Quality Defects (PPM)": 20,
-            "Maintenance Costs (% of Revenue)": 1.0,
-            "Overall Equipment Effectiveness (OEE) (%)": 90.0,
-            "Energy Consumption (kWh/unit)": 1.0,
-            "Defect Rate (%)": 0.2,
-            "On-Time Delivery (%)": 98.0,
-            "Customer Satisfaction (Score)": 4.7,
-            "Patient Wait Time (min)": 10.0,
-            "Bed Occupancy (%)": 95.0
-        }
-    }
-}
 
 @app.route("/benchmarking", methods=["GET", "POST"])
 def benchmarking_page():
     comparison_results_list = []
+    advice = []
     plot_data = None
     # Define dummy_form_data for initial page load (GET request)
     dummy_form_data = {"industry": "Manufacturing"} # Set a default industry
 
     if request.method == "POST":
-        user_metrics = {
-            "industry": request.form['industrySelect'],
-            "Safety Incidents (TRIR)": float(request.form['safety_incidents']),
-            "Quality Defects (PPM)": float(request.form['quality_defects']),
-            "Maintenance Costs (% of Revenue)": float(request.form['maintenance_costs']),
-            "Overall Equipment Effectiveness (OEE) (%)": float(request.form['oee']),
-            "Energy Consumption (kWh/unit)": float(request.form['energy_consumption']),
-            "Defect Rate (%)": float(request.form['defect_rate']),
-            "On-Time Delivery (%)": float(request.form['on_time_delivery']),
-            "Customer Satisfaction (Score)": float(request.form['customer_satisfaction']),
-        }
-        if user_metrics["industry"] == "Manufacturing":
-             user_metrics["Production Efficiency (%)"] = float(request.form['production_efficiency'])
-        elif user_metrics["industry"] == "Service":
-             user_metrics["Employee Turnover (%)"] = float(request.form['employee_turnover'])
-        elif user_metrics["industry"] == "Healthcare":
-             user_metrics["Patient Wait Time (min)"] = float(request.form['patient_wait_time'])
-             user_metrics["Bed Occupancy (%)"] = float(request.form['bed_occupancy'])
-
-
-        selected_industry_benchmarks = BENCHMARKS.get(user_metrics['industry'], {})
+        industry = request.form.get('industry') or request.form.get('industrySelect', '')
+        dummy_form_data["industry"] = industry
+        # Only metrics the form actually filled in are compared
+        user_metrics = {metric: float(request.form[field]) for metric, field in METRIC_FORM_FIELDS.items()
+                        if request.form.get(field, '').strip()}
+
+        index = benchmark_index()
+        industry_id = index.industry_ids.get(industry, -1)
+        metrics = [metric for metric in user_metrics if metric in index.metric_ids]
+        with timed('aggregate'):
+            comparison = index.compare([industry_id] * len(metrics),
+                                       [index.metric_ids[metric] for metric in metrics],
+                                       [user_metrics[metric] for metric in metrics])
+        metrics = [metric for metric, known in zip(metrics, comparison["known"]) if known]
 
         bar_chart_data = []
 
-        for metric, user_value in user_metrics.items():
-            if metric == "industry": continue
-
-            industry_best = selected_industry_benchmarks.get("Industry Best", {}).get(metric)
-            world_class_best = selected_industry_benchmarks.get("World-Class Functional Best", {}).get(metric)
-
-            if industry_best is not None and world_class_best is not None:
-                gap_industry = user_value - industry_best
-                gap_world_class = user_value - world_class_best
-                status_industry = "Below" if gap_industry > 0 else ("At Par" if gap_industry == 0 else "Above")
-                status_world_class = "Below" if gap_world_class > 0 else ("At Par" if gap_world_class == 0 else "Above")
-
-                comparison_results_list.append({
-                    "Metric": metric,
-                    "Your Value": user_value,
-                    "Industry Best": industry_best,
-                    "World-Class Best": world_class_best,
-                    "Gap to Industry": f"{gap_industry:.2f}",
-                    "Status vs. Industry": status_industry,
-                    "Gap to World-Class": f"{gap_world_class:.2f}",
-                    "Status vs. World-Class": status_world_class
-                })
-                bar_chart_data.append({
-                    "Metric": metric,
-                    "Your Value": user_value,
-                    "Industry Best": industry_best,
-                    "World-Class Best": world_class_best
-                })
+        for i, metric in enumerate(metrics):
+            user_value = user_metrics[metric]
+            industry_best = float(comparison["Industry Best"][i])
+            world_class_best = float(comparison["World-Class Best"][i])
+
+            comparison_results_list.append({
+                "Metric": metric,
+                "Your Value": user_value,
+                "Industry Best": industry_best,
+                "World-Class Best": world_class_best,
+                "Is_Higher_Better": bool(comparison["Higher Is Better"][i]),
+                "Gap to Industry": f"{comparison['Gap to Industry'][i]:.2f}",
+                "Gap to Industry (%)": round(float(comparison["Gap % to Industry"][i]), 2),
+                "Status vs. Industry": BENCHMARK_STATUSES[comparison["Status vs. Industry"][i]],
+                "Gap to World-Class": f"{comparison['Gap to World-Class'][i]:.2f}",
+                "Gap to World-Class (%)": round(float(comparison["Gap % to World-Class"][i]), 2),
+                "Status vs. World-Class": BENCHMARK_STATUSES[comparison["Status vs. World-Class"][i]]
+            })
+            bar_chart_data.append({
+                "Metric": metric,
+                "Your Value": user_value,
+                "Industry Best": industry_best,
+                "World-Class Best": world_class_best
+            })
+
+        below_industry = [r["Metric"] for r in comparison_results_list if r["Status vs. Industry"] == "Below"]
+        below_world_class = [r["Metric"] for r in comparison_results_list if r["Status vs. World-Class"] == "Below"]
+        if below_industry:
+            advice.append(f"Below Industry Best on: {', '.join(below_industry)}. Close these gaps first; "
+                          "they are where peers already perform better.")
+        elif below_world_class:
+            advice.append("At or above Industry Best on every metric. Remaining gaps to World-Class Best: "
+                          f"{', '.join(below_world_class)}.")
+        elif comparison_results_list:
+            advice.append("At or above World-Class Best on every metric compared. "
+                          "Keep monitoring to sustain this performance.")
 
         if bar_chart_data:
-            df_plot = pd.DataFrame(bar_chart_data)
-            fig = go.Figure()
-
-            fig.add_trace(go.Bar(
-                x=df_plot['Metric'],
-                y=df_plot['Your Value'],
-                name='Your Value',
-                marker_color='indianred'
-            ))
-            fig.add_trace(go.Bar(
-                x=df_plot['Metric'],
-                y=df_plot['Industry Best'],
-                name='Industry Best',
-                marker_color='lightsalmon'
-            ))
-            fig.add_trace(go.Bar(
-                x=df_plot['Metric'],
-                y=df_plot['World-Class Best'],
-                name='World-Class Best',
-                marker_color='darkblue'
-            ))
-
-            fig.update_layout(
-                barmode='group',
-                title_text='Your Performance vs. Benchmarks',
-                xaxis_title="Metric",
-                yaxis_title="Value",
-                title_x=0.5
-            )
-            plot_data = fig.to_json()
-
-
-    return render_template("benchmarking.html", comparison_results=comparison_results_list, plot_data=plot_data, benchmarks_info=BENCHMARKS, dummy_form_data=dummy_form_data)
-
-# --- Routine Dynamics Explorer Logic (From Day 4 Project) ---
+            def build_benchmark_figure():
+                columns = {field: [row[field] for row in bar_chart_data]
+                           for field in ("Metric", "Your Value", "Industry Best", "World-Class Best")}
+                fig = go.Figure()
+
+                fig.add_trace(go.Bar(
+                    x=columns['Metric'],
+                    y=columns['Your Value'],
+                    name='Your Value',
+                    marker_color='indianred'
+                ))
+                fig.add_trace(go.Bar(
+                    x=columns['Metric'],
+                    y=columns['Industry Best'],
+                    name='Industry Best',
+                    marker_color='lightsalmon'
+                ))
+                fig.add_trace(go.Bar(
+                    x=columns['Metric'],
+                    y=columns['World-Class Best'],
+                    name='World-Class Best',
+                    marker_color='darkblue'
+                ))
+
+                fig.update_layout(
+                    barmode='group',
+                    title_text='Your Performance vs. Benchmarks',
+                    xaxis_title="Metric",
+                    yaxis_title="Value",
+                    title_x=0.5
+                )
+                return fig
+
+            plot_data = figure_cache.get_or_build('benchmark_bar', bar_chart_data, build_benchmark_figure)
+
+
+    return render_template("benchmarking.html", comparison_results=comparison_results_list, advice=advice, plot_data=plot_data, benchmarks_info=BENCHMARKS, dummy_form_data=dummy_form_data, active_page='benchmarking')
+
+@app.route("/benchmarking/bulk", methods=["POST"])
+def bulk_benchmarking():
+    """Benchmark an uploaded table (file field "benchmark_file") or a JSON body of rows.
+
+    Responds with JSON {"results": [...], "summary": {...}}, or with the
+    results as CSV when called with ?format=csv.
+    """
+    try:
+        if 'benchmark_file' in request.files and request.files['benchmark_file'].filename:
+            benchmark_file = request.files['benchmark_file']
+            table = read_benchmark_table(benchmark_file.stream, benchmark_file.filename)
+        elif request.is_json:
+            table = benchmark_table_from_json(request.get_json())
+        else:
+            return jsonify({"error": "Upload a benchmark_file or send a JSON body"}), 400
+        with timed('aggregate'):
+            results, summary = bulk_benchmark(table)
+    except (ValueError, KeyError, pd.errors.ParserError) as exc:
+        return jsonify({"error": str(exc)}), 400
+
+    if request.args.get('format') == 'csv':
+        return app.response_class(results.to_csv(index=False), mimetype='text/csv')
+    return app.response_class(
+        '{"results":' + results.to_json(orient="records") + ',"summary":' + json.dumps(summary) + '}',
+        mimetype='application/json')
+
+
 @app.route("/routines", methods=["GET", "POST"])
 def routines_page():
     routine_results = []
+    routine_analysis_results = []
     routine_advice = []
+    conformance_score = None
+    # The form posts ideal/actual; documented/delegate are the original field names.
+    documented_routine = request.form.get("ideal_routine", request.form.get("documented_routine", "")).strip()
+    delegate_routine = request.form.get("actual_routine", request.form.get("delegate_routine", "")).strip()
 
     if request.method == "POST":
-        delegate_routine = request.form.get("delegate_routine", "").strip()
-        documented_routine = request.form.get("documented_routine", "").strip()
-
         if delegate_routine and documented_routine:
             delegate_steps = [s.strip() for s in delegate_routine.split(',') if s.strip()]
             documented_steps = [s.strip() for s in documented_routine.split(',') if s.strip()]
 
-            # 1. Compare Step Presence
-            for doc_step in documented_steps:
-                if doc_step not in delegate_steps:
-                    routine_results.append({"Step": doc_step, "Source": "Documented", "Status": "Omitted by Delegate"})
-                else:
-                    routine_results.append({"Step": doc_step, "Source": "Documented", "Status": "Followed"})
-
-            for del_step in delegate_steps:
-                if del_step not in documented_steps:
-                    routine_results.append({"Step": del_step, "Source": "Delegate", "Status": "Added by Delegate"})
-
-            # 2. Compare Step Order (simplified check)
-            order_mismatch = False
-            if len(delegate_steps) == len(documented_steps):
-                if delegate_steps != documented_steps:
-                    order_mismatch = True
-            else: # If lengths are different, order is implicitly mismatched for common steps
-                common_steps_doc_order = [s for s in documented_steps if s in delegate_steps]
-                common_steps_del_order = [s for s in delegate_steps if s in documented_steps]
-                if common_steps_doc_order != common_steps_del_order:
-                    order_mismatch = True
+            conformance = check_routine_conformance(documented_steps, delegate_steps)
+            routine_analysis_results = conformance["alignment"]
+            conformance_score = round(conformance["score"] * 100, 1)
 
+            # Per-step summary: documented steps in order, then delegate additions
+            for row in routine_analysis_results:
+                if row["Ideal_Step"]:
+                    routine_results.append({"Step": row["Ideal_Step"], "Source": "Documented", "Status": row["Status"]})
+            for added_step in conformance["added"]:
+                routine_results.append({"Step": added_step, "Source": "Delegate", "Status": ROUTINE_STEP_ADDED})
 
             # Generate Advice based on findings
-            omitted_steps = [r['Step'] for r in routine_results if r['Status'] == 'Omitted by Delegate']
-            added_steps = [r['Step'] for r in routine_results if r['Status'] == 'Added by Delegate']
-            followed_steps_count = len([r for r in routine_results if r['Status'] == 'Followed'])
+            omitted_steps = conformance["omitted"]
+            added_steps = conformance["added"]
+            reordered_steps = conformance["reordered"]
+            order_mismatch = bool(reordered_steps)
+            followed_steps_count = len(conformance["followed"])
             total_documented_steps = len(documented_steps)
 
             if not omitted_steps and not added_steps and not order_mismatch:
@@ -381,76 +512,64 @@ def routines_page():
                 if added_steps:
                     routine_advice.append(f"**Added Steps Detected:** The delegate added the following steps: {', '.join(added_steps)}. While some additions might be positive adaptations, unauthorized additions can introduce variability and unforeseen risks. This suggests a deviation from the documented process, which can sometimes be a sign of 'workarounds' or 'drift'. Analyze these additions to understand if they are beneficial 'work-arounds' (positive drift) that should be incorporated, or unsafe 'work-arounds' (negative drift) that need correction. This relates to **Sensitivity to Operations** – understanding what is actually happening.")
                 if order_mismatch:
-                    routine_advice.append("**Step Reordering Detected:** The sequence of steps differed from the documented procedure. Order is often critical in complex routines. This signifies a form of routine drift. Analyze if the reordering was a necessary adaptation or a source of potential error. This is crucial for **Deference to Expertise** – ensuring the best method is followed regardless of hierarchy, and counteracting the **Normalization of Deviation**.")
+                    routine_advice.append(f"**Reordered Steps Detected:** The delegate performed the following steps out of the documented sequence: {', '.join(reordered_steps)}. Order is often critical in complex routines. This signifies a form of routine drift. Analyze if the reordering was a necessary adaptation or a source of potential error. This is crucial for **Deference to Expertise** – ensuring the best method is followed regardless of hierarchy, and counteracting the **Normalization of Deviation**.")
 
                 if (followed_steps_count / total_documented_steps) < 0.8 and not omitted_steps and not added_steps and not order_mismatch: # edge case for very few followed steps if logic above wasn't perfect
                     routine_advice.append("Significant deviations from the documented routine were observed. This indicates potential gaps in training, procedure clarity, or a 'normalization of deviation.'")
                 elif not routine_advice: # Fallback for minor, hard-to-categorize drifts
                      routine_advice.append("Subtle deviations or inconsistencies in the routine were identified. Even small variations can accumulate and lead to significant risks over time (e.g., 'Normalization of Deviation'). Foster a culture of **Chronic Unease** to identify and address these minor drifts before they become major issues.")
 
-    return render_template("routines.html", routine_results=routine_results, routine_advice=routine_advice)
-
-# --- Risk Strategy Navigator Logic (New Module) ---
-# Define scores for likelihood and impact
-LIKELIHOOD_SCORES = {
-    "Rare": 1,
-    "Unlikely": 2,
-    "Possible": 3,
-    "Likely": 4,
-    "Almost Certain": 5
-}
-
-IMPACT_SCORES = {
-    "Insignificant": 1,
-    "Minor": 2,
-    "Moderate": 3,
-    "Major": 4,
-    "Catastrophic": 5
-}
-
-def calculate_risk_score(likelihood, impact):
+    return render_template("routines.html", routine_results=routine_results,
+                           routine_analysis_results=routine_analysis_results, routine_advice=routine_advice,
+                           conformance_score=conformance_score, ideal_routine_input=documented_routine,
+                           actual_routine_input=delegate_routine, active_page='routines')
+
+
+@app.route("/routines/batch", methods=["POST"])
+def batch_routines():
+    """Check an uploaded event log (file field "event_log") against a documented routine.
+
+    Form fields: "documented_routine" (comma-separated steps) and optionally
+    "grouped=true" when every case's events are contiguous in the log, which
+    skips the on-disk staging pass.
+    """
+    documented_routine = request.form.get("documented_routine", request.form.get("ideal_routine", ""))
+    documented_steps = [s.strip() for s in documented_routine.split(',') if s.strip()]
+    event_log = request.files.get('event_log')
+    if not documented_steps or event_log is None or not event_log.filename:
+        return jsonify({"error": "Provide documented_routine and an event_log upload"}), 400
+
+    upload_format = incident_upload_format(event_log.filename)
+    skipped = []
     try:
-        return LIKELIHOOD_SCORES[likelihood] * IMPACT_SCORES[impact]
-    except KeyError:
-        return 0 # Handle cases where input might not match predefined levels
-
-def classify_risk(score):
-    if score >= 16: # Example threshold for High
-        return "High"
-    elif score >= 9: # Example threshold for Medium
-        return "Medium"
-    else:
-        return "Low"
-
-def get_risk_category_and_advice(likelihood_level, impact_level):
-    likelihood_score = LIKELIHOOD_SCORES.get(likelihood_level, 0)
-    impact_score = IMPACT_SCORES.get(impact_level, 0)
-
-    risk_advice = ""
-    category = "Other Risks" # Default category
-
-    if likelihood_score >= 4 and impact_score >= 4: # High Severity, High Frequency (HSHF)
-        category = "High Severity, High Frequency (HSHF) Risks"
-        risk_advice = "HSHF: These are urgent, high-priority risks. They demand **Immediate, Radical Intervention**, focusing on **Root Cause Elimination** and fundamental **Process Redesign**. Strategies include applying **TRIZ principles** like 'Segmentation' or 'Prior Action' to break down the problem or prevent it entirely. Reconsider fundamental assumptions and eliminate the conditions that allow the risk to manifest frequently with high impact. These often reflect a 'Fixes That Fail' or 'Shifting the Burden' archetype if not addressed systemically."
-    elif likelihood_score <= 2 and impact_score >= 4: # High Severity, Low Frequency (HSLF)
-        category = "High Severity, Low Frequency (HSLF) Risks"
-        risk_advice = "HSLF: These are 'Black Swan' type risks that can be catastrophic but are rare. Focus on **Robust Design**, **Redundancy** (e.g., multiple layers of defense), and fostering a culture of **Chronic Unease**. Implement **Resilience Planning** and **Contingency Reserves**. The goal is not prevention of the event itself (as it's rare) but minimization of its impact and ensuring rapid recovery. This aligns with a 'Limits to Growth' or 'Tragedy of the Commons' archetype if the system is allowed to deplete its own resilience."
-    elif likelihood_score >= 4 and impact_score <= 2: # Low Severity, High Frequency (LSHF)
-        category = "Low Severity, High Frequency (LSHF) Risks"
-        risk_advice = "LSHF: These are nuisance risks that can erode morale and efficiency over time. Focus on **Process Optimization** and **Standardization**. Implement quick, iterative improvements. While individually minor, their cumulative effect can be significant (similar to 'Accumulation'). Automate where possible to reduce human error. Don't let these become 'Normalized Deviations'."
-    else:
-        risk_advice = "General risk management advice: For 'Other Risks' (Medium/Low Priority), prioritize based on score and available resources. Implement standard controls, monitor regularly, and review periodically."
+        events = iter_event_log(open_incident_upload(event_log.stream, event_log.filename), upload_format,
+                                skipped=lambda: skipped.append(1))
+        grouped = request.form.get('grouped', '').lower() in ('1', 'true', 'yes', 'on')
+        cases = iter_cases_grouped(events) if grouped else iter_cases_staged(events)
+        with timed('aggregate'):
+            summary = batch_routine_conformance(documented_steps, cases)
+    except (ValueError, KeyError, UnicodeDecodeError, OSError, csv.Error) as exc:
+        return jsonify({"error": str(exc)}), 400
+    summary["skipped_lines"] = len(skipped)
+    return jsonify(summary)
+
 
-    return category, risk_advice
+def get_risk_store_id():
+    """Return the caller's risk store ID, allocating one on first use."""
+    if 'risk_store_id' not in session:
+        session['risk_store_id'] = uuid.uuid4().hex
+    return session['risk_store_id']
 
 
 @app.route("/risk_navigator", methods=["GET", "POST"])
 def risk_navigator_page():
-    if 'risks_data' not in session:
-        session['risks_data'] = []
+    store_id = get_risk_store_id()
 
     if request.method == "POST":
-        if 'risk_name' in request.form:
+        if 'clear_all_risks' in request.form:
+            storage.risk_repository.clear(store_id)
+            return redirect(url_for('risk_navigator_page'))
+        elif 'risk_name' in request.form:
             risk_name = request.form['risk_name']
             likelihood = request.form['likelihood']
             impact = request.form['impact']
@@ -458,108 +577,234 @@ def risk_navigator_page():
             if risk_name.strip() and likelihood and impact:
                 score = calculate_risk_score(likelihood, impact)
                 priority = classify_risk(score)
-                category, advice = get_risk_category_and_advice(likelihood, impact)
-
-                session['risks_data'].append({
-                    "Risk Name": risk_name,
-                    "Likelihood": likelihood,
-                    "Impact": impact,
-                    "Score": score,
-                    "Priority": priority,
-                    "Category": category,
-                    "Advice": advice
-                })
-        elif 'clear_all_risks' in request.form:
-            session['risks_data'] = []
-            return redirect(url_for('risk_navigator_page'))
-
-    # Prepare data for Plotly heatmap
-    risk_matrix_data = [[0 for _ in range(5)] for _ in range(5)]
-    x_labels = list(IMPACT_SCORES.keys())
-    y_labels = list(LIKELIHOOD_SCORES.keys())
-
-    # Map scores to colors for the heatmap background
-    colorscale_values = [
-        [0, 'rgb(144, 238, 144)'],    # Light Green (Low)
-        [0.5, 'rgb(255, 255, 0)'],    # Yellow (Medium)
-        [0.8, 'rgb(255, 165, 0)'],    # Orange (Medium-High)
-        [1, 'rgb(255, 0, 0)']       # Red (High)
-    ]
+                category, _ = get_risk_category_and_advice(likelihood, impact)
 
-    # Create the heatmap background
-    z_values = [
-        [1, 2, 3, 4, 5],
-        [2, 4, 6, 8, 10],
-        [3, 6, 9, 12, 15],
-        [4, 8, 12, 16, 20],
-        [5, 10, 15, 20, 25]
-    ]
+                storage.risk_repository.append(store_id, [(risk_name, likelihood, impact, score, priority, category)])
 
-    heatmap_trace = go.Heatmap(
-        z=z_values,
-        x=x_labels,
-        y=y_labels,
-        colorscale='Viridis', # You can choose a different colorscale here if 'Viridis' isn't what you want
-        showscale=True,
-        hovertemplate="Likelihood: %{y}<br>Impact: %{x}<br>Score: %{z}<extra></extra>"
-    )
-
-    # Add submitted risks as scatter points on top of the heatmap
-    risk_points = []
-    if session['risks_data']:
-        for risk in session['risks_data']:
-            risk_points.append(go.Scatter(
-                x=[risk['Impact']],
-                y=[risk['Likelihood']],
-                mode='markers',
-                marker=dict(symbol='circle', size=15, color='black',
-                            line=dict(width=2, color='white')),
-                name=f"Risk: {risk['Risk Name']}",
-                hoverinfo='text',
-                hovertext=f"<b>Risk:</b> {risk['Risk Name']}<br>"
-                            f"<b>Likelihood:</b> {risk['Likelihood']}<br>"
-                            f"<b>Impact:</b> {risk['Impact']}<br>"
-                            f"<b>Score:</b> {risk['Score']}<br>"
-                            f"<b>Priority:</b> {risk['Priority']}<br>"
-                            f"<b>Category:</b> {risk['Category']}<br>"
-                            f"<b>Advice:</b> {risk['Advice']}",
-                showlegend=False
-            ))
-
-    risk_fig = go.Figure(data=[heatmap_trace] + risk_points)
-
-    risk_fig.update_layout(
-        title_text='Risk Assessment Matrix',
-        xaxis_title='Impact',
-        yaxis_title='Likelihood',
-        xaxis_type='category',
-        yaxis_type='category',
-        xaxis_tickangle=-45,
-        title_x=0.5
-    )
-
-    plot_data = risk_fig.to_json()
-
-    # Categorize risks for display
-    hshf_risks = [r for r in session['risks_data'] if r['Category'] == "High Severity, High Frequency (HSHF) Risks"]
-    hslf_risks = [r for r in session['risks_data'] if r['Category'] == "High Severity, Low Frequency (HSLF) Risks"] # CORRECTED LINE
-    other_risks = [r for r in session['risks_data'] if r['Category'] == "Other Risks" or r['Category'] == "Low Severity, High Frequency (LSHF) Risks"]
-
-    # Get distinct advice for each category, as multiple risks might have the same advice
-    hshf_advice = list(set([r['Advice'] for r in hshf_risks]))
-    hslf_advice = list(set([r['Advice'] for r in hslf_risks]))
-    other_advice = list(set([r['Advice'] for r in other_risks]))
+    cell_counts = storage.risk_repository.cell_counts(store_id)
 
+    if RISK_MATRIX_MODE == 'points':
+        # Keyed on the store's version, so a cache hit reads no risks at all.
+        plot_data = figure_cache.get_or_build(
+            'risk_heatmap', [store_id, storage.risk_repository.version(store_id)],
+            lambda: build_risk_points_figure(list(storage.risk_repository.iter_all(store_id))))
+    else:
+        cells = sorted(cell_counts.items())
+        plot_data = figure_cache.get_or_build('risk_matrix_cells', cells, lambda: build_risk_cells_figure(cell_counts))
+
+    # Group totals and advice come from the cell counters; the risks in each
+    # group are listed by the template a page at a time from /api/risks.
+    with timed('aggregate'):
+        group_totals = Counter()
+        group_advice = {group: [] for group in RISK_DISPLAY_GROUPS.values()}
+        for (likelihood, impact), count in cell_counts.items():
+            category, advice = get_risk_category_and_advice(likelihood, impact)
+            group = RISK_DISPLAY_GROUPS[category]
+            group_totals[group] += count
+            if advice not in group_advice[group]:
+                group_advice[group].append(advice)
+    group_categories = {group: [category for category in RISK_CATEGORIES if RISK_DISPLAY_GROUPS[category] == group]
+                        for group in group_advice}
 
     return render_template("risk_navigator.html",
-                           risks=session['risks_data'],
+                           risk_count=sum(cell_counts.values()),
                            plot_data=plot_data,
-                           hshf_risks=hshf_risks,
-                           hslf_risks=hslf_risks,
-                           other_risks=other_risks,
-                           hshf_advice=hshf_advice,
-                           hslf_advice=hslf_advice,
-                           other_advice=other_advice)
+                           hshf_advice=group_advice['hshf'],
+                           hslf_advice=group_advice['hslf'],
+                           other_advice=group_advice['other'],
+                           group_totals=group_totals,
+                           group_categories=group_categories,
+                           page_size=RISK_LIST_LIMIT,
+                           last_risk_import=session.pop('last_risk_import', None))
+
+@app.route("/risk_navigator/cell")
+def risk_matrix_cell():
+    """Return the risks in one Likelihood x Impact cell, a page at a time.
+
+    Query parameters: likelihood, impact, and `after` (the seq of the last risk
+    already shown). The response carries the cell's advice once rather than
+    per risk, and `next_after` for the following page (null on the last page).
+    """
+    likelihood = request.args.get('likelihood', '')
+    impact = request.args.get('impact', '')
+    if likelihood not in LIKELIHOOD_SCORES or impact not in IMPACT_SCORES:
+        return jsonify({"error": "Unknown likelihood or impact"}), 400
+    after = max(request.args.get('after', 0, type=int), 0)
+
+    risks = storage.risk_repository.cell_page(get_risk_store_id(), likelihood, impact, after or None,
+                                              RISK_CELL_PAGE_SIZE + 1)
+    has_more = len(risks) > RISK_CELL_PAGE_SIZE
+    risks = risks[:RISK_CELL_PAGE_SIZE]
+    category, advice = get_risk_category_and_advice(likelihood, impact)
+    return jsonify({
+        "likelihood": likelihood,
+        "impact": impact,
+        "category": category,
+        "advice": advice,
+        "risks": _api_records(risks),
+        "next_after": risks[-1]["seq"] if has_more else None,
+    })
+
+@app.route("/risk_navigator/import", methods=["POST"])
+def import_risk_register():
+    """Score and store a risk register (file field "risk_register" or a JSON body).
+
+    JSON requests get a JSON summary back; form uploads are redirected to the
+    Risk Navigator, which shows the summary.
+    """
+    wants_json = request.is_json
+    try:
+        if 'risk_register' in request.files and request.files['risk_register'].filename:
+            risk_file = request.files['risk_register']
+            register = read_risk_register(risk_file.stream, risk_file.filename)
+        elif request.is_json:
+            register = risk_register_from_json(request.get_json())
+        else:
+            raise ValueError("Upload a risk_register file or send a JSON body")
+        with timed('aggregate'):
+            scored, skipped = score_risk_register(register)
+    except (ValueError, KeyError, pd.errors.ParserError) as exc:
+        if wants_json:
+            return jsonify({"error": str(exc)}), 400
+        session['last_risk_import'] = {'error': str(exc)}
+        return redirect(url_for('risk_navigator_page'))
+
+    store_scored_risks(get_risk_store_id(), scored)
+    with timed('aggregate'):
+        summary = {"imported": int(len(scored)), "skipped": skipped, **summarise_risk_register(scored)}
+    if wants_json:
+        return jsonify(summary)
+    session['last_risk_import'] = {'imported': summary['imported'], 'skipped': skipped}
+    return redirect(url_for('risk_navigator_page'))
+
+# --- JSON API ---
+# Read-only, cursor-paginated listings of the caller's incidents and risks.
+# `limit` defaults to INCIDENTS_PAGE_SIZE (at most API_MAX_PAGE_SIZE) and
+# `next_cursor` resumes after the last record of a page; a cursor is only
+# valid for the sort order it was issued under. `since` and `until` bound
+# recording time as ISO 8601 (UTC unless an offset is given) or UNIX seconds.
+API_MAX_PAGE_SIZE = 500
+
+
+def _api_time_arg(name):
+    value = request.args.get(name)
+    if not value:
+        return None
+    try:
+        return parse_timestamp(value)
+    except ValueError:
+        raise ValueError(f"{name} must be an ISO 8601 timestamp or UNIX seconds") from None
+
+
+def _api_choice_arg(name, choices):
+    value = request.args.get(name) or None
+    if value is not None and value not in choices:
+        raise ValueError(f"{name} must be one of: {', '.join(choices)}")
+    return value
+
+
+def _api_choices_arg(name, choices):
+    values = [value for value in request.args.getlist(name) if value]
+    for value in values:
+        if value not in choices:
+            raise ValueError(f"{name} must be one of: {', '.join(choices)}")
+    return values
+
+
+def _api_sort_arg(sorts):
+    """Return (sort, descending) from ?sort=, where a leading '-' means descending."""
+    sort = request.args.get('sort') or sorts[0]
+    descending = sort.startswith('-')
+    sort = sort.lstrip('-')
+    if sort not in sorts:
+        raise ValueError(f"sort must be one of: {', '.join(sorts)} (prefix '-' for descending)")
+    return sort, descending
+
+
+def _api_cursor_arg(parts):
+    value = request.args.get('cursor')
+    if not value:
+        return None
+    try:
+        cursor = tuple(int(part) for part in value.split(':'))
+    except ValueError:
+        cursor = ()
+    if len(cursor) != parts:
+        raise ValueError("Malformed cursor")
+    return cursor
+
+
+def _api_limit_arg():
+    return min(max(request.args.get('limit', INCIDENTS_PAGE_SIZE, type=int), 1), API_MAX_PAGE_SIZE)
+
+
+def _api_time(seconds):
+    # Rows stored before times were range-checked may hold unrepresentable values.
+    try:
+        return datetime.fromtimestamp(seconds, timezone.utc).isoformat()
+    except (ValueError, OverflowError, OSError):
+        return None
+
+
+def _api_records(records):
+    for record in records:
+        record["recorded_at"] = _api_time(record["recorded_at"])
+        if "occurred_at" in record:
+            record["occurred_at"] = _api_time(record["occurred_at"])
+    return records
+
+
+@app.route("/api/incidents")
+def api_incidents():
+    """List incidents. Filters: severity, category, since, until; sort: recorded_at or -recorded_at."""
+    try:
+        severity = _api_choice_arg('severity', SEVERITY_LEVELS)
+        sort, descending = _api_sort_arg(('recorded_at',))
+        cursor = _api_cursor_arg(1)
+        since, until = _api_time_arg('since'), _api_time_arg('until')
+    except ValueError as exc:
+        return jsonify({"error": str(exc)}), 400
+    limit = _api_limit_arg()
+
+    incidents = storage.incident_repository.query(get_incident_store_id(), severity=severity,
+                                          category=request.args.get('category') or None, since=since, until=until,
+                                          after=cursor[0] if cursor else None, descending=descending,
+                                          limit=limit + 1)
+    incidents, next_cursor = split_page(incidents, limit, incident_cursor)
+    return jsonify({"incidents": _api_records(incidents), "next_cursor": next_cursor})
+
+
+@app.route("/api/incidents/trends")
+def api_incident_trends():
+    """Incident counts per label and occurrence-time bucket. resolution: hour, day or week; since, until."""
+    try:
+        resolution = _api_choice_arg('resolution', TREND_RESOLUTIONS) or 'day'
+        trends = incident_trends(get_incident_store_id(), resolution,
+                                 since=_api_time_arg('since'), until=_api_time_arg('until'))
+    except ValueError as exc:
+        return jsonify({"error": str(exc)}), 400
+    trends['buckets'] = [_api_time(bucket) for bucket in trends['buckets']]
+    trends['high_severity_spikes'] = [_api_time(bucket) for bucket in trends['high_severity_spikes']]
+    return jsonify(trends)
+
+
+@app.route("/api/risks")
+def api_risks():
+    """List risks. Filters: priority, category (both repeatable), since, until; sort: [-]recorded_at or [-]score."""
+    try:
+        priorities = _api_choices_arg('priority', RISK_PRIORITIES)
+        categories = _api_choices_arg('category', RISK_CATEGORIES)
+        sort, descending = _api_sort_arg(RISK_SORTS)
+        cursor = _api_cursor_arg(2 if sort == 'score' else 1)
+        since, until = _api_time_arg('since'), _api_time_arg('until')
+    except ValueError as exc:
+        return jsonify({"error": str(exc)}), 400
+    limit = _api_limit_arg()
+
+    risks = query_risks(get_risk_store_id(), priorities=priorities, categories=categories, since=since, until=until,
+                        sort=sort, descending=descending, cursor=cursor, limit=limit + 1)
+    risks, next_cursor = split_page(risks, limit, lambda risk: risk_cursor(risk, sort))
+    return jsonify({"risks": _api_records(risks), "next_cursor": next_cursor})
 
 if __name__ == "__main__":
-    app.run(debug=True)
\ No newline at end of file
+    app.run(debug=True)
@@ -0,0 +1,339 @@
+import json
+import os
+
+from startup import pd, np, shared_table
+
+# --- Performance Benchmarker Logic (From Day 3 Project) ---
+BENCHMARKS = {
+    "Manufacturing": {
+        "Industry Best": {
+            "Safety Incidents (TRIR)": 0.5,
+            "Quality Defects (PPM)": 100,
+            "Maintenance Costs (% of Revenue)": 2.0,
+            "Overall Equipment Effectiveness (OEE) (%)": 85.0,
+            "Energy Consumption (kWh/unit)": 1.5,
+            "Defect Rate (%)": 0.5,
+            "On-Time Delivery (%)": 98.0,
+            "Customer Satisfaction (Score)": 4.5,
+            "Production Efficiency (%)": 90.0 # Specific to Manufacturing
+        },
+        "World-Class Functional Best": {
+            "Safety Incidents (TRIR)": 0.1,
+            "Quality Defects (PPM)": 10,
+            "Maintenance Costs (% of Revenue)": 0.5,
+            "Overall Equipment Effectiveness (OEE) (%)": 95.0,
+            "Energy Consumption (kWh/unit)": 0.8,
+            "Defect Rate (%)": 0.1,
+            "On-Time Delivery (%)": 99.9,
+            "Customer Satisfaction (Score)": 4.9,
+            "Production Efficiency (%)": 98.0 # Specific to Manufacturing
+        }
+    },
+    "Service": {
+        "Industry Best": {
+            "Safety Incidents (TRIR)": 0.8,
+            "Quality Defects (PPM)": 50, # Reinterpreted as Service Errors per Million Interactions
+            "Maintenance Costs (% of Revenue)": 1.0, # IT/Facility maintenance relevant
+            "Overall Equipment Effectiveness (OEE) (%)": 90.0, # System uptime/availability
+            "Energy Consumption (kWh/unit)": 0.7, # Per service unit or transaction
+            "Defect Rate (%)": 0.1, # Service error rate
+            "On-Time Delivery (%)": 95.0, # Service delivery timeliness
+            "Customer Satisfaction (Score)": 4.2,
+            "Employee Turnover (%)": 15.0 # Specific to Service
+        },
+        "World-Class Functional Best": {
+            "Safety Incidents (TRIR)": 0.2,
+            "Quality Defects (PPM)": 5,
+            "Maintenance Costs (% of Revenue)": 0.2,
+            "Overall Equipment Effectiveness (OEE) (%)": 99.5,
+            "Energy Consumption (kWh/unit)": 0.3,
+            "Defect Rate (%)": 0.01,
+            "On-Time Delivery (%)": 99.0,
+            "Customer Satisfaction (Score)": 4.8,
+            "Employee Turnover (%)": 5.0 # Specific to Service
+        }
+    },
+    "Healthcare": {
+        "Industry Best": {
+            "Safety Incidents (TRIR)": 1.2, # Staff safety incidents
+            "Quality Defects (PPM)": 200, # Medical errors per patient interactions
+            "Maintenance Costs (% of Revenue)": 3.0, # Medical equipment/facility
+            "Overall Equipment Effectiveness (OEE) (%)": 80.0, # Medical device uptime
+            "Energy Consumption (kWh/unit)": 2.0, # Per bed or patient day
+            "Defect Rate (%)": 1.0, # Hospital acquired infection rate or readmission
+            "On-Time Delivery (%)": 90.0, # Timeliness of patient care
+            "Customer Satisfaction (Score)": 3.8, # Patient satisfaction
+            "Patient Wait Time (min)": 30.0, # Specific to Healthcare
+            "Bed Occupancy (%)": 85.0 # Specific to Healthcare
+        },
+        "World-Class Functional Best": {
+            "Safety Incidents (TRIR)": 0.3,
+            "Quality Defects (PPM)": 20,
+            "Maintenance Costs (% of Revenue)": 1.0,
+            "Overall Equipment Effectiveness (OEE) (%)": 90.0,
+            "Energy Consumption (kWh/unit)": 1.0,
+            "Defect Rate (%)": 0.2,
+            "On-Time Delivery (%)": 98.0,
+            "Customer Satisfaction (Score)": 4.7,
+            "Patient Wait Time (min)": 10.0,
+            "Bed Occupancy (%)": 95.0
+        }
+    }
+}
+
+BENCHMARK_TIERS = ["Industry Best", "World-Class Functional Best"]
+BENCHMARK_STATUSES = ["Above", "At Par", "Below"]
+# Comparisons shorter than this skip NumPy (see BenchmarkIndex.compare); the
+# single-site form compares at most a dozen metrics.
+BENCHMARK_VECTOR_THRESHOLD = int(os.environ.get('BENCHMARK_VECTOR_THRESHOLD', 40))
+
+# Metrics where a higher value is better; for every other metric lower is better.
+HIGHER_IS_BETTER_METRICS = {
+    "Overall Equipment Effectiveness (OEE) (%)",
+    "On-Time Delivery (%)",
+    "Customer Satisfaction (Score)",
+    "Production Efficiency (%)",
+    "Bed Occupancy (%)",
+}
+
+# Form field carrying each metric on the benchmarking page
+METRIC_FORM_FIELDS = {
+    "Safety Incidents (TRIR)": "safety_incidents",
+    "Quality Defects (PPM)": "quality_defects",
+    "Maintenance Costs (% of Revenue)": "maintenance_costs",
+    "Overall Equipment Effectiveness (OEE) (%)": "oee",
+    "Energy Consumption (kWh/unit)": "energy_consumption",
+    "Defect Rate (%)": "defect_rate",
+    "On-Time Delivery (%)": "on_time_delivery",
+    "Customer Satisfaction (Score)": "customer_satisfaction",
+    "Production Efficiency (%)": "production_efficiency",
+    "Employee Turnover (%)": "employee_turnover",
+    "Patient Wait Time (min)": "patient_wait_time",
+    "Bed Occupancy (%)": "bed_occupancy",
+}
+
+
+class BenchmarkIndex:
+    """BENCHMARKS compiled into an industry x tier x metric array.
+
+    Industries, tiers and metrics map to integer IDs, missing benchmarks are
+    NaN, and a per-metric flag records whether higher values are better. Both
+    the benchmarking page and the bulk API compare through `compare`, so status
+    is direction-aware everywhere.
+    """
+
+    def __init__(self, benchmarks, higher_is_better_metrics, tiers=BENCHMARK_TIERS):
+        self.industries = pd.Index(list(benchmarks))
+        self.tiers = pd.Index(tiers)
+        self.metrics = pd.Index(sorted({metric for industry_tiers in benchmarks.values()
+                                        for tier in tiers for metric in industry_tiers.get(tier, {})}))
+        self.industry_ids = {industry: i for i, industry in enumerate(self.industries)}
+        self.metric_ids = {metric: i for i, metric in enumerate(self.metrics)}
+
+        self.values = np.full((len(self.industries), len(self.tiers), len(self.metrics)), np.nan)
+        for i, industry in enumerate(self.industries):
+            for t, tier in enumerate(self.tiers):
+                for metric, value in benchmarks[industry].get(tier, {}).items():
+                    self.values[i, t, self.metric_ids[metric]] = value
+        self.higher_is_better = np.array([metric in higher_is_better_metrics for metric in self.metrics])
+        self.values.flags.writeable = False
+        self.higher_is_better.flags.writeable = False
+        # Row-path lookup: (industry_id, metric_id) -> (tier bests..., higher_is_better), complete pairs only.
+        self._pairs = {(i, m): tuple(float(best) for best in self.values[i, :, m]) + (bool(self.higher_is_better[m]),)
+                       for i in range(len(self.industries)) for m in range(len(self.metrics))
+                       if not np.isnan(self.values[i, :, m]).any()}
+
+    def codes(self, industries, metrics):
+        """Return (industry_ids, metric_ids) arrays for pandas Categoricals; -1 marks unknown labels."""
+        # Translated once per distinct label, then gathered per row.
+        industry_ids = np.append(self.industries.get_indexer(industries.categories), -1)[industries.codes]
+        metric_ids = np.append(self.metrics.get_indexer(metrics.categories), -1)[metrics.codes]
+        return industry_ids, metric_ids
+
+    def compare(self, industry_ids, metric_ids, values, vectorised=None):
+        """Compare `values` against both tiers for parallel arrays of industry and metric IDs.
+
+        Returns a dict of arrays. "known" flags rows with a benchmark in both
+        tiers (unknown IDs are -1); the other entries cover only those rows.
+        Gaps are the raw value minus benchmark, "Gap % ..." entries are the
+        shortfall as a percentage of the benchmark (positive means worse), and
+        status codes index BENCHMARK_STATUSES.
+
+        Fewer than BENCHMARK_VECTOR_THRESHOLD rows are compared one by one in
+        plain Python and come back as lists with the same values; `vectorised`
+        forces either path.
+        """
+        if vectorised is None:
+            vectorised = len(values) >= BENCHMARK_VECTOR_THRESHOLD
+        if not vectorised:
+            return self._compare_rows(industry_ids, metric_ids, values)
+
+        industry_ids = np.asarray(industry_ids, dtype=np.intp)
+        metric_ids = np.asarray(metric_ids, dtype=np.intp)
+        values = np.asarray(values, dtype=float)
+
+        known = (industry_ids >= 0) & (metric_ids >= 0)
+        best = np.full((len(values), len(self.tiers)), np.nan)
+        best[known] = self.values[industry_ids[known], :, metric_ids[known]]
+        known &= ~np.isnan(best).any(axis=1) & ~np.isnan(values)
+
+        best = best[known]
+        values = values[known]
+        metric_ids = metric_ids[known]
+        higher_is_better = self.higher_is_better[metric_ids]
+        # +1 where a higher value is worse, -1 where it is better
+        direction = np.where(higher_is_better, -1.0, 1.0)
+
+        result = {"known": known, "Higher Is Better": higher_is_better}
+        for t, label in ((0, "Industry"), (1, "World-Class")):
+            gap = values - best[:, t]
+            shortfall = gap * direction
+            with np.errstate(divide='ignore', invalid='ignore'):
+                gap_percent = np.where(best[:, t] != 0, shortfall / np.abs(best[:, t]) * 100, 0.0)
+            result[f"{label} Best"] = best[:, t]
+            result[f"Gap to {label}"] = gap
+            result[f"Gap % to {label}"] = gap_percent
+            result[f"Status vs. {label}"] = (np.sign(shortfall) + 1).astype(np.int8)
+        return result
+
+    def _compare_rows(self, industry_ids, metric_ids, values):
+        """compare() for short inputs, where NumPy's per-call overhead outweighs the arithmetic."""
+        labels = ("Industry", "World-Class")
+        result = {"known": [], "Higher Is Better": []}
+        for label in labels:
+            for key in (f"{label} Best", f"Gap to {label}", f"Gap % to {label}", f"Status vs. {label}"):
+                result[key] = []
+        for industry_id, metric_id, value in zip(industry_ids, metric_ids, values):
+            value = float(value)
+            pair = self._pairs.get((int(industry_id), int(metric_id)))
+            known = pair is not None and value == value
+            result["known"].append(known)
+            if not known:
+                continue
+            higher_is_better = pair[-1]
+            result["Higher Is Better"].append(higher_is_better)
+            for best, label in zip(pair, labels):
+                gap = value - best
+                shortfall = -gap if higher_is_better else gap
+                result[f"{label} Best"].append(best)
+                result[f"Gap to {label}"].append(gap)
+                result[f"Gap % to {label}"].append(shortfall / abs(best) * 100 if best != 0 else 0.0)
+                result[f"Status vs. {label}"].append((shortfall > 0) - (shortfall < 0) + 1)
+        return result
+
+
+@shared_table
+def benchmark_index():
+    """BENCHMARKS compiled into a BenchmarkIndex."""
+    return BenchmarkIndex(BENCHMARKS, HIGHER_IS_BETTER_METRICS)
+
+# --- Bulk Benchmarking ---
+# Many sites and periods are compared in one vectorised pass: the input table
+# is reshaped to one row per (site, period, industry, metric), mapped to
+# benchmark_index() IDs by categorical code, and compared column-wise.
+BULK_BENCHMARK_KEYS = ["Site", "Period", "Industry"]
+
+
+def read_benchmark_table(stream, filename):
+    """Read a bulk benchmark upload (.csv or .json/.jsonl) into a DataFrame."""
+    name = filename.lower()
+    if name.endswith('.csv'):
+        return pd.read_csv(stream)
+    if name.endswith('.jsonl'):
+        return pd.read_json(stream, lines=True)
+    if name.endswith('.json'):
+        return benchmark_table_from_json(json.load(stream))
+    raise ValueError(f"Unsupported benchmark upload: {filename!r} (expected .csv, .json or .jsonl)")
+
+
+def benchmark_table_from_json(payload):
+    """Build a DataFrame from a JSON list of rows, or an object with a "rows" list."""
+    rows = payload.get("rows") if isinstance(payload, dict) else payload
+    if not isinstance(rows, list):
+        raise ValueError('Expected a JSON list of rows or an object with a "rows" list')
+    return pd.DataFrame(rows)
+
+
+def _normalise_benchmark_input(table):
+    """Return `table` in long form with Site, Period, Industry, Metric and Your Value columns.
+
+    Wide tables carry one column per metric; long tables carry "metric" and
+    "value" columns. Key column names are matched case-insensitively.
+    """
+    renames = {column: column.strip().title() for column in table.columns
+               if isinstance(column, str) and column.strip().title() in BULK_BENCHMARK_KEYS + ["Metric", "Value"]}
+    table = table.rename(columns=renames)
+    missing = [key for key in BULK_BENCHMARK_KEYS if key not in table.columns]
+    if missing:
+        raise ValueError(f"Benchmark table is missing column(s): {', '.join(missing)}")
+    # Categorical keys keep the reshape, join and group-bys on integer codes.
+    table = table.astype({key: 'category' for key in BULK_BENCHMARK_KEYS})
+
+    if "Metric" in table.columns and "Value" in table.columns:
+        long_table = table[BULK_BENCHMARK_KEYS + ["Metric", "Value"]]
+    else:
+        metric_columns = [column for column in table.columns if column not in BULK_BENCHMARK_KEYS]
+        long_table = table.melt(id_vars=BULK_BENCHMARK_KEYS, value_vars=metric_columns,
+                                var_name="Metric", value_name="Value")
+    long_table = long_table.rename(columns={"Value": "Your Value"}).astype({"Metric": 'category'})
+    long_table["Your Value"] = pd.to_numeric(long_table["Your Value"], errors='coerce')
+    return long_table.dropna(subset=["Your Value"])
+
+
+def bulk_benchmark(table):
+    """Compare many (site, period, industry) metric sets against BENCHMARKS at once.
+
+    `table` is a DataFrame in wide form (Site, Period, Industry plus one column
+    per metric) or long form (Site, Period, Industry, Metric, Value). Metrics
+    without a benchmark for their industry, and blank values, are skipped.
+    Status takes each metric's direction from benchmark_index().
+    Returns (results, summary): one result row per compared metric, and a dict
+    of status counts plus per-metric and per-site/period aggregates.
+    """
+    long_table = _normalise_benchmark_input(table)
+
+    index = benchmark_index()
+    industry_ids, metric_ids = index.codes(long_table["Industry"].cat, long_table["Metric"].cat)
+    comparison = index.compare(industry_ids, metric_ids, long_table["Your Value"].to_numpy())
+
+    results = long_table[comparison["known"]].reset_index(drop=True)
+    results["Higher Is Better"] = comparison["Higher Is Better"]
+    for label in ("Industry", "World-Class"):
+        results[f"{label} Best"] = comparison[f"{label} Best"]
+    for label in ("Industry", "World-Class"):
+        results[f"Gap to {label}"] = comparison[f"Gap to {label}"]
+        results[f"Status vs. {label}"] = pd.Categorical.from_codes(comparison[f"Status vs. {label}"],
+                                                                   BENCHMARK_STATUSES)
+    return results, summarise_bulk_benchmark(results)
+
+
+def summarise_bulk_benchmark(results):
+    """Aggregate bulk benchmark results into status counts and per-metric/per-site summaries."""
+    below_industry = results["Status vs. Industry"] == "Below"
+    below_world_class = results["Status vs. World-Class"] == "Below"
+    grouped = results.assign(below_industry=below_industry, below_world_class=below_world_class)
+
+    by_metric = grouped.groupby("Metric", observed=True, sort=True).agg(
+        rows=("Your Value", "size"),
+        mean_gap_to_industry=("Gap to Industry", "mean"),
+        mean_gap_to_world_class=("Gap to World-Class", "mean"),
+        share_below_industry=("below_industry", "mean"),
+        share_below_world_class=("below_world_class", "mean"),
+    ).reset_index()
+    by_site_period = grouped.groupby(["Site", "Period"], observed=True, sort=True).agg(
+        metrics=("Metric", "size"),
+        below_industry=("below_industry", "sum"),
+        below_world_class=("below_world_class", "sum"),
+    ).reset_index()
+
+    def status_counts(column):
+        counts = results[column].value_counts().reindex(BENCHMARK_STATUSES, fill_value=0)
+        return {status: int(count) for status, count in counts.items()}
+
+    return {
+        "rows": int(len(results)),
+        "status_vs_industry": status_counts("Status vs. Industry"),
+        "status_vs_world_class": status_counts("Status vs. World-Class"),
+        "by_metric": json.loads(by_metric.to_json(orient="records")),
+        "by_site_period": json.loads(by_site_period.to_json(orient="records")),
+    }
@@ -0,0 +1,203 @@
+import os
+
+from startup import np
+
+# --- Near-Duplicate Detection ---
+# The same event is often reported several times in one upload, e.g. once per
+# shift. With INCIDENT_DEDUP set to 'flag' or 'merge', each upload gets a
+# NearDuplicateIndex, and a report is a near duplicate of an earlier report in
+# the same upload when both occurred on the same day (DEDUP_BUCKET) and the
+# estimated Jaccard similarity of their shingle sets is at least
+# INCIDENT_DEDUP_THRESHOLD. 'flag' stores every report and only counts the
+# near duplicates of each one kept; 'merge' stores each cluster once. Either
+# way the upload stats name the largest clusters. Reports are compared
+# through MinHash signatures and an LSH index rather than with each other, so
+# the cost per report does not grow with the size of the upload.
+INCIDENT_DEDUP_MODES = ('off', 'flag', 'merge')
+INCIDENT_DEDUP = os.environ.get('INCIDENT_DEDUP', 'off').lower()
+if INCIDENT_DEDUP not in INCIDENT_DEDUP_MODES:
+    raise ValueError(f"INCIDENT_DEDUP must be one of {', '.join(INCIDENT_DEDUP_MODES)}, not {INCIDENT_DEDUP!r}")
+INCIDENT_DEDUP_THRESHOLD = float(os.environ.get('INCIDENT_DEDUP_THRESHOLD', 0.8))
+INCIDENT_DEDUP_PERMUTATIONS = int(os.environ.get('INCIDENT_DEDUP_PERMUTATIONS', 64))
+DEDUP_SHINGLE_BYTES = 5
+DEDUP_SIGNATURE_CHUNK = 256
+DEDUP_BUCKET = 'day'
+DEDUP_REPORT_CLUSTERS = 5
+# Shingling lower-cases descriptions, turns ASCII punctuation, whitespace and
+# the marker bytes into spaces and collapses runs of spaces. Each description
+# is then prefixed with a start byte, so even a one-word report has a
+# shingle, and followed by zero bytes, which end it.
+_DEDUP_PUNCTUATION = b'!"#$%&\'()*+,-./:;<=>?@[\\]^_`{|}~\t\n\r\x0b\x0c\x00\x01'
+_DEDUP_NORMALISE = bytes.maketrans(_DEDUP_PUNCTUATION, b' ' * len(_DEDUP_PUNCTUATION))
+_DEDUP_START = b'\x01'
+_DEDUP_END = b'\x00' * (DEDUP_SHINGLE_BYTES - 1)
+
+
+def lsh_bands(threshold, permutations, recall=0.95):
+    """Return (bands, rows) splitting `permutations` MinHash values for LSH at `threshold`.
+
+    Picks the most rows per band, and so the fewest band keys and chance
+    candidates, that still shortlists a pair of `threshold` similarity with
+    probability `recall`; more similar pairs are shortlisted more surely.
+    """
+    for rows in range(permutations, 1, -1):
+        bands = permutations // rows
+        if 1.0 - (1.0 - threshold ** rows) ** bands >= recall:
+            return bands, rows
+    return permutations, 1
+
+
+class NearDuplicateIndex:
+    """MinHash/LSH index over report descriptions, for merging near duplicates.
+
+    Descriptions are shingled into overlapping DEDUP_SHINGLE_BYTES-byte
+    substrings of their normalised UTF-8 text and summarised by `permutations`
+    MinHash values (min over each shingle of an affine permutation of its
+    32-bit hash). Signatures are split into bands as chosen by lsh_bands; each
+    indexed report files a 32-bit key per band in sorted runs, merged as they
+    grow like a log-structured merge tree, so a lookup is a binary search per
+    run. Reports sharing a band key are candidates, confirmed when their
+    signatures estimate a Jaccard similarity of at least `threshold`. Band
+    keys are salted with each report's bucket, so reports in different
+    buckets are never candidates.
+    Signatures are kept as their low 8 bits (b-bit minwise hashing), whose
+    chance collisions the estimate corrects for.
+    """
+
+    _BIT_COLLISION = 1 / 256
+
+    def __init__(self, threshold=INCIDENT_DEDUP_THRESHOLD, permutations=INCIDENT_DEDUP_PERMUTATIONS, seed=0):
+        if not 0.0 < threshold <= 1.0:
+            raise ValueError(f"Near-duplicate threshold must be in (0, 1], not {threshold!r}")
+        self.threshold = threshold
+        self.bands, self.rows = lsh_bands(threshold, permutations)
+        rng = np.random.default_rng(seed)
+        multipliers = rng.integers(0, 2 ** 31, size=(permutations, 1), dtype=np.uint64) * 2 + 1
+        self._multipliers = multipliers.astype(np.uint32)
+        self._offsets = rng.integers(0, 2 ** 32, size=(permutations, 1), dtype=np.uint64).astype(np.uint32)
+        self._band_multipliers = rng.integers(0, 2 ** 63, size=self.rows, dtype=np.uint64) * 2 + 1
+        self._band_salts = rng.integers(0, 2 ** 63, size=self.bands, dtype=np.uint64)
+        self._signatures = np.empty((0, permutations), dtype=np.uint8)
+        self._runs = []
+        self.size = 0
+
+    def signatures(self, descriptions):
+        """Return the (len(descriptions), permutations) uint32 MinHash signatures of `descriptions`."""
+        # Every shingle is hashed once per permutation, so descriptions are
+        # signed a chunk at a time to keep that array small.
+        if len(descriptions) > DEDUP_SIGNATURE_CHUNK:
+            return np.concatenate([self.signatures(descriptions[start:start + DEDUP_SIGNATURE_CHUNK])
+                                   for start in range(0, len(descriptions), DEDUP_SIGNATURE_CHUNK)])
+        joined = (_DEDUP_END + _DEDUP_START).join(description.lower().encode('utf-8').translate(_DEDUP_NORMALISE)
+                                                  for description in descriptions)
+        text = np.frombuffer(_DEDUP_START + joined + _DEDUP_END, dtype=np.uint8)
+        # Spaces after a space or a marker go first, then any left just before a marker.
+        space = text == 32
+        text = text[~(space & np.concatenate(([True], (space | (text <= 1))[:-1])))]
+        text = text[~((text == 32) & np.concatenate(((text <= 1)[1:], [True])))].astype(np.uint64)
+        count = len(text) - DEDUP_SHINGLE_BYTES + 1
+        shingles = np.zeros(count, dtype=np.uint64)
+        for offset in range(DEDUP_SHINGLE_BYTES):
+            shingles = (shingles << np.uint64(8)) | text[offset:offset + count]
+        inside = text[:count] != 0
+        shingles = shingles[inside]
+        starts = np.flatnonzero(text[:count][inside] == 1)
+        hashed = ((shingles * np.uint64(0x9E3779B97F4A7C15)) >> np.uint64(32)).astype(np.uint32)
+        permuted = self._multipliers * hashed
+        permuted += self._offsets
+        return np.minimum.reduceat(permuted, starts, axis=1).T
+
+    def _band_keys(self, signatures, buckets):
+        banded = signatures[:, :self.bands * self.rows].reshape(len(signatures), self.bands, self.rows)
+        keys = (banded.astype(np.uint64) * self._band_multipliers).sum(axis=2, dtype=np.uint64) + self._band_salts
+        if buckets is not None:
+            salts = np.asarray(buckets, dtype=np.int64).view(np.uint64) * np.uint64(0x9E3779B97F4A7C15)
+            keys += (salts ^ (salts >> np.uint64(29)))[:, None]
+        return (keys >> np.uint64(32)).astype(np.uint32)
+
+    def _similar(self, signatures, others):
+        equal = np.count_nonzero(signatures == others, axis=-1) / signatures.shape[-1]
+        return (equal - self._BIT_COLLISION) / (1 - self._BIT_COLLISION) >= self.threshold
+
+    def add(self, descriptions, buckets=None):
+        """Index `descriptions`; return, for each, the index position of the report it duplicates, or -1.
+
+        `buckets`, if given, holds an integer bucket per description, e.g. its
+        day; only reports in the same bucket can duplicate each other.
+        Descriptions that duplicate nothing indexed, nor an earlier one of the
+        same call, are indexed themselves, at positions size, size + 1, ...
+        """
+        count = len(descriptions)
+        if not count:
+            return np.empty(0, dtype=np.int64)
+        signatures = self.signatures(descriptions)
+        keys = self._band_keys(signatures, buckets)
+        signatures = signatures.astype(np.uint8)
+
+        # Band keys are looked up in sorted order, which keeps the binary
+        # searches cache-friendly, and grouped to find repeats within the call.
+        flat = keys.ravel()
+        order = np.argsort(flat, kind='stable')
+        ordered = flat[order]
+
+        # Candidates already indexed: the earliest report filed under each band key.
+        candidates = np.full(flat.shape, -1, dtype=np.int64)
+        for run_keys, run_positions in self._runs:
+            found = np.minimum(np.searchsorted(run_keys, ordered), len(run_keys) - 1)
+            hit = (run_keys[found] == ordered) & (candidates[order] < 0)
+            candidates[order[hit]] = run_positions[found[hit]]
+        candidates = candidates.reshape(keys.shape)
+        duplicate_of = np.full(count, -1, dtype=np.int64)
+        pairs = np.nonzero(candidates >= 0)
+        confirmed = self._similar(signatures[pairs[0]], self._signatures[candidates[pairs]])
+        duplicate_of[pairs[0][confirmed]] = candidates[pairs][confirmed]
+
+        # Candidates earlier in this call: the first report with each band key.
+        first_in_group = np.flatnonzero(np.concatenate(([True], ordered[1:] != ordered[:-1])))
+        earliest = np.empty_like(order)
+        earliest[order] = np.repeat(order[first_in_group], np.diff(np.append(first_in_group, len(order))))
+        earliest = earliest.reshape(keys.shape) // self.bands
+        pairs = np.nonzero((earliest < np.arange(count)[:, None]) & (duplicate_of[:, None] < 0))
+        confirmed = self._similar(signatures[pairs[0]], signatures[earliest[pairs]])
+        rows, first = np.unique(pairs[0][confirmed], return_index=True)
+        parent = np.arange(count)
+        parent[rows] = earliest[pairs][confirmed][first]
+
+        # Reports are merged into the original of the earlier report they
+        # match; chains of matches are followed by pointer jumping.
+        kept = duplicate_of < 0
+        kept[rows] = False
+        positions = self.size + np.cumsum(kept) - 1
+        while True:
+            jumped = parent[parent]
+            if np.array_equal(jumped, parent):
+                break
+            parent = jumped
+        duplicate_of[rows] = np.where(kept[parent[rows]], positions[parent[rows]], duplicate_of[parent[rows]])
+        self._append(signatures[kept], keys[kept])
+        return duplicate_of
+
+    def _append(self, signatures, keys):
+        positions = np.arange(self.size, self.size + len(signatures), dtype=np.uint32)
+        if len(self._signatures) < self.size + len(signatures):
+            grown = np.empty((max(2 * len(self._signatures), self.size + len(signatures)), self._signatures.shape[1]),
+                             dtype=np.uint8)
+            grown[:self.size] = self._signatures[:self.size]
+            self._signatures = grown
+        self._signatures[self.size:self.size + len(signatures)] = signatures
+        self.size += len(signatures)
+        if not len(keys):
+            return
+        flat, order = keys.ravel(), np.argsort(keys.ravel(), kind='stable')
+        self._runs.append((flat[order], np.repeat(positions, self.bands)[order]))
+        # Merge runs while the newer is at least half the size of the older,
+        # so there are O(log n) runs and each entry is re-sorted O(log n) times.
+        while len(self._runs) > 1 and 2 * len(self._runs[-1][0]) >= len(self._runs[-2][0]):
+            (old_keys, old_positions), (new_keys, new_positions) = self._runs[-2:]
+            merged = np.concatenate((old_keys, new_keys))
+            order = np.argsort(merged, kind='stable')
+            self._runs[-2:] = [(merged[order], np.concatenate((old_positions, new_positions))[order])]
+
+    def nbytes(self):
+        """Return the bytes held by the signatures and band runs."""
+        return self._signatures.nbytes + sum(keys.nbytes + positions.nbytes for keys, positions in self._runs)
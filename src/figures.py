@@ -0,0 +1,84 @@
+import hashlib
+import json
+import os
+import threading
+from collections import Counter, OrderedDict
+
+from metrics import timed
+
+# --- Figure Cache ---
+# Building a Plotly figure and serialising it with to_json() dominates request
+# time, while chart inputs rarely change between page views. Serialised figure
+# JSON is cached under a hash of each chart's inputs and evicted least recently
+# used first once either bound is exceeded. Chart builders return the figure;
+# the cache serialises it, so the two phases are timed separately.
+FIGURE_CACHE_MAX_ENTRIES = int(os.environ.get('FIGURE_CACHE_MAX_ENTRIES', 256))
+FIGURE_CACHE_MAX_BYTES = int(os.environ.get('FIGURE_CACHE_MAX_BYTES', 32 * 1024 * 1024))
+
+
+class FigureCache:
+    """Size-bounded LRU cache of serialised figure JSON, with per-chart hit/miss counts."""
+
+    def __init__(self, max_entries=FIGURE_CACHE_MAX_ENTRIES, max_bytes=FIGURE_CACHE_MAX_BYTES):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._hits = Counter()
+        self._misses = Counter()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def content_key(chart, data):
+        """Hash `data` (any JSON-serialisable chart input) into a cache key for `chart`."""
+        payload = json.dumps(data, sort_keys=True, separators=(',', ':'), default=str).encode('utf-8')
+        return chart, hashlib.blake2b(payload, digest_size=16).hexdigest()
+
+    def get_or_build(self, chart, data, build):
+        """Return cached figure JSON for `chart` with inputs `data`.
+
+        On a miss, `build()` is called for a go.Figure, which is serialised and cached.
+        """
+        key = self.content_key(chart, data)
+        with self._lock:
+            figure_json = self._entries.get(key)
+            if figure_json is not None:
+                self._entries.move_to_end(key)
+                self._hits[chart] += 1
+                return figure_json
+            self._misses[chart] += 1
+
+        with timed('figure'):
+            figure = build()
+        with timed('to_json'):
+            figure_json = figure.to_json()
+        size = len(figure_json)
+        if size > self.max_bytes:
+            return figure_json
+        with self._lock:
+            if key not in self._entries:
+                self._entries[key] = figure_json
+                self._bytes += size
+                while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                    _, evicted = self._entries.popitem(last=False)
+                    self._bytes -= len(evicted)
+        return figure_json
+
+    def stats(self):
+        with self._lock:
+            charts = sorted(set(self._hits) | set(self._misses))
+            return {
+                'entries': len(self._entries),
+                'bytes': self._bytes,
+                'max_entries': self.max_entries,
+                'max_bytes': self.max_bytes,
+                'charts': {chart: {'hits': self._hits[chart], 'misses': self._misses[chart]} for chart in charts},
+            }
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+
+figure_cache = FigureCache()
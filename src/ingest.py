@@ -0,0 +1,194 @@
+import csv
+import gzip
+import io
+import itertools
+import json
+import logging
+import os
+import time
+from collections import Counter
+
+import storage
+from dedup import DEDUP_BUCKET, DEDUP_REPORT_CLUSTERS, INCIDENT_DEDUP, NearDuplicateIndex
+from metrics import timed
+from startup import np
+from storage import trend_bucket
+from triage import triage_batch
+from trends import parse_timestamp
+
+logger = logging.getLogger(__name__)
+
+# --- Incident Ingestion ---
+# Uploads are streamed: lines are decoded as they are read, triaged in
+# fixed-size batches and written to the incident store batch by batch, so peak
+# memory depends on INGEST_BATCH_SIZE rather than on the size of the upload.
+# CSV and JSONL uploads may give each report's occurrence time in an
+# OCCURRED_AT_COLUMNS column; reports without one occurred when recorded.
+INGEST_BATCH_SIZE = int(os.environ.get('INGEST_BATCH_SIZE', 5000))
+INCIDENT_UPLOAD_FORMATS = ('.txt', '.csv', '.jsonl')
+DESCRIPTION_COLUMNS = ('description', 'incident_description', 'incident description')
+OCCURRED_AT_COLUMNS = ('occurred_at', 'occurred', 'timestamp', 'time', 'date')
+
+
+def incident_upload_format(filename):
+    """Return the upload format ('.txt', '.csv' or '.jsonl') for `filename`, or None.
+
+    A trailing '.gz' is allowed on any format.
+    """
+    name = filename.lower()
+    if name.endswith('.gz'):
+        name = name[:-3]
+    return next((fmt for fmt in INCIDENT_UPLOAD_FORMATS if name.endswith(fmt)), None)
+
+
+def open_incident_upload(stream, filename):
+    """Wrap a binary upload stream in a lazily decoding text stream."""
+    if filename.lower().endswith('.gz'):
+        stream = gzip.GzipFile(fileobj=stream, mode='rb')
+    return io.TextIOWrapper(stream, encoding='utf-8', newline='')
+
+
+def _description_key(keys):
+    for key in keys:
+        if key is not None and key.strip().lower() in DESCRIPTION_COLUMNS:
+            return key
+    raise ValueError(f"No description column found (expected one of: {', '.join(DESCRIPTION_COLUMNS)})")
+
+
+def _occurred_at_key(keys):
+    return next((key for key in keys if key is not None and key.strip().lower() in OCCURRED_AT_COLUMNS), None)
+
+
+def _occurred_at(value):
+    if value is None or value == '':
+        return None
+    try:
+        return parse_timestamp(value)
+    except ValueError:
+        raise ValueError(f"Invalid occurrence time {value!r} (expected ISO 8601 or UNIX seconds)") from None
+
+
+def iter_incident_reports(lines, upload_format, skipped=None):
+    """Yield (description, occurred_at) pairs from an iterable of text lines.
+
+    '.txt' uploads hold one report per line; '.csv' and '.jsonl' uploads must
+    have a description column and may have an occurrence time column.
+    occurred_at is UNIX seconds, or None when not given. Blank descriptions
+    are skipped, as are JSONL lines that do not hold an object; `skipped`, if
+    given, is called once for each of the latter.
+    """
+    if upload_format == '.txt':
+        reports = ((line.strip(), None) for line in lines)
+    elif upload_format == '.csv':
+        reader = csv.DictReader(lines)
+        key = _description_key(reader.fieldnames or ())
+        time_key = _occurred_at_key(reader.fieldnames or ())
+        reports = (((row.get(key) or '').strip(), _occurred_at(row.get(time_key)) if time_key else None)
+                   for row in reader)
+    elif upload_format == '.jsonl':
+        reports = _iter_jsonl_reports(lines, skipped)
+    else:
+        raise ValueError(f"Unsupported incident upload format: {upload_format!r}")
+    return (report for report in reports if report[0])
+
+
+def _iter_jsonl_reports(lines, skipped=None):
+    key = None
+    for line in lines:
+        if not line.strip():
+            continue
+        record = json.loads(line)
+        if not isinstance(record, dict):
+            if skipped is not None:
+                skipped()
+            continue
+        if key is None or key not in record:
+            key = _description_key(record)
+        description = record[key]
+        time_key = _occurred_at_key(record)
+        yield (description.strip() if isinstance(description, str) else '',
+               _occurred_at(record[time_key]) if time_key else None)
+
+
+class _LineCounter:
+    """Iterate over `lines` while counting how many have been read, and how many of those were skipped."""
+
+    def __init__(self, lines):
+        self._lines = lines
+        self.count = 0
+        self.skipped = 0
+
+    def skip(self):
+        self.skipped += 1
+
+    def __iter__(self):
+        for line in self._lines:
+            self.count += 1
+            yield line
+
+
+def ingest_incident_lines(store_id, lines, upload_format, batch_size=INGEST_BATCH_SIZE, progress=None):
+    """Triage and store incidents from `lines` in batches of `batch_size`.
+
+    Near duplicates are found as INCIDENT_DEDUP says. `progress`, if given,
+    is called with the running ingest stats and the IncidentColumns of each
+    batch once it is stored. Returns the final stats: lines read, lines
+    skipped as invalid, reports stored, near duplicates found, the clusters they form, elapsed seconds and
+    lines per second, plus the DEDUP_REPORT_CLUSTERS largest clusters as
+    report IDs and near-duplicate counts.
+    """
+    counter = _LineCounter(lines)
+    reports = iter_incident_reports(counter, upload_format, skipped=counter.skip)
+    duplicates = NearDuplicateIndex() if INCIDENT_DEDUP != 'off' else None
+    # Near duplicates per index position, and the report ID at each position.
+    cluster_sizes, cluster_ids = Counter(), []
+    started = time.perf_counter()
+    stats = {'lines': 0, 'skipped': 0, 'reports': 0, 'duplicates': 0, 'clusters': 0, 'batches': 0, 'seconds': 0.0,
+             'lines_per_second': 0.0}
+
+    while True:
+        batch = list(itertools.islice(reports, batch_size))
+        if not batch:
+            break
+        found, kept = 0, None
+        if duplicates is not None:
+            # Reports without an occurrence time occur when recorded, i.e. today.
+            today = trend_bucket(time.time(), DEDUP_BUCKET)
+            buckets = [today if moment is None else trend_bucket(moment, DEDUP_BUCKET) for _, moment in batch]
+            with timed('dedup'):
+                duplicate_of = duplicates.add([description for description, _ in batch], buckets)
+            found = int(np.count_nonzero(duplicate_of >= 0))
+            cluster_sizes.update(duplicate_of[duplicate_of >= 0].tolist())
+            kept = np.flatnonzero(duplicate_of < 0)
+            if INCIDENT_DEDUP == 'merge' and found:
+                batch = [batch[index] for index in kept.tolist()]
+                kept = np.arange(len(batch))
+        processed_reports = None
+        if batch:
+            descriptions, occurred_at = zip(*batch)
+            # The store renumbers the batch's Report_IDs as it appends it.
+            processed_reports = triage_batch(list(descriptions), 0)
+            storage.incident_repository.append(store_id, processed_reports,
+                                       occurred_at if any(moment is not None for moment in occurred_at) else None)
+            if kept is not None:
+                cluster_ids.extend(processed_reports.report_id(index) for index in kept.tolist())
+
+        elapsed = time.perf_counter() - started
+        stats.update(lines=counter.count, skipped=counter.skipped, reports=stats['reports'] + len(batch),
+                     duplicates=stats['duplicates'] + found, clusters=len(cluster_sizes),
+                     batches=stats['batches'] + 1, seconds=elapsed,
+                     lines_per_second=counter.count / elapsed if elapsed else 0.0)
+        if progress is not None and processed_reports is not None:
+            progress(dict(stats), processed_reports)
+
+    elapsed = time.perf_counter() - started
+    stats.update(lines=counter.count, skipped=counter.skipped, seconds=elapsed,
+                 lines_per_second=counter.count / elapsed if elapsed else 0.0,
+                 largest_clusters=[{'report_id': cluster_ids[position], 'duplicates': size}
+                                   for position, size in cluster_sizes.most_common(DEDUP_REPORT_CLUSTERS)])
+    return stats
+
+
+def log_ingest_progress(stats, processed_reports):
+    logger.info("Incident upload: %d lines read, %d reports stored (%.0f lines/s)",
+                    stats['lines'], stats['reports'], stats['lines_per_second'])
@@ -0,0 +1,203 @@
+import csv
+import logging
+import os
+import queue
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+import storage
+from ingest import INGEST_BATCH_SIZE, ingest_incident_lines, log_ingest_progress, open_incident_upload
+from triage import triage_matcher
+
+logger = logging.getLogger(__name__)
+
+# --- Async Ingest Jobs ---
+# With ?async=1, /upload_incidents spools the upload to a temporary file,
+# queues an ingest job and answers 202 with the job ID straight away. A fixed
+# set of INGEST_JOB_WORKERS threads drains a queue of at most
+# INGEST_JOB_QUEUE_DEPTH waiting jobs; when the queue is full, uploads are
+# refused with 503 instead of waiting behind an ever longer backlog. Progress
+# is read from /jobs/<id> or streamed from /jobs/<id>/events, which holds its
+# connection open, so serve it from threaded or async gunicorn workers.
+# Jobs live in the process that accepted them.
+INGEST_JOB_WORKERS = int(os.environ.get('INGEST_JOB_WORKERS', 2))
+INGEST_JOB_QUEUE_DEPTH = int(os.environ.get('INGEST_JOB_QUEUE_DEPTH', 8))
+INGEST_JOB_HISTORY = 100
+INGEST_JOB_HEARTBEAT_SECONDS = 15
+INGEST_SPOOL_DIR = os.environ.get('INGEST_SPOOL_DIR') or None
+
+
+class QueuedJob:
+    """A job run by the ingest job queue, with its status and the progress events emitted so far.
+
+    Events are dicts with an "event" name of "queued", "started", "batch",
+    "done" or "failed". The "queued" event names the job's `kind`, plus
+    whatever `queued` data the subclass passes. Subclasses implement run().
+    """
+
+    kind = None
+
+    def __init__(self, store_id, **queued):
+        self.id = uuid.uuid4().hex
+        self.store_id = store_id
+        self.status = 'queued'
+        self.events = []
+        self._changed = threading.Condition()
+        self._emit('queued', kind=self.kind, **queued)
+
+    @property
+    def finished(self):
+        return self.status in ('done', 'failed')
+
+    def _emit(self, event, status=None, **data):
+        with self._changed:
+            if status is not None:
+                self.status = status
+            self.events.append({'event': event, 'job_id': self.id, **data})
+            self._changed.notify_all()
+
+    def snapshot(self):
+        """Return the job status and its latest event."""
+        with self._changed:
+            return {'job_id': self.id, 'kind': self.kind, 'status': self.status,
+                    'events': len(self.events), 'last_event': self.events[-1]}
+
+    def events_after(self, index, timeout):
+        """Wait up to `timeout` seconds for events past `index`; return (events, finished)."""
+        with self._changed:
+            if len(self.events) <= index and not self.finished:
+                self._changed.wait(timeout)
+            return self.events[index:], self.finished
+
+    def run(self):
+        raise NotImplementedError
+
+
+class IngestJob(QueuedJob):
+    """A queued upload, spooled to `path`.
+
+    Batch events carry the running ingest stats and the severity counts and
+    Report_ID range of the batch; the records themselves are read back
+    through /api/incidents.
+    """
+
+    kind = 'ingest'
+
+    def __init__(self, store_id, filename, upload_format, path):
+        self.filename = filename
+        self.upload_format = upload_format
+        self.path = path
+        super().__init__(store_id, filename=filename)
+
+    def snapshot(self):
+        return dict(super().snapshot(), filename=self.filename)
+
+    def _batch_stored(self, stats, processed_reports):
+        log_ingest_progress(stats, processed_reports)
+        self._emit('batch', first_report_id=processed_reports.report_id(0),
+                   last_report_id=processed_reports.report_id(-1), severity=processed_reports.severity_counts(),
+                   **stats)
+
+    def run(self):
+        self._emit('started', status='running')
+        try:
+            with open(self.path, 'rb') as stream:
+                lines = open_incident_upload(stream, self.filename)
+                stats = ingest_incident_lines(self.store_id, lines, self.upload_format, progress=self._batch_stored)
+        except (ValueError, UnicodeDecodeError, OSError, csv.Error) as exc:
+            # As with synchronous uploads, batches stored before the error are kept.
+            self._emit('failed', status='failed', error=str(exc))
+        except Exception:
+            logger.exception("Ingest job %s failed", self.id)
+            self._emit('failed', status='failed', error="Internal error")
+        else:
+            self._emit('done', status='done', **stats)
+        finally:
+            os.unlink(self.path)
+
+
+class IngestJobQueue:
+    """Bounded queue of ingest (and re-triage) jobs drained by a fixed pool of worker threads."""
+
+    def __init__(self, workers, depth):
+        self.workers = workers
+        self.depth = depth
+        self._queue = queue.Queue(maxsize=depth)
+        self._jobs = OrderedDict()
+        self._lock = threading.Lock()
+        self._pid = None
+
+    def _start_workers(self):
+        # Threads do not survive a fork, so they are started on first use in
+        # the process that serves requests.
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            for number in range(self.workers):
+                threading.Thread(target=self._work, name=f"ingest-job-{number}", daemon=True).start()
+
+    def _work(self):
+        while True:
+            job = self._queue.get()
+            try:
+                job.run()
+            finally:
+                self._queue.task_done()
+
+    def full(self):
+        return self._queue.full()
+
+    def submit(self, job):
+        """Queue `job`, or raise queue.Full if INGEST_JOB_QUEUE_DEPTH jobs are already waiting."""
+        self._start_workers()
+        self._queue.put_nowait(job)
+        with self._lock:
+            self._jobs[job.id] = job
+            finished = [job_id for job_id, known in self._jobs.items() if known.finished]
+            for job_id in finished[:max(len(finished) - INGEST_JOB_HISTORY, 0)]:
+                del self._jobs[job_id]
+
+    def get(self, job_id):
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def stats(self):
+        return {'workers': self.workers, 'queue_depth': self.depth, 'queued': self._queue.qsize()}
+
+
+ingest_jobs = IngestJobQueue(INGEST_JOB_WORKERS, INGEST_JOB_QUEUE_DEPTH)
+
+
+class RetriageJob(QueuedJob):
+    """A queued re-triage of a store's incidents against the current triage rules.
+
+    It shares the ingest job queue and the /jobs endpoints. Incidents are
+    re-triaged INGEST_BATCH_SIZE at a time and each batch is stored
+    atomically, so listings and counters move to the new labels batch by batch
+    while the job runs. Batch events carry the seq range covered and how many
+    incidents changed.
+    """
+
+    kind = 'retriage'
+
+    def run(self):
+        self._emit('started', status='running')
+        matcher = triage_matcher()
+        started = time.perf_counter()
+        last_seq = storage.incident_repository.count(self.store_id)
+        stats = {'rules_version': matcher.version, 'incidents': 0, 'changed': 0, 'seconds': 0.0}
+        try:
+            for first_seq in range(1, last_seq + 1, INGEST_BATCH_SIZE):
+                batch_last_seq = min(first_seq + INGEST_BATCH_SIZE - 1, last_seq)
+                changed = storage.incident_repository.retriage(self.store_id, first_seq, batch_last_seq, matcher)
+                stats.update(incidents=batch_last_seq, changed=stats['changed'] + changed,
+                             seconds=time.perf_counter() - started)
+                self._emit('batch', first_seq=first_seq, last_seq=batch_last_seq, **stats)
+        except Exception:
+            logger.exception("Re-triage job %s failed", self.id)
+            self._emit('failed', status='failed', error="Internal error")
+        else:
+            self._emit('done', status='done', **stats)
@@ -0,0 +1,176 @@
+import bisect
+import os
+import threading
+import time
+from collections import Counter
+
+from flask import g, has_request_context
+
+# --- Instrumentation ---
+# With METRICS_ENABLED=1, each request's wall time and its time in the hot-path
+# phases (dedup, triage, aggregate, figure, to_json, render) are recorded in
+# per-route latency histograms, together with session cookie sizes and triage
+# throughput, and exposed in the Prometheus text format on /metrics. Metrics
+# are per process: scrape each gunicorn worker, or run one worker with
+# threads. When disabled, timed() hands out a shared no-op context manager
+# and no request hooks are installed.
+METRICS_ENABLED = os.environ.get('METRICS_ENABLED', '').lower() in ('1', 'true', 'yes', 'on')
+METRICS_LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+METRICS_BYTES_BUCKETS = (64, 128, 256, 512, 1024, 2048, 3072, 4096, 8192)
+METRICS_THROUGHPUT_BUCKETS = (1e2, 1e3, 5e3, 1e4, 2.5e4, 5e4, 1e5, 2.5e5, 5e5, 1e6)
+
+
+def _escape_label_value(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _metric_labels(names, values, extra=()):
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape_label_value(value)}"' for name, value in pairs) + '}'
+
+
+class Histogram:
+    """Bucketed observations per label set, rendered as a Prometheus histogram."""
+
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, labels=(), buckets=METRICS_LATENCY_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labels = labels
+        self.buckets = buckets
+        self._series = {}
+
+    def observe(self, value, *label_values):
+        # Caller holds the registry lock. Slot i counts values in
+        # (buckets[i - 1], buckets[i]]; the last slot is +Inf.
+        series = self._series.get(label_values)
+        if series is None:
+            series = self._series[label_values] = [[0] * (len(self.buckets) + 1), 0.0]
+        series[0][bisect.bisect_left(self.buckets, value)] += 1
+        series[1] += value
+
+    def render(self):
+        for label_values, (counts, total) in sorted(self._series.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += count
+                le = '+Inf' if bound == float('inf') else repr(bound)
+                yield f"{self.name}_bucket{_metric_labels(self.labels, label_values, [('le', le)])} {cumulative}"
+            yield f"{self.name}_sum{_metric_labels(self.labels, label_values)} {total!r}"
+            yield f"{self.name}_count{_metric_labels(self.labels, label_values)} {cumulative}"
+
+
+class CounterMetric:
+    """Monotonic totals per label set, rendered as a Prometheus counter."""
+
+    kind = 'counter'
+
+    def __init__(self, name, documentation, labels=()):
+        self.name = name
+        self.documentation = documentation
+        self.labels = labels
+        self._series = Counter()
+
+    def inc(self, amount, *label_values):
+        self._series[label_values] += amount
+
+    def render(self):
+        for label_values, total in sorted(self._series.items()):
+            yield f"{self.name}{_metric_labels(self.labels, label_values)} {total!r}"
+
+
+class MetricsRegistry:
+    """The process's metrics, updated under one lock and rendered on /metrics."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.request_seconds = Histogram('rih_request_duration_seconds', 'Request wall time by route.',
+                                         ('route', 'method', 'status'))
+        self.phase_seconds = Histogram('rih_request_phase_seconds', 'Time per request spent in each hot-path phase.',
+                                       ('route', 'phase'))
+        self.session_cookie_bytes = Histogram('rih_session_cookie_bytes',
+                                              'Size of the session cookie set by responses.',
+                                              ('route',), METRICS_BYTES_BUCKETS)
+        self.request_cookie_bytes = Histogram('rih_request_cookie_bytes', 'Size of the Cookie header sent by clients.',
+                                              ('route',), METRICS_BYTES_BUCKETS)
+        self.triage_reports = CounterMetric('rih_triage_reports_total', 'Incident reports triaged.')
+        self.triage_seconds = CounterMetric('rih_triage_seconds_total', 'Time spent triaging incident reports.')
+        self.triage_throughput = Histogram('rih_triage_reports_per_second', 'Triage throughput per triage_batch call.',
+                                           (), METRICS_THROUGHPUT_BUCKETS)
+        self._metrics = [self.request_seconds, self.phase_seconds, self.session_cookie_bytes,
+                         self.request_cookie_bytes, self.triage_reports, self.triage_seconds, self.triage_throughput]
+
+    def observe(self, metric, value, *label_values):
+        with self._lock:
+            metric.observe(value, *label_values)
+
+    def record_triage(self, reports, seconds):
+        with self._lock:
+            self.triage_reports.inc(reports)
+            self.triage_seconds.inc(seconds)
+            if seconds > 0:
+                self.triage_throughput.observe(reports / seconds)
+
+    def record_request(self, route, method, status, seconds, phases, request_cookie, session_cookie):
+        with self._lock:
+            self.request_seconds.observe(seconds, route, method, status)
+            for phase, phase_seconds in phases.items():
+                self.phase_seconds.observe(phase_seconds, route, phase)
+            self.request_cookie_bytes.observe(request_cookie, route)
+            if session_cookie is not None:
+                self.session_cookie_bytes.observe(session_cookie, route)
+
+    def render(self):
+        with self._lock:
+            lines = []
+            for metric in self._metrics:
+                lines.append(f"# HELP {metric.name} {metric.documentation}")
+                lines.append(f"# TYPE {metric.name} {metric.kind}")
+                lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+metrics = MetricsRegistry()
+
+
+class _PhaseTimer:
+    __slots__ = ('phase', 'started')
+
+    def __init__(self, phase):
+        self.phase = phase
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        elapsed = time.perf_counter() - self.started
+        if has_request_context() and 'metric_phases' in g:
+            g.metric_phases[self.phase] = g.metric_phases.get(self.phase, 0.0) + elapsed
+        else:
+            metrics.observe(metrics.phase_seconds, elapsed, 'background', self.phase)
+
+
+class _NoTiming:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return None
+
+
+_NO_TIMING = _NoTiming()
+
+
+def timed(phase):
+    """Context manager timing a block as `phase` of the current request.
+
+    Outside a request (ingest jobs) the time is recorded under route
+    "background". A no-op when METRICS_ENABLED is off.
+    """
+    return _PhaseTimer(phase) if METRICS_ENABLED else _NO_TIMING
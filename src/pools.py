@@ -0,0 +1,41 @@
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+# --- Worker Process Pools ---
+# Batch triage and batch routine conformance shard large inputs across worker
+# processes. Workers are started with TRIAGE_START_METHOD ('spawn' by
+# default), so they never inherit the parent's threads or open connections.
+_process_pools = {}
+_process_pools_pid = None
+_process_pool_lock = threading.Lock()
+
+
+def get_process_pool(purpose, max_workers):
+    """Return the worker process pool for `purpose` ('triage' or 'conformance') and `max_workers`.
+
+    Each purpose and size gets its own pool, created on first use and never
+    shut down by a lookup, so a request can never cancel another's work. Pools
+    are per process: a gunicorn worker forked after pools were created builds
+    its own instead of inheriting unusable handles.
+    """
+    global _process_pools_pid
+    with _process_pool_lock:
+        if _process_pools_pid != os.getpid():
+            _process_pools.clear()
+            _process_pools_pid = os.getpid()
+        pool = _process_pools.get((purpose, max_workers))
+        if pool is None:
+            context = multiprocessing.get_context(os.environ.get('TRIAGE_START_METHOD', 'spawn'))
+            pool = _process_pools[purpose, max_workers] = ProcessPoolExecutor(max_workers=max_workers,
+                                                                              mp_context=context)
+        return pool
+
+
+def reset_process_pool(pool):
+    """Forget `pool` after it broke, so the next lookup starts a new one."""
+    with _process_pool_lock:
+        for key, current in list(_process_pools.items()):
+            if current is pool:
+                del _process_pools[key]
@@ -0,0 +1,315 @@
+import heapq
+import itertools
+import json
+import os
+
+import plotly.graph_objects as go
+
+import storage
+from startup import np, pd
+
+# --- Risk Strategy Navigator Logic (New Module) ---
+# Define scores for likelihood and impact
+LIKELIHOOD_SCORES = {
+    "Rare": 1,
+    "Unlikely": 2,
+    "Possible": 3,
+    "Likely": 4,
+    "Almost Certain": 5
+}
+
+IMPACT_SCORES = {
+    "Insignificant": 1,
+    "Minor": 2,
+    "Moderate": 3,
+    "Major": 4,
+    "Catastrophic": 5
+}
+
+RISK_MATRIX_SCORES = [
+    [1, 2, 3, 4, 5],
+    [2, 4, 6, 8, 10],
+    [3, 6, 9, 12, 15],
+    [4, 8, 12, 16, 20],
+    [5, 10, 15, 20, 25]
+]
+
+def risk_heatmap_trace():
+    """The risk matrix's static score heatmap."""
+    return go.Heatmap(
+        z=RISK_MATRIX_SCORES,
+        x=list(IMPACT_SCORES.keys()),
+        y=list(LIKELIHOOD_SCORES.keys()),
+        colorscale='Viridis', # You can choose a different colorscale here if 'Viridis' isn't what you want
+        showscale=True,
+        hovertemplate="Likelihood: %{y}<br>Impact: %{x}<br>Score: %{z}<extra></extra>"
+    )
+
+def calculate_risk_score(likelihood, impact):
+    try:
+        return LIKELIHOOD_SCORES[likelihood] * IMPACT_SCORES[impact]
+    except KeyError:
+        return 0 # Handle cases where input might not match predefined levels
+
+def classify_risk(score):
+    if score >= 16: # Example threshold for High
+        return "High"
+    elif score >= 9: # Example threshold for Medium
+        return "Medium"
+    else:
+        return "Low"
+
+HSHF_CATEGORY = "High Severity, High Frequency (HSHF) Risks"
+HSLF_CATEGORY = "High Severity, Low Frequency (HSLF) Risks"
+LSHF_CATEGORY = "Low Severity, High Frequency (LSHF) Risks"
+OTHER_CATEGORY = "Other Risks"
+RISK_CATEGORIES = [HSHF_CATEGORY, HSLF_CATEGORY, LSHF_CATEGORY, OTHER_CATEGORY]
+RISK_PRIORITIES = ["Low", "Medium", "High"]
+
+# Advice is kept once per category; risk records only carry their category.
+RISK_CATEGORY_ADVICE = {
+    HSHF_CATEGORY: "HSHF: These are urgent, high-priority risks. They demand **Immediate, Radical Intervention**, focusing on **Root Cause Elimination** and fundamental **Process Redesign**. Strategies include applying **TRIZ principles** like 'Segmentation' or 'Prior Action' to break down the problem or prevent it entirely. Reconsider fundamental assumptions and eliminate the conditions that allow the risk to manifest frequently with high impact. These often reflect a 'Fixes That Fail' or 'Shifting the Burden' archetype if not addressed systemically.",
+    HSLF_CATEGORY: "HSLF: These are 'Black Swan' type risks that can be catastrophic but are rare. Focus on **Robust Design**, **Redundancy** (e.g., multiple layers of defense), and fostering a culture of **Chronic Unease**. Implement **Resilience Planning** and **Contingency Reserves**. The goal is not prevention of the event itself (as it's rare) but minimization of its impact and ensuring rapid recovery. This aligns with a 'Limits to Growth' or 'Tragedy of the Commons' archetype if the system is allowed to deplete its own resilience.",
+    LSHF_CATEGORY: "LSHF: These are nuisance risks that can erode morale and efficiency over time. Focus on **Process Optimization** and **Standardization**. Implement quick, iterative improvements. While individually minor, their cumulative effect can be significant (similar to 'Accumulation'). Automate where possible to reduce human error. Don't let these become 'Normalized Deviations'.",
+    OTHER_CATEGORY: "General risk management advice: For 'Other Risks' (Medium/Low Priority), prioritize based on score and available resources. Implement standard controls, monitor regularly, and review periodically.",
+}
+
+def get_risk_category_and_advice(likelihood_level, impact_level):
+    likelihood_score = LIKELIHOOD_SCORES.get(likelihood_level, 0)
+    impact_score = IMPACT_SCORES.get(impact_level, 0)
+
+    category = OTHER_CATEGORY # Default category
+
+    if likelihood_score >= 4 and impact_score >= 4: # High Severity, High Frequency (HSHF)
+        category = HSHF_CATEGORY
+    elif likelihood_score <= 2 and impact_score >= 4: # High Severity, Low Frequency (HSLF)
+        category = HSLF_CATEGORY
+    elif likelihood_score >= 4 and impact_score <= 2: # Low Severity, High Frequency (LSHF)
+        category = LSHF_CATEGORY
+
+    return category, RISK_CATEGORY_ADVICE[category]
+
+
+# --- Bulk Risk Scoring ---
+# A risk register is scored column-wise: Likelihood and Impact labels are
+# mapped to level codes once through a Categorical, then score, priority and
+# category follow from NumPy array operations over those codes.
+RISK_REGISTER_COLUMNS = {
+    "Risk Name": ('risk name', 'risk_name', 'name', 'risk'),
+    "Likelihood": ('likelihood',),
+    "Impact": ('impact',),
+}
+
+
+def read_risk_register(stream, filename):
+    """Read a risk register upload (.csv, .json or .jsonl) into a DataFrame."""
+    name = filename.lower()
+    if name.endswith('.csv'):
+        return pd.read_csv(stream, dtype=str, keep_default_na=False)
+    if name.endswith('.jsonl'):
+        return pd.read_json(stream, lines=True, dtype=False)
+    if name.endswith('.json'):
+        return risk_register_from_json(json.load(stream))
+    raise ValueError(f"Unsupported risk register upload: {filename!r} (expected .csv, .json or .jsonl)")
+
+
+def risk_register_from_json(payload):
+    """Build a DataFrame from a JSON list of risks, or an object with a "risks" list."""
+    rows = payload.get("risks") if isinstance(payload, dict) else payload
+    if not isinstance(rows, list):
+        raise ValueError('Expected a JSON list of risks or an object with a "risks" list')
+    return pd.DataFrame(rows)
+
+
+def score_risk_register(register):
+    """Score, prioritise and categorise every risk in `register` at once.
+
+    `register` needs risk name, Likelihood and Impact columns (matched
+    case-insensitively). Returns (scored, skipped): a DataFrame with
+    RISK_FIELDS columns, Priority and Category as Categoricals, for rows with
+    a name and recognised Likelihood and Impact labels, and the number of rows
+    dropped. Results match calculate_risk_score, classify_risk and
+    get_risk_category_and_advice applied row by row.
+    """
+    columns = {}
+    for field, aliases in RISK_REGISTER_COLUMNS.items():
+        column = next((c for c in register.columns if isinstance(c, str) and c.strip().lower() in aliases), None)
+        if column is None:
+            raise ValueError(f"Risk register is missing a {field} column")
+        columns[field] = column
+
+    # Missing cells (null in JSON, absent keys) become "" and count as skipped.
+    names, likelihood, impact = (register[columns[field]].fillna('').astype(str).str.strip()
+                                 for field in ("Risk Name", "Likelihood", "Impact"))
+    # Unrecognised labels are masked first; they would get code -1 either way.
+    likelihood = pd.Categorical(likelihood.where(likelihood.isin(LIKELIHOOD_SCORES)),
+                                categories=list(LIKELIHOOD_SCORES))
+    impact = pd.Categorical(impact.where(impact.isin(IMPACT_SCORES)), categories=list(IMPACT_SCORES))
+    keep = ((names != "") & (likelihood.codes >= 0) & (impact.codes >= 0)).to_numpy()
+
+    # Level codes are 1-5 because both score tables count up from 1 in order.
+    likelihood_levels = likelihood.codes[keep].astype(np.int8) + 1
+    impact_levels = impact.codes[keep].astype(np.int8) + 1
+    scores = likelihood_levels.astype(np.int16) * impact_levels
+
+    priority_codes = np.select([scores >= 16, scores >= 9], [2, 1], 0)
+    category_codes = np.select(
+        [(likelihood_levels >= 4) & (impact_levels >= 4),
+         (likelihood_levels <= 2) & (impact_levels >= 4),
+         (likelihood_levels >= 4) & (impact_levels <= 2)],
+        [0, 1, 2], 3)
+
+    scored = pd.DataFrame({
+        "Risk Name": names[keep].to_numpy(),
+        "Likelihood": likelihood[keep],
+        "Impact": impact[keep],
+        "Score": scores,
+        "Priority": pd.Categorical.from_codes(priority_codes, RISK_PRIORITIES),
+        "Category": pd.Categorical.from_codes(category_codes, RISK_CATEGORIES),
+    })
+    return scored, int(len(register) - keep.sum())
+
+
+def summarise_risk_register(scored):
+    """Count scored risks per category and per priority."""
+    return {
+        "by_category": {category: int(count)
+                        for category, count in scored["Category"].value_counts(sort=False).items()},
+        "by_priority": {priority: int(count)
+                        for priority, count in scored["Priority"].value_counts(sort=False).items()},
+    }
+
+
+# --- Risk Listing ---
+# Listings and the risk matrix read the caller's store from
+# storage.risk_repository. The matrix draws one marker per non-empty cell from
+# the cell counters, or with RISK_MATRIX_MODE=points one marker per risk.
+RISK_MATRIX_MODE = os.environ.get('RISK_MATRIX_MODE', 'aggregated')
+RISK_LIST_LIMIT = 50
+RISK_SORTS = ('recorded_at', 'score')
+
+
+def store_scored_risks(store_id, scored):
+    """Append a scored risk register DataFrame to a risk store."""
+    storage.risk_repository.append(store_id, zip(scored["Risk Name"], scored["Likelihood"].astype(str),
+                                         scored["Impact"].astype(str), scored["Score"].astype(int).tolist(),
+                                         scored["Priority"].astype(str), scored["Category"].astype(str)))
+
+
+def risk_cursor(risk, sort='recorded_at'):
+    """Return the listing cursor that resumes after `risk` under `sort`."""
+    return f"{risk['Score']}:{risk['seq']}" if sort == 'score' else str(risk["seq"])
+
+
+def query_risks(store_id, priorities=None, categories=None, since=None, until=None, sort='recorded_at',
+                descending=False, cursor=None, limit=RISK_LIST_LIMIT):
+    """Return up to `limit` of a store's risks matching the filters, from `cursor` on.
+
+    `priorities` and `categories`, when given, are collections of accepted
+    labels. `sort` is 'recorded_at' (seq order) or 'score' (score, then seq). Each
+    matching non-empty cell contributes one index read of at most `limit`
+    risks past the cursor, and the reads are merged, so a page costs at most
+    25 x `limit` rows whatever the size of the store. `cursor` is the (seq,)
+    or (score, seq) tuple of the last risk already listed.
+    """
+    seq_range = storage.risk_repository.seq_bounds(store_id, since, until)
+    cell_counts = storage.risk_repository.cell_counts(store_id)
+    pages = []
+    for likelihood in LIKELIHOOD_SCORES:
+        for impact in IMPACT_SCORES:
+            if not cell_counts.get((likelihood, impact)):
+                continue
+            score = calculate_risk_score(likelihood, impact)
+            if priorities and classify_risk(score) not in priorities:
+                continue
+            if categories and get_risk_category_and_advice(likelihood, impact)[0] not in categories:
+                continue
+            after = None
+            if cursor is not None and sort == 'score':
+                cursor_score, cursor_seq = cursor
+                if (score > cursor_score) if descending else (score < cursor_score):
+                    continue
+                after = cursor_seq if score == cursor_score else None
+            elif cursor is not None:
+                after = cursor[0]
+            pages.append(storage.risk_repository.cell_page(store_id, likelihood, impact, after, limit, descending,
+                                                           seq_range))
+
+    sort_key = (lambda risk: (risk["Score"], risk["seq"])) if sort == 'score' else (lambda risk: risk["seq"])
+    return list(itertools.islice(heapq.merge(*pages, key=sort_key, reverse=descending), limit))
+
+
+RISK_DISPLAY_GROUPS = {HSHF_CATEGORY: 'hshf', HSLF_CATEGORY: 'hslf', LSHF_CATEGORY: 'other', OTHER_CATEGORY: 'other'}
+
+RISK_MATRIX_LAYOUT = dict(
+    title_text='Risk Assessment Matrix',
+    xaxis_title='Impact',
+    yaxis_title='Likelihood',
+    xaxis_type='category',
+    yaxis_type='category',
+    xaxis_tickangle=-45,
+    title_x=0.5
+)
+
+
+def build_risk_cells_figure(cell_counts):
+    """Risk matrix figure with one marker per non-empty cell, sized and labelled by risk count.
+
+    All cells share a single trace and no per-risk text, so the payload is
+    bounded by the 25 cells whatever the number of risks. Cell contents are
+    fetched on click from /risk_navigator/cell.
+    """
+    cells = [(likelihood, impact, cell_counts[likelihood, impact])
+             for likelihood in LIKELIHOOD_SCORES for impact in IMPACT_SCORES
+             if cell_counts.get((likelihood, impact))]
+    largest = max((count for _, _, count in cells), default=1)
+    customdata = []
+    for likelihood, impact, _ in cells:
+        category, _ = get_risk_category_and_advice(likelihood, impact)
+        customdata.append([likelihood, impact, classify_risk(calculate_risk_score(likelihood, impact)), category])
+
+    cells_trace = go.Scatter(
+        x=[impact for _, impact, _ in cells],
+        y=[likelihood for likelihood, _, _ in cells],
+        mode='markers+text',
+        text=[str(count) for _, _, count in cells],
+        textfont=dict(color='white'),
+        marker=dict(symbol='circle', size=[18 + 22 * (count / largest) ** 0.5 for _, _, count in cells],
+                    color='black', line=dict(width=2, color='white')),
+        customdata=customdata,
+        hovertemplate="<b>%{text} risk(s)</b><br>Likelihood: %{y}<br>Impact: %{x}<br>"
+                      "Priority: %{customdata[2]}<br>Category: %{customdata[3]}<br>"
+                      "Click to list these risks<extra></extra>",
+        showlegend=False
+    )
+    risk_fig = go.Figure(data=[risk_heatmap_trace(), cells_trace])
+    risk_fig.update_layout(**RISK_MATRIX_LAYOUT)
+    return risk_fig
+
+
+def build_risk_points_figure(risks):
+    """Risk matrix figure with one Scatter trace per risk (RISK_MATRIX_MODE=points)."""
+    # Add submitted risks as scatter points on top of the heatmap
+    risk_points = []
+    for risk in risks:
+        risk_points.append(go.Scatter(
+            x=[risk['Impact']],
+            y=[risk['Likelihood']],
+            mode='markers',
+            marker=dict(symbol='circle', size=15, color='black',
+                        line=dict(width=2, color='white')),
+            name=f"Risk: {risk['Risk Name']}",
+            hoverinfo='text',
+            hovertext=f"<b>Risk:</b> {risk['Risk Name']}<br>"
+                        f"<b>Likelihood:</b> {risk['Likelihood']}<br>"
+                        f"<b>Impact:</b> {risk['Impact']}<br>"
+                        f"<b>Score:</b> {risk['Score']}<br>"
+                        f"<b>Priority:</b> {risk['Priority']}<br>"
+                        f"<b>Category:</b> {risk['Category']}<br>"
+                        f"<b>Advice:</b> {RISK_CATEGORY_ADVICE[risk['Category']]}",
+            showlegend=False
+        ))
+
+    risk_fig = go.Figure(data=[risk_heatmap_trace()] + risk_points)
+    risk_fig.update_layout(**RISK_MATRIX_LAYOUT)
+    return risk_fig
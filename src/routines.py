@@ -0,0 +1,372 @@
+import csv
+import itertools
+import json
+import logging
+import os
+import sqlite3
+import tempfile
+from collections import Counter
+from datetime import datetime
+from concurrent.futures import FIRST_COMPLETED, wait
+from concurrent.futures.process import BrokenProcessPool
+
+from ingest import INGEST_BATCH_SIZE
+from pools import get_process_pool, reset_process_pool
+from triage import TRIAGE_WORKERS
+
+logger = logging.getLogger(__name__)
+
+# --- Routine Dynamics Explorer Logic (From Day 4 Project) ---
+ROUTINE_STEP_FOLLOWED = "Followed"
+ROUTINE_STEP_OMITTED = "Omitted by Delegate"
+ROUTINE_STEP_ADDED = "Added by Delegate"
+ROUTINE_STEP_REORDERED = "Reordered by Delegate"
+
+
+def _myers_matched_pairs(a, b):
+    """Return the (i, j) index pairs of a longest common subsequence of `a` and `b`.
+
+    Uses Myers' O((N+M)D) greedy diff, where D is the number of inserted and
+    deleted items, so near-identical sequences of thousands of steps align in
+    close to linear time. Each round keeps only the slice of the furthest-reach
+    array it can touch, bounding memory at O(D^2).
+    """
+    n, m = len(a), len(b)
+    offset = n + m + 1
+    v = [0] * (2 * offset + 1)
+    trace = []
+    for d in range(n + m + 1):
+        trace.append(v[offset - d - 1:offset + d + 2])
+        for k in range(-d, d + 1, 2):
+            if k == -d or (k != d and v[offset + k - 1] < v[offset + k + 1]):
+                x = v[offset + k + 1]
+            else:
+                x = v[offset + k - 1] + 1
+            y = x - k
+            while x < n and y < m and a[x] == b[y]:
+                x += 1
+                y += 1
+            v[offset + k] = x
+            if x >= n and y >= m:
+                break
+        else:
+            continue
+        break
+
+    pairs = []
+    x, y = n, m
+    for d in range(len(trace) - 1, -1, -1):
+        snapshot = trace[d]
+        k = x - y
+        # snapshot[0] holds diagonal -d-1
+        if k == -d or (k != d and snapshot[k - 1 + d + 1] < snapshot[k + 1 + d + 1]):
+            prev_k = k + 1
+        else:
+            prev_k = k - 1
+        prev_x = snapshot[prev_k + d + 1] if d > 0 else 0
+        prev_y = prev_x - prev_k if d > 0 else 0
+        while x > prev_x and y > prev_y:
+            x -= 1
+            y -= 1
+            pairs.append((x, y))
+        x, y = prev_x, prev_y
+    pairs.reverse()
+    return pairs
+
+
+def check_routine_conformance(documented_steps, delegate_steps):
+    """Align a delegate's steps against the documented routine.
+
+    Steps are interned to integer IDs and aligned with a longest common
+    subsequence, so every step lands in exactly one bucket: followed (in the
+    alignment), reordered (performed, but outside the alignment), omitted or
+    added. Repeated steps are matched by count. Returns a dict with the
+    side-by-side `alignment` rows, the `followed`, `omitted`, `added` and
+    `reordered` step lists, and `score`, the share of both sequences that
+    aligns (1.0 means identical).
+    """
+    step_ids = {}
+    documented_ids = [step_ids.setdefault(step, len(step_ids)) for step in documented_steps]
+    delegate_ids = [step_ids.setdefault(step, len(step_ids)) for step in delegate_steps]
+
+    # Common leading and trailing steps always align; only diff the middle.
+    prefix = 0
+    while prefix < min(len(documented_ids), len(delegate_ids)) and documented_ids[prefix] == delegate_ids[prefix]:
+        prefix += 1
+    suffix = 0
+    while (suffix < min(len(documented_ids), len(delegate_ids)) - prefix
+           and documented_ids[-1 - suffix] == delegate_ids[-1 - suffix]):
+        suffix += 1
+    middle = _myers_matched_pairs(documented_ids[prefix:len(documented_ids) - suffix],
+                                  delegate_ids[prefix:len(delegate_ids) - suffix])
+    pairs = ([(i, i) for i in range(prefix)]
+             + [(i + prefix, j + prefix) for i, j in middle]
+             + [(len(documented_ids) - suffix + i, len(delegate_ids) - suffix + i) for i in range(suffix)])
+
+    matched_documented = {i for i, _ in pairs}
+    matched_delegate = {j for _, j in pairs}
+    # A step left out of the alignment on both sides was performed out of order.
+    reordered_budget = (Counter(documented_ids[i] for i in range(len(documented_ids)) if i not in matched_documented)
+                        & Counter(delegate_ids[j] for j in range(len(delegate_ids)) if j not in matched_delegate))
+    documented_budget = Counter(reordered_budget)
+    delegate_budget = Counter(reordered_budget)
+
+    def unmatched_status(step_id, budget, fallback):
+        if budget[step_id]:
+            budget[step_id] -= 1
+            return ROUTINE_STEP_REORDERED
+        return fallback
+
+    alignment = []
+    result = {"followed": [], "omitted": [], "added": [], "reordered": []}
+    i = j = 0
+    for next_i, next_j in pairs + [(len(documented_ids), len(delegate_ids))]:
+        while i < next_i:
+            status = unmatched_status(documented_ids[i], documented_budget, ROUTINE_STEP_OMITTED)
+            alignment.append({"Ideal_Step": documented_steps[i], "Actual_Step": "", "Status": status})
+            result["reordered" if status == ROUTINE_STEP_REORDERED else "omitted"].append(documented_steps[i])
+            i += 1
+        while j < next_j:
+            status = unmatched_status(delegate_ids[j], delegate_budget, ROUTINE_STEP_ADDED)
+            alignment.append({"Ideal_Step": "", "Actual_Step": delegate_steps[j], "Status": status})
+            if status == ROUTINE_STEP_ADDED:
+                result["added"].append(delegate_steps[j])
+            j += 1
+        if next_i < len(documented_ids):
+            alignment.append({"Ideal_Step": documented_steps[next_i], "Actual_Step": delegate_steps[next_j],
+                              "Status": ROUTINE_STEP_FOLLOWED})
+            result["followed"].append(documented_steps[next_i])
+            i, j = next_i + 1, next_j + 1
+
+    for number, row in enumerate(alignment, start=1):
+        row["Step_Number"] = number
+    total_steps = len(documented_steps) + len(delegate_steps)
+    result["alignment"] = alignment
+    result["score"] = 2 * len(pairs) / total_steps if total_steps else 1.0
+    return result
+
+
+# --- Batch Routine Conformance (Process Mining) ---
+# Event logs are read as a stream of (case, step, timestamp) events, grouped
+# into one execution per case and checked against the documented routine with
+# check_routine_conformance. Chunks of cases run on the shared process pool
+# with a bounded number in flight, and only running totals are kept: per-step
+# drift counts and a fixed-size histogram of conformance scores. Memory
+# therefore depends on chunk size and step vocabulary, not on log length.
+CONFORMANCE_WORKERS = int(os.environ.get('CONFORMANCE_WORKERS', TRIAGE_WORKERS))
+CONFORMANCE_CHUNK_CASES = int(os.environ.get('CONFORMANCE_CHUNK_CASES', 256))
+CONFORMANCE_SCORE_BINS = 1000
+EVENT_LOG_COLUMNS = {
+    'case': ('case_id', 'case', 'case id', 'caseid', 'case:concept:name'),
+    'step': ('step', 'activity', 'event', 'concept:name'),
+    'timestamp': ('timestamp', 'time', 'time:timestamp'),
+}
+CONFORMANCE_PERCENTILES = (5, 25, 50, 75, 95)
+
+
+class ConformanceRollup:
+    """Running totals of conformance results over many cases."""
+
+    def __init__(self):
+        self.cases = 0
+        self.events = 0
+        self.conformant_cases = 0
+        self.score_total = 0.0
+        self.score_histogram = [0] * (CONFORMANCE_SCORE_BINS + 1)
+        self.step_counts = {status: Counter() for status in ("followed", "omitted", "reordered", "added")}
+
+    def add_case(self, conformance, event_count):
+        self.cases += 1
+        self.events += event_count
+        score = conformance["score"]
+        self.conformant_cases += score == 1.0
+        self.score_total += score
+        self.score_histogram[int(round(score * CONFORMANCE_SCORE_BINS))] += 1
+        for status, counts in self.step_counts.items():
+            counts.update(conformance[status])
+
+    def merge(self, other):
+        self.cases += other.cases
+        self.events += other.events
+        self.conformant_cases += other.conformant_cases
+        self.score_total += other.score_total
+        self.score_histogram = [a + b for a, b in zip(self.score_histogram, other.score_histogram)]
+        for status, counts in self.step_counts.items():
+            counts.update(other.step_counts[status])
+
+    def percentile(self, percent):
+        """Nearest-rank percentile of case scores, to 1 / CONFORMANCE_SCORE_BINS."""
+        if not self.cases:
+            return None
+        rank = max(1, -(-percent * self.cases // 100))
+        seen = 0
+        for score_bin, count in enumerate(self.score_histogram):
+            seen += count
+            if seen >= rank:
+                return score_bin / CONFORMANCE_SCORE_BINS
+
+    def summary(self):
+        steps = set().union(*self.step_counts.values())
+        return {
+            "cases": self.cases,
+            "events": self.events,
+            "conformant_cases": self.conformant_cases,
+            "mean_score": self.score_total / self.cases if self.cases else None,
+            "score_percentiles": {f"p{percent}": self.percentile(percent) for percent in CONFORMANCE_PERCENTILES},
+            "steps": sorted(({
+                "Step": step,
+                **{status: counts[step] for status, counts in self.step_counts.items()},
+                "drift_rate": ((self.step_counts["omitted"][step] + self.step_counts["reordered"][step]
+                                + self.step_counts["added"][step]) / self.cases) if self.cases else 0.0,
+            } for step in steps), key=lambda row: (-row["drift_rate"], row["Step"])),
+        }
+
+
+def _check_case_chunk(documented_steps, cases):
+    rollup = ConformanceRollup()
+    for steps in cases:
+        rollup.add_case(check_routine_conformance(documented_steps, steps), len(steps))
+    return rollup
+
+
+def _event_log_key(keys, role):
+    for key in keys:
+        if key is not None and key.strip().lower() in EVENT_LOG_COLUMNS[role]:
+            return key
+    if role == 'timestamp':
+        return None
+    raise ValueError(f"No {role} column found (expected one of: {', '.join(EVENT_LOG_COLUMNS[role])})")
+
+
+def iter_event_log(lines, upload_format, skipped=None):
+    """Yield (case_id, step, timestamp) tuples from CSV or JSONL event log lines.
+
+    JSONL lines that do not hold an object are skipped; `skipped`, if given,
+    is called once for each.
+    """
+    if upload_format == '.csv':
+        records = csv.DictReader(lines)
+        fieldnames = records.fieldnames or ()
+    elif upload_format == '.jsonl':
+        records = _iter_jsonl_objects(lines, skipped)
+        first = next(records, None)
+        if first is None:
+            return
+        fieldnames = list(first)
+        records = itertools.chain([first], records)
+    else:
+        raise ValueError(f"Unsupported event log format: {upload_format!r} (expected .csv or .jsonl)")
+
+    case_key = _event_log_key(fieldnames, 'case')
+    step_key = _event_log_key(fieldnames, 'step')
+    timestamp_key = _event_log_key(fieldnames, 'timestamp')
+    for record in records:
+        step = str(record.get(step_key) or '').strip()
+        if step:
+            yield str(record[case_key]), step, record.get(timestamp_key) if timestamp_key else None
+
+
+def _iter_jsonl_objects(lines, skipped=None):
+    for line in lines:
+        if not line.strip():
+            continue
+        record = json.loads(line)
+        if isinstance(record, dict):
+            yield record
+        elif skipped is not None:
+            skipped()
+
+
+def _timestamp_sort_key(timestamp):
+    if isinstance(timestamp, (int, float)):
+        return float(timestamp)
+    try:
+        return datetime.fromisoformat(str(timestamp)).timestamp()
+    except ValueError:
+        return float(timestamp)
+
+
+def _ordered_steps(events):
+    """Return a case's steps ordered by timestamp, keeping log order for ties or unparseable times."""
+    try:
+        events = sorted(events, key=lambda event: _timestamp_sort_key(event[2]))
+    except (TypeError, ValueError):
+        pass
+    return [step for _, step, _ in events]
+
+
+def iter_cases_grouped(events):
+    """Group a log whose events are already contiguous per case; raises if a case reappears."""
+    finished = set()
+    for case_id, case_events in itertools.groupby(events, key=lambda event: event[0]):
+        if case_id in finished:
+            raise ValueError(f"Case {case_id!r} is not contiguous in the log; upload it as unsorted instead")
+        finished.add(case_id)
+        yield _ordered_steps(list(case_events))
+
+
+def iter_cases_staged(events, batch_size=INGEST_BATCH_SIZE):
+    """Group an unsorted log by staging it in a temporary on-disk SQLite table."""
+    with tempfile.TemporaryDirectory() as staging_dir:
+        conn = sqlite3.connect(os.path.join(staging_dir, 'events.sqlite3'))
+        try:
+            conn.execute("CREATE TABLE events (case_id TEXT, seq INTEGER, step TEXT, timestamp TEXT)")
+            seq = itertools.count()
+            while True:
+                batch = [(case_id, next(seq), step, timestamp)
+                         for case_id, step, timestamp in itertools.islice(events, batch_size)]
+                if not batch:
+                    break
+                conn.executemany("INSERT INTO events VALUES (?, ?, ?, ?)", batch)
+            conn.execute("CREATE INDEX events_by_case ON events (case_id, seq)")
+            rows = conn.execute("SELECT case_id, step, timestamp FROM events ORDER BY case_id, seq")
+            for _, case_events in itertools.groupby(rows, key=lambda row: row[0]):
+                yield _ordered_steps(list(case_events))
+        finally:
+            conn.close()
+
+
+def batch_routine_conformance(documented_steps, cases, max_workers=None, chunk_cases=CONFORMANCE_CHUNK_CASES):
+    """Check every case's steps against `documented_steps` and roll up the results.
+
+    `cases` is an iterable of step lists, one per case. Chunks of
+    `chunk_cases` cases are checked on the shared process pool, with at most
+    two chunks per worker in flight; with one worker they run in-process, as
+    do the unfinished and remaining chunks if the pool breaks or cannot start.
+    Returns ConformanceRollup.summary().
+    """
+    documented_steps = list(documented_steps)
+    max_workers = CONFORMANCE_WORKERS if max_workers is None else max_workers
+    rollup = ConformanceRollup()
+    cases = iter(cases)
+    chunks = iter(lambda: list(itertools.islice(cases, chunk_cases)), [])
+
+    if max_workers <= 1:
+        for chunk in chunks:
+            rollup.merge(_check_case_chunk(documented_steps, chunk))
+        return rollup.summary()
+
+    # Chunks stay in `pending` until merged, so none is lost if the pool breaks.
+    pending = {}
+
+    def merge_done(done):
+        for future in done:
+            rollup.merge(future.result())
+            del pending[future]
+
+    chunk = pool = None
+    try:
+        pool = get_process_pool('conformance', max_workers)
+        for chunk in chunks:
+            if len(pending) >= max_workers * 2:
+                merge_done(wait(pending, return_when=FIRST_COMPLETED).done)
+            pending[pool.submit(_check_case_chunk, documented_steps, chunk)] = chunk
+            chunk = None
+        merge_done(list(pending))
+    except (BrokenProcessPool, OSError):
+        logger.warning("Conformance process pool broke; falling back to serial checks")
+        reset_process_pool(pool)
+        unfinished = list(pending.values()) + ([chunk] if chunk is not None else [])
+        for chunk in itertools.chain(unfinished, chunks):
+            rollup.merge(_check_case_chunk(documented_steps, chunk))
+    return rollup.summary()
@@ -0,0 +1,64 @@
+import gc
+import importlib
+import importlib.util
+import os
+import sys
+import threading
+
+# --- Startup ---
+# With LAZY_IMPORTS=1, pandas and numpy are imported on first attribute access
+# and the shared lookup tables (the triage rules in triage.py, the benchmark
+# index in benchmarking.py) are built on first use, so a process can serve its
+# first light request without paying for them. By default pandas and numpy are
+# imported at import time; the tables are built by preload_shared_tables(),
+# which gunicorn.conf.py calls once in the master with preload_app, so the
+# forked workers share those pages copy-on-write, or else in each worker.
+# Importing the app builds nothing else and leaves the collector alone.
+LAZY_IMPORTS = os.environ.get('LAZY_IMPORTS', '').lower() in ('1', 'true', 'yes', 'on')
+
+
+def _import_heavy(name):
+    """Import module `name`; with LAZY_IMPORTS, return a module that loads on first attribute access."""
+    if not LAZY_IMPORTS or name in sys.modules:
+        return importlib.import_module(name)
+    spec = importlib.util.find_spec(name)
+    spec.loader = importlib.util.LazyLoader(spec.loader)
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[name] = module
+    spec.loader.exec_module(module)
+    return module
+
+
+pd = _import_heavy('pandas')
+np = _import_heavy('numpy')
+
+_shared_tables = []
+
+
+def shared_table(build):
+    """Decorator: build the table once, on first call or in preload_shared_tables(), and return it thereafter."""
+    built = []
+    lock = threading.Lock()
+
+    def get():
+        if not built:
+            with lock:
+                if not built:
+                    built.append(build())
+        return built[0]
+
+    get.__name__, get.__doc__ = build.__name__, build.__doc__
+    _shared_tables.append(get)
+    return get
+
+
+def preload_shared_tables():
+    """Build every shared table now, then freeze the heap so forked workers keep sharing its pages.
+
+    gc.freeze() moves everything allocated so far out of the collector's
+    generations; otherwise the first collection in each worker writes to every
+    tracked object's header and un-shares the pages holding it.
+    """
+    for get in _shared_tables:
+        get()
+    gc.freeze()
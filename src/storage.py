@@ -0,0 +1,799 @@
+import bisect
+import itertools
+import os
+import sqlite3
+import threading
+import time
+from array import array
+from collections import Counter
+
+from startup import np
+from triage import INCIDENT_FIELDS, IncidentColumns
+
+# --- Trend Rollups ---
+# Every incident has an occurrence time: the time given for it in the upload,
+# or else the time it was recorded at. Alongside the all-time counters, the
+# repositories keep per-label counts for each hour, day and week bucket of
+# occurrence time (UTC; weeks start on Monday), written in the same step as
+# the incidents.
+TREND_RESOLUTIONS = {'hour': (3600, 0), 'day': (86400, 0), 'week': (7 * 86400, 4 * 86400)}
+
+
+def trend_bucket(timestamp, resolution):
+    """Return the start, in UNIX seconds, of the `resolution` bucket holding `timestamp`."""
+    width, offset = TREND_RESOLUTIONS[resolution]
+    return int((timestamp - offset) // width * width + offset)
+
+
+def rollup_label_counts(columns, occurred_at):
+    """Count the labels of IncidentColumns per trend bucket of their `occurred_at` times.
+
+    Returns a Counter keyed by (resolution, bucket, kind, label), with kind and
+    label as in count_incident_labels.
+    """
+    counts = Counter()
+    if not len(columns):
+        return counts
+    times = np.asarray(occurred_at, dtype=np.float64)
+    selections = columns.label_selections()
+    for resolution, (width, offset) in TREND_RESOLUTIONS.items():
+        buckets, inverse = np.unique((times - offset) // width, return_inverse=True)
+        starts = (buckets * width + offset).astype(np.int64).tolist()
+        for (kind, label), selected in selections:
+            per_bucket = np.bincount(inverse[selected], minlength=len(starts))
+            for index in np.flatnonzero(per_bucket).tolist():
+                counts[resolution, starts[index], kind, label] += int(per_bucket[index])
+    return counts
+
+# --- Incident Storage ---
+# Triaged incidents live server-side; the session cookie only carries the ID of
+# the caller's incident store, so its size no longer grows with the data.
+# Stored records also carry their sequence number, the UNIX time they were
+# recorded at, which never decreases with seq within a store, and the time
+# they occurred at (see Trend Rollups). Listings are read a page at a time
+# through indexes on severity, category and recording time.
+INCIDENT_RECORD_FIELDS = INCIDENT_FIELDS + ("seq", "recorded_at", "occurred_at")
+INCIDENTS_PAGE_SIZE = 50
+# app.py's Flask instance folder, where the SQLite databases go by default.
+INSTANCE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'instance')
+
+
+def incident_index_keys(incident):
+    """Return the ('severity', label) and ('category', label) keys an incident is filed under."""
+    return [('severity', incident["Severity"])] + [
+        ('category', category) for category in incident["Inferred_Categories"].split(', ')]
+
+
+def count_incident_labels(incidents):
+    """Count severities and inferred categories over `incidents`.
+
+    Returns a Counter keyed by ('severity', label) and ('category', label);
+    the repositories fold these into their running dashboard counters.
+    """
+    # Category labels come in at most 2**len(categories) joined combinations,
+    # so the joined strings are counted first and each one is split only once.
+    severities = Counter()
+    combinations = Counter()
+    for incident in incidents:
+        severities[incident["Severity"]] += 1
+        combinations[incident["Inferred_Categories"]] += 1
+    counts = Counter({('severity', severity): count for severity, count in severities.items()})
+    for joined, count in combinations.items():
+        for category in joined.split(', '):
+            counts['category', category] += count
+    return counts
+
+
+def split_page(records, limit, cursor_of):
+    """Trim a `limit + 1` record read to one page.
+
+    Returns (page, next_cursor), where next_cursor is `cursor_of` applied to
+    the last record of the page, or None when there is nothing after it.
+    """
+    if len(records) <= limit:
+        return records, None
+    records = records[:limit]
+    return records, cursor_of(records[-1])
+
+
+def incident_cursor(incident):
+    """Return the listing cursor that resumes after `incident`."""
+    return str(incident["seq"])
+
+
+def _next_recorded_at(previous):
+    # Keep recorded_at monotonic in seq even if the wall clock steps back.
+    return max(time.time(), previous or 0.0)
+
+
+def _occurrence_times(occurred_at, recorded_at, count):
+    """Return array('d') of `count` occurrence times, with None entries (or None) meaning `recorded_at`."""
+    if occurred_at is None:
+        return array('d', [recorded_at]) * count
+    return array('d', (recorded_at if moment is None else moment for moment in occurred_at))
+
+
+class _MemoryPostings:
+    """One in-memory store: records by seq plus an ascending seq list per index key.
+
+    Record seq N sits at records[N - 1]. As recorded_at never decreases with
+    seq, time ranges, cursors and filters all resolve by bisection.
+    """
+
+    def __init__(self):
+        self.records = []
+        self.recorded_at = []
+        self.postings = {}
+
+    def add(self, records, index_keys):
+        recorded_at = _next_recorded_at(self.recorded_at[-1] if self.recorded_at else None)
+        for seq, record in enumerate(records, start=len(self.records) + 1):
+            record["seq"] = seq
+            record["recorded_at"] = recorded_at
+            for key in index_keys(record):
+                self.postings.setdefault(key, []).append(seq)
+        self.records.extend(records)
+        self.recorded_at.extend([recorded_at] * len(records))
+
+    def seq_bounds(self, since=None, until=None):
+        """Return the inclusive (first, last) seq range recorded in [since, until)."""
+        first = 1 if since is None else bisect.bisect_left(self.recorded_at, since) + 1
+        last = len(self.records) if until is None else bisect.bisect_left(self.recorded_at, until)
+        return first, last
+
+    def query(self, keys, index_keys, seq_range, after=None, descending=False, limit=INCIDENTS_PAGE_SIZE):
+        """Return up to `limit` records filed under every key in `keys`, in seq order.
+
+        The shortest posting list drives the walk; records on it are checked
+        against the remaining keys.
+        """
+        first, last = seq_range
+        if after is not None:
+            first, last = (first, min(last, after - 1)) if descending else (max(first, after + 1), last)
+        seqs = min((self.postings.get(key, ()) for key in keys), key=len) if keys else range(1, len(self.records) + 1)
+        start, stop = bisect.bisect_left(seqs, first), bisect.bisect_right(seqs, last)
+        walk = (seqs[i] for i in (range(stop - 1, start - 1, -1) if descending else range(start, stop)))
+        wanted = set(keys)
+        matches = (self.records[seq - 1] for seq in walk)
+        if len(wanted) > 1:
+            matches = (record for record in matches if wanted.issubset(index_keys(record)))
+        return [dict(record) for record in itertools.islice(matches, limit)]
+
+
+class _IncidentRows:
+    """Read-only sequence of an incident column store's rows as records with seq and both times."""
+
+    def __init__(self, columns, recorded_at, occurred_at):
+        self.columns = columns
+        self.recorded_at = recorded_at
+        self.occurred_at = occurred_at
+
+    def __len__(self):
+        return len(self.columns)
+
+    def __getitem__(self, index):
+        record = dict(zip(INCIDENT_FIELDS, self.columns.row(index)))
+        record["seq"] = index + 1
+        record["recorded_at"] = self.recorded_at[index]
+        record["occurred_at"] = self.occurred_at[index]
+        return record
+
+    def __iter__(self):
+        return map(self.__getitem__, range(len(self)))
+
+
+class _IncidentColumnPostings(_MemoryPostings):
+    """_MemoryPostings over IncidentColumns, for the in-memory incident store.
+
+    Posting lists are array('q') seq lists built from vectorised scans of each
+    appended batch's severity codes and category bits.
+    """
+
+    def __init__(self):
+        self.columns = IncidentColumns()
+        self.recorded_at = array('d')
+        self.occurred_at = array('d')
+        self.records = _IncidentRows(self.columns, self.recorded_at, self.occurred_at)
+        self.postings = {}
+
+    def add(self, batch, occurred_at=None):
+        """Append IncidentColumns; return their occurrence times (`occurred_at`, else the recording time)."""
+        first = len(self.columns)
+        recorded_at = _next_recorded_at(self.recorded_at[-1] if self.recorded_at else None)
+        self.columns.extend(batch)
+        self.recorded_at.extend(array('d', [recorded_at]) * len(batch))
+        occurred_at = _occurrence_times(occurred_at, recorded_at, len(batch))
+        self.occurred_at.extend(occurred_at)
+        self._post(first)
+        return occurred_at
+
+    def relabel(self, first_seq, batch):
+        """Replace the labels from seq `first_seq` on with `batch`'s and refile those rows only."""
+        start, stop = first_seq - 1, first_seq - 1 + len(batch)
+        self.columns.relabel(start, batch)
+        seqs = np.arange(first_seq, first_seq + len(batch), dtype=np.int64)
+        selections = dict(self.columns.label_selections(start, stop))
+        for key in set(self.postings) | set(selections):
+            # Each posting list is sorted, so the range's seqs are one slice of it.
+            postings = self.postings.setdefault(key, array('q'))
+            low, high = bisect.bisect_left(postings, first_seq), bisect.bisect_left(postings, first_seq + len(batch))
+            selected = selections.get(key)
+            postings[low:high] = array('q', seqs[selected].tobytes() if selected is not None else b'')
+
+    def _post(self, first):
+        """File rows from index `first` on under their severity and category keys."""
+        if first >= len(self.columns):
+            return
+        seqs = np.arange(first + 1, len(self.columns) + 1, dtype=np.int64)
+        for key, selected in self.columns.label_selections(first):
+            if selected.any():
+                self.postings.setdefault(key, array('q')).frombytes(seqs[selected].tobytes())
+
+
+def _split_label_counts(counts):
+    aggregates = {'severity': {}, 'category': {}}
+    for (kind, label), count in counts.items():
+        if count:
+            aggregates[kind][label] = count
+    return aggregates
+
+
+class InMemoryIncidentRepository:
+    """Append-only incident store kept in process memory as IncidentColumns.
+
+    Data is lost on restart and is not shared between gunicorn workers, so this
+    backend is meant for development and tests.
+    """
+
+    def __init__(self):
+        self._stores = {}
+        self._counters = {}
+        self._rollups = {}
+        self._lock = threading.Lock()
+
+    def append(self, store_id, incidents, occurred_at=None):
+        """Append IncidentColumns (or incident dicts) to a store.
+
+        Report IDs are numbered on from the store's count under the same lock
+        that appends, and written back to `incidents`. `occurred_at` optionally
+        gives each incident's occurrence time in UNIX seconds; None entries
+        default to the recording time.
+        """
+        if not isinstance(incidents, IncidentColumns):
+            incidents = IncidentColumns.from_records(incidents)
+        with self._lock:
+            incidents.renumber(self.count(store_id) + 1)
+            occurred_at = self._stores.setdefault(store_id, _IncidentColumnPostings()).add(incidents, occurred_at)
+            self._counters.setdefault(store_id, Counter()).update(incidents.label_counts())
+            self._add_rollups(self._rollups.setdefault(store_id, {}), rollup_label_counts(incidents, occurred_at))
+
+    @staticmethod
+    def _add_rollups(rollups, counts):
+        # Rollups are {resolution: {bucket: Counter((kind, label))}}, so a trend
+        # is one dict lookup per bucket.
+        for (resolution, bucket, kind, label), count in counts.items():
+            rollups.setdefault(resolution, {}).setdefault(bucket, Counter())[kind, label] += count
+
+    def count(self, store_id):
+        store = self._stores.get(store_id)
+        return len(store.records) if store else 0
+
+    def aggregates(self, store_id):
+        """Return running {'severity': {...}, 'category': {...}} counts for a store."""
+        return _split_label_counts(self._counters.get(store_id, {}))
+
+    def trend_counts(self, store_id, resolution, first, last):
+        """Return (bucket, kind, label, count) rollup rows for `resolution` buckets first..last."""
+        buckets = self._rollups.get(store_id, {}).get(resolution, {})
+        width = TREND_RESOLUTIONS[resolution][0]
+        return [(bucket, kind, label, count) for bucket in range(first, last + 1, width)
+                for (kind, label), count in buckets.get(bucket, {}).items() if count]
+
+    def query(self, store_id, severity=None, category=None, since=None, until=None,
+              after=None, descending=False, limit=INCIDENTS_PAGE_SIZE):
+        """Return up to `limit` incidents matching the filters, in seq order from cursor `after`."""
+        store = self._stores.get(store_id)
+        if store is None:
+            return []
+        keys = [key for key in (('severity', severity), ('category', category)) if key[1] is not None]
+        return store.query(keys, incident_index_keys, store.seq_bounds(since, until), after, descending, limit)
+
+    def retriage(self, store_id, first_seq, last_seq, matcher):
+        """Re-triage incidents first_seq..last_seq with `matcher`; return how many changed labels."""
+        store = self._stores.get(store_id)
+        if store is None:
+            return 0
+        last_seq = min(last_seq, len(store.records))
+        descriptions = store.columns.descriptions[first_seq - 1:last_seq]
+        batch = IncidentColumns.triaged(matcher, descriptions, map(matcher.triage_codes, descriptions), first_seq)
+        with self._lock:
+            before = [store.columns.row(index) for index in range(first_seq - 1, last_seq)]
+            occurred_at = store.occurred_at[first_seq - 1:last_seq]
+            previous = store.columns.slice(first_seq - 1, last_seq)
+            rollups = rollup_label_counts(batch, occurred_at)
+            rollups.subtract(rollup_label_counts(previous, occurred_at))
+            store.relabel(first_seq, batch)
+            changed = sum(row != store.columns.row(index) for index, row in enumerate(before, start=first_seq - 1))
+            counters = self._counters.setdefault(store_id, Counter())
+            counters.update(batch.label_counts())
+            counters.subtract(previous.label_counts())
+            self._add_rollups(self._rollups.setdefault(store_id, {}), rollups)
+        return changed
+
+    def iter_all(self, store_id):
+        store = self._stores.get(store_id)
+        # Stores are append-only, so the rows present now can be read lazily.
+        return map(store.records.__getitem__, range(len(store.records))) if store else iter(())
+
+    def clear(self, store_id):
+        with self._lock:
+            self._stores.pop(store_id, None)
+            self._counters.pop(store_id, None)
+            self._rollups.pop(store_id, None)
+
+
+class _SQLiteStore:
+    """Plumbing shared by the SQLite repositories: schema setup, per-thread connections and transactions.
+
+    Subclasses give the `_schema` script to run and the `_table` whose rows
+    are keyed by (store_id, seq) and carry recorded_at, and implement count().
+    """
+
+    _table = None
+    _schema = ""
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+        # The schema is created on a throwaway connection: SQLite connections
+        # must not cross a fork, and gunicorn may import this module before
+        # forking its workers.
+        conn = sqlite3.connect(self.path, timeout=30)
+        conn.executescript(self._schema)
+        conn.commit()
+        conn.close()
+
+    def _conn(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def _transaction(self):
+        return _SQLiteTransaction(self._conn())
+
+    def _next_recorded_at(self, conn, store_id, last_seq):
+        found = conn.execute(f"SELECT recorded_at FROM {self._table} WHERE store_id = ? AND seq = ?",
+                             (store_id, last_seq)).fetchone()
+        return _next_recorded_at(found[0] if found else None)
+
+    def seq_bounds(self, store_id, since=None, until=None):
+        """Return the inclusive (first, last) seq range recorded in [since, until)."""
+        conn = self._conn()
+        first, last = 1, self.count(store_id)
+        if since is not None:
+            found = conn.execute(f"SELECT seq FROM {self._table} WHERE store_id = ? AND recorded_at >= ? "
+                                 "ORDER BY recorded_at, seq LIMIT 1", (store_id, since)).fetchone()
+            first = found[0] if found else last + 1
+        if until is not None:
+            found = conn.execute(f"SELECT seq FROM {self._table} WHERE store_id = ? AND recorded_at < ? "
+                                 "ORDER BY recorded_at DESC, seq DESC LIMIT 1", (store_id, until)).fetchone()
+            last = found[0] if found else 0
+        return first, last
+
+
+class SQLiteIncidentRepository(_SQLiteStore):
+    """Append-only incident store backed by an indexed SQLite database.
+
+    Incidents are keyed by (store_id, seq) with seq counting up from 1, so a
+    page is a primary-key range read. Severity and time filters use secondary
+    indexes and category filters the incident_categories table, each ordered
+    by seq, so a filtered page is a bounded index range read too. The running
+    count, the per-label dashboard counters and the trend rollups are updated
+    in the same transaction as each append, so reading them never depends on
+    how many incidents a store holds. Connections are per thread, and appends
+    take a write lock so concurrent workers sharing the database file never
+    hand out the same sequence numbers.
+    """
+
+    _table = 'incidents'
+    _schema = """
+    CREATE TABLE IF NOT EXISTS incident_stores (
+        store_id TEXT PRIMARY KEY,
+        incident_count INTEGER NOT NULL
+    );
+    CREATE TABLE IF NOT EXISTS incidents (
+        store_id TEXT NOT NULL,
+        seq INTEGER NOT NULL,
+        report_id TEXT NOT NULL,
+        description TEXT NOT NULL,
+        severity TEXT NOT NULL,
+        inferred_categories TEXT NOT NULL,
+        suggested_action TEXT NOT NULL,
+        recorded_at REAL NOT NULL,
+        occurred_at REAL NOT NULL,
+        PRIMARY KEY (store_id, seq)
+    ) WITHOUT ROWID;
+    CREATE INDEX IF NOT EXISTS incidents_by_time ON incidents (store_id, recorded_at, seq);
+    CREATE INDEX IF NOT EXISTS incidents_by_severity ON incidents (store_id, severity, seq);
+    CREATE TABLE IF NOT EXISTS incident_counters (
+        store_id TEXT NOT NULL,
+        kind TEXT NOT NULL,
+        label TEXT NOT NULL,
+        count INTEGER NOT NULL,
+        PRIMARY KEY (store_id, kind, label)
+    ) WITHOUT ROWID;
+    CREATE TABLE IF NOT EXISTS incident_categories (
+        store_id TEXT NOT NULL,
+        category TEXT NOT NULL,
+        seq INTEGER NOT NULL,
+        PRIMARY KEY (store_id, category, seq)
+    ) WITHOUT ROWID;
+    CREATE TABLE IF NOT EXISTS incident_rollups (
+        store_id TEXT NOT NULL,
+        resolution TEXT NOT NULL,
+        bucket INTEGER NOT NULL,
+        kind TEXT NOT NULL,
+        label TEXT NOT NULL,
+        count INTEGER NOT NULL,
+        PRIMARY KEY (store_id, resolution, bucket, kind, label)
+    ) WITHOUT ROWID;
+    """
+
+    def append(self, store_id, incidents, occurred_at=None):
+        """Append IncidentColumns (or incident dicts) to a store; labels are written out as text.
+
+        Report IDs are numbered on from the store's count in the transaction
+        that allocates seqs, and written back to `incidents`. `occurred_at`
+        optionally gives each incident's occurrence time in UNIX seconds; None
+        entries default to the recording time.
+        """
+        if not isinstance(incidents, IncidentColumns):
+            incidents = IncidentColumns.from_records(incidents)
+        if not len(incidents):
+            return
+        with self._transaction() as conn:
+            found = conn.execute("SELECT incident_count FROM incident_stores WHERE store_id = ?",
+                                 (store_id,)).fetchone()
+            start = found[0] if found else 0
+            incidents.renumber(start + 1)
+            rows = list(incidents.rows())
+            recorded_at = self._next_recorded_at(conn, store_id, start)
+            occurred_at = _occurrence_times(occurred_at, recorded_at, len(rows))
+            conn.executemany("INSERT INTO incidents VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                             ((store_id, start + i + 1) + row + (recorded_at, occurred_at[i])
+                              for i, row in enumerate(rows)))
+            conn.executemany("INSERT OR IGNORE INTO incident_categories VALUES (?, ?, ?)",
+                             ((store_id, category, start + i + 1) for i, row in enumerate(rows)
+                              for category in row[3].split(', ')))
+            conn.execute("INSERT OR REPLACE INTO incident_stores VALUES (?, ?)", (store_id, start + len(rows)))
+            conn.executemany(
+                "INSERT INTO incident_counters VALUES (?, ?, ?, ?) "
+                "ON CONFLICT (store_id, kind, label) DO UPDATE SET count = count + excluded.count",
+                ((store_id, kind, label, count) for (kind, label), count in incidents.label_counts().items()))
+            self._add_rollups(conn, store_id, rollup_label_counts(incidents, occurred_at))
+
+    @staticmethod
+    def _add_rollups(conn, store_id, counts):
+        conn.executemany(
+            "INSERT INTO incident_rollups VALUES (?, ?, ?, ?, ?, ?) "
+            "ON CONFLICT (store_id, resolution, bucket, kind, label) DO UPDATE SET count = count + excluded.count",
+            ((store_id,) + key + (count,) for key, count in counts.items() if count))
+
+    def count(self, store_id):
+        found = self._conn().execute(
+            "SELECT incident_count FROM incident_stores WHERE store_id = ?", (store_id,)).fetchone()
+        return found[0] if found else 0
+
+    def aggregates(self, store_id):
+        """Return running {'severity': {...}, 'category': {...}} counts for a store."""
+        rows = self._conn().execute(
+            "SELECT kind, label, count FROM incident_counters WHERE store_id = ?", (store_id,))
+        return _split_label_counts({(kind, label): count for kind, label, count in rows})
+
+    def trend_counts(self, store_id, resolution, first, last):
+        """Return (bucket, kind, label, count) rollup rows for `resolution` buckets first..last."""
+        return self._conn().execute(
+            "SELECT bucket, kind, label, count FROM incident_rollups WHERE store_id = ? AND resolution = ? "
+            "AND bucket BETWEEN ? AND ? AND count != 0", (store_id, resolution, first, last)).fetchall()
+
+    def query(self, store_id, severity=None, category=None, since=None, until=None,
+              after=None, descending=False, limit=INCIDENTS_PAGE_SIZE):
+        """Return up to `limit` incidents matching the filters, in seq order from cursor `after`."""
+        first, last = self.seq_bounds(store_id, since, until)
+        if category is None:
+            source, seq, clauses, params = "incidents AS i", "i.seq", ["i.store_id = ?"], [store_id]
+        else:
+            source = "incident_categories AS c JOIN incidents AS i ON i.store_id = c.store_id AND i.seq = c.seq"
+            seq, clauses, params = "c.seq", ["c.store_id = ?", "c.category = ?"], [store_id, category]
+        if severity is not None:
+            clauses.append("i.severity = ?")
+            params.append(severity)
+        clauses.append(f"{seq} BETWEEN ? AND ?")
+        params += [first, last]
+        if after is not None:
+            clauses.append(f"{seq} {'<' if descending else '>'} ?")
+            params.append(after)
+        rows = self._conn().execute(
+            "SELECT i.report_id, i.description, i.severity, i.inferred_categories, i.suggested_action, i.seq, "
+            f"i.recorded_at, i.occurred_at FROM {source} WHERE {' AND '.join(clauses)} "
+            f"ORDER BY {seq} {'DESC' if descending else 'ASC'} LIMIT ?", params + [limit])
+        return [dict(zip(INCIDENT_RECORD_FIELDS, row)) for row in rows]
+
+    def retriage(self, store_id, first_seq, last_seq, matcher):
+        """Re-triage incidents first_seq..last_seq with `matcher`; return how many changed labels.
+
+        Labels, category index entries, counters and rollups change in one transaction.
+        """
+        with self._transaction() as conn:
+            rows = conn.execute(
+                "SELECT seq, occurred_at, description, inferred_categories, severity, suggested_action FROM incidents "
+                "WHERE store_id = ? AND seq BETWEEN ? AND ?", (store_id, first_seq, last_seq)).fetchall()
+            changes = []
+            rollups = Counter()
+            for seq, occurred_at, description, *old in rows:
+                new = matcher.triage(description)
+                if tuple(old) != new:
+                    changes.append((seq, tuple(old), new))
+                    buckets = [(resolution, trend_bucket(occurred_at, resolution)) for resolution in TREND_RESOLUTIONS]
+                    for labels, sign in ((old, -1), (new, 1)):
+                        for key in [('severity', labels[1])] + [('category', category)
+                                                                for category in labels[0].split(', ')]:
+                            for bucket in buckets:
+                                rollups[bucket + key] += sign
+            deltas = Counter()
+            for _, old, new in changes:
+                for labels, sign in ((old, -1), (new, 1)):
+                    deltas['severity', labels[1]] += sign
+                    for category in labels[0].split(', '):
+                        deltas['category', category] += sign
+            conn.executemany("UPDATE incidents SET inferred_categories = ?, severity = ?, suggested_action = ? "
+                             "WHERE store_id = ? AND seq = ?", (new + (store_id, seq) for seq, _, new in changes))
+            conn.executemany("DELETE FROM incident_categories WHERE store_id = ? AND category = ? AND seq = ?",
+                             ((store_id, category, seq) for seq, old, _ in changes for category in old[0].split(', ')))
+            conn.executemany("INSERT OR IGNORE INTO incident_categories VALUES (?, ?, ?)",
+                             ((store_id, category, seq) for seq, _, new in changes for category in new[0].split(', ')))
+            conn.executemany(
+                "INSERT INTO incident_counters VALUES (?, ?, ?, ?) "
+                "ON CONFLICT (store_id, kind, label) DO UPDATE SET count = count + excluded.count",
+                ((store_id, kind, label, delta) for (kind, label), delta in deltas.items() if delta))
+            self._add_rollups(conn, store_id, rollups)
+        return len(changes)
+
+    def iter_all(self, store_id):
+        rows = self._conn().execute(
+            "SELECT report_id, description, severity, inferred_categories, suggested_action, seq, recorded_at, "
+            "occurred_at FROM incidents WHERE store_id = ? ORDER BY seq", (store_id,))
+        return (dict(zip(INCIDENT_RECORD_FIELDS, row)) for row in rows)
+
+    def clear(self, store_id):
+        with self._transaction() as conn:
+            conn.execute("DELETE FROM incidents WHERE store_id = ?", (store_id,))
+            conn.execute("DELETE FROM incident_categories WHERE store_id = ?", (store_id,))
+            conn.execute("DELETE FROM incident_stores WHERE store_id = ?", (store_id,))
+            conn.execute("DELETE FROM incident_counters WHERE store_id = ?", (store_id,))
+            conn.execute("DELETE FROM incident_rollups WHERE store_id = ?", (store_id,))
+
+
+class _SQLiteTransaction:
+    """Context manager running a block inside BEGIN IMMEDIATE ... COMMIT."""
+
+    def __init__(self, conn):
+        self.conn = conn
+
+    def __enter__(self):
+        self.conn.execute("BEGIN IMMEDIATE")
+        return self.conn
+
+    def __exit__(self, exc_type, exc, tb):
+        self.conn.execute("ROLLBACK" if exc_type else "COMMIT")
+
+
+def create_incident_repository():
+    """Build the incident repository selected by the INCIDENT_STORE environment variable.
+
+    INCIDENT_STORE is "sqlite" (default) or "memory". The SQLite database path
+    comes from INCIDENT_DB_PATH and defaults to the Flask instance folder.
+    """
+    backend = os.environ.get('INCIDENT_STORE', 'sqlite')
+    if backend == 'memory':
+        return InMemoryIncidentRepository()
+    if backend == 'sqlite':
+        path = os.environ.get('INCIDENT_DB_PATH')
+        if not path:
+            os.makedirs(INSTANCE_PATH, exist_ok=True)
+            path = os.path.join(INSTANCE_PATH, 'incidents.sqlite3')
+        return SQLiteIncidentRepository(path)
+    raise ValueError(f"Unknown INCIDENT_STORE backend: {backend!r}")
+
+
+incident_repository = create_incident_repository()
+
+
+# --- Risk Storage ---
+# Like incidents, risks live server-side behind a store ID kept in the
+# session. Records hold the six RISK_FIELDS plus their sequence number and
+# recording time; advice is looked up from RISK_CATEGORY_ADVICE when a page
+# needs it. Each store keeps a running count per Likelihood x Impact cell, from
+# which the risk matrix is drawn without reading individual risks, and its
+# risks are indexed by cell in seq order. Score, priority and category are all
+# functions of the cell, so every listing is a merge of per-cell index reads.
+RISK_FIELDS = ("Risk Name", "Likelihood", "Impact", "Score", "Priority", "Category")
+RISK_RECORD_FIELDS = RISK_FIELDS + ("seq", "recorded_at")
+RISK_CELL_PAGE_SIZE = 100
+
+
+def risk_index_keys(risk):
+    return [('cell', (risk["Likelihood"], risk["Impact"]))]
+
+
+class InMemoryRiskRepository:
+    """Append-only risk store kept in process memory."""
+
+    # Versions are drawn from one counter, so no two stores or repositories share one.
+    _versions = itertools.count(1)
+
+    def __init__(self):
+        self._stores = {}
+        self._store_versions = {}
+        self._lock = threading.Lock()
+
+    def append(self, store_id, risks):
+        risks = [dict(zip(RISK_FIELDS, row)) for row in risks]
+        with self._lock:
+            self._stores.setdefault(store_id, _MemoryPostings()).add(risks, risk_index_keys)
+            self._store_versions[store_id] = next(self._versions)
+
+    def version(self, store_id):
+        """Return a number that changes whenever the store's risks do."""
+        return self._store_versions.get(store_id, 0)
+
+    def count(self, store_id):
+        store = self._stores.get(store_id)
+        return len(store.records) if store else 0
+
+    def cell_counts(self, store_id):
+        """Return {(likelihood, impact): count} for the non-empty matrix cells."""
+        store = self._stores.get(store_id)
+        return {key[1]: len(seqs) for key, seqs in store.postings.items()} if store else {}
+
+    def seq_bounds(self, store_id, since=None, until=None):
+        """Return the inclusive (first, last) seq range recorded in [since, until)."""
+        store = self._stores.get(store_id)
+        return store.seq_bounds(since, until) if store else (1, 0)
+
+    def cell_page(self, store_id, likelihood, impact, after=None, limit=RISK_CELL_PAGE_SIZE,
+                  descending=False, seq_range=None):
+        """Return up to `limit` risks in one matrix cell, in seq order from cursor `after`."""
+        store = self._stores.get(store_id)
+        if store is None:
+            return []
+        return store.query([('cell', (likelihood, impact))], risk_index_keys,
+                           seq_range or store.seq_bounds(), after, descending, limit)
+
+    def iter_all(self, store_id):
+        store = self._stores.get(store_id)
+        return iter(list(store.records) if store else ())
+
+    def clear(self, store_id):
+        with self._lock:
+            self._stores.pop(store_id, None)
+            self._store_versions[store_id] = next(self._versions)
+
+
+class SQLiteRiskRepository(_SQLiteStore):
+    """Append-only risk store in SQLite, keyed by (store_id, seq) like incidents."""
+
+    _table = 'risks'
+    _schema = """
+    CREATE TABLE IF NOT EXISTS risk_stores (
+        store_id TEXT PRIMARY KEY,
+        risk_count INTEGER NOT NULL,
+        version INTEGER NOT NULL
+    );
+    CREATE TABLE IF NOT EXISTS risks (
+        store_id TEXT NOT NULL,
+        seq INTEGER NOT NULL,
+        risk_name TEXT NOT NULL,
+        likelihood TEXT NOT NULL,
+        impact TEXT NOT NULL,
+        score INTEGER NOT NULL,
+        priority TEXT NOT NULL,
+        category TEXT NOT NULL,
+        recorded_at REAL NOT NULL,
+        PRIMARY KEY (store_id, seq)
+    ) WITHOUT ROWID;
+    CREATE INDEX IF NOT EXISTS risks_by_cell ON risks (store_id, likelihood, impact, seq);
+    CREATE INDEX IF NOT EXISTS risks_by_time ON risks (store_id, recorded_at, seq);
+    CREATE TABLE IF NOT EXISTS risk_cells (
+        store_id TEXT NOT NULL,
+        likelihood TEXT NOT NULL,
+        impact TEXT NOT NULL,
+        count INTEGER NOT NULL,
+        PRIMARY KEY (store_id, likelihood, impact)
+    ) WITHOUT ROWID;
+    """
+
+    def append(self, store_id, risks):
+        rows = [tuple(row) for row in risks]
+        if not rows:
+            return
+        with self._transaction() as conn:
+            found = conn.execute("SELECT risk_count FROM risk_stores WHERE store_id = ?", (store_id,)).fetchone()
+            start = found[0] if found else 0
+            recorded_at = self._next_recorded_at(conn, store_id, start)
+            conn.executemany("INSERT INTO risks VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                             ((store_id, start + i + 1) + row + (recorded_at,) for i, row in enumerate(rows)))
+            conn.execute("INSERT INTO risk_stores VALUES (?, ?, 1) ON CONFLICT (store_id) "
+                         "DO UPDATE SET risk_count = excluded.risk_count, version = version + 1",
+                         (store_id, start + len(rows)))
+            conn.executemany(
+                "INSERT INTO risk_cells VALUES (?, ?, ?, ?) "
+                "ON CONFLICT (store_id, likelihood, impact) DO UPDATE SET count = count + excluded.count",
+                ((store_id, likelihood, impact, count)
+                 for (likelihood, impact), count in Counter((row[1], row[2]) for row in rows).items()))
+
+    def count(self, store_id):
+        found = self._conn().execute("SELECT risk_count FROM risk_stores WHERE store_id = ?", (store_id,)).fetchone()
+        return found[0] if found else 0
+
+    def version(self, store_id):
+        """Return a number that changes whenever the store's risks do."""
+        found = self._conn().execute("SELECT version FROM risk_stores WHERE store_id = ?", (store_id,)).fetchone()
+        return found[0] if found else 0
+
+    def cell_counts(self, store_id):
+        """Return {(likelihood, impact): count} for the non-empty matrix cells."""
+        rows = self._conn().execute("SELECT likelihood, impact, count FROM risk_cells WHERE store_id = ?", (store_id,))
+        return {(likelihood, impact): count for likelihood, impact, count in rows if count}
+
+    def cell_page(self, store_id, likelihood, impact, after=None, limit=RISK_CELL_PAGE_SIZE,
+                  descending=False, seq_range=None):
+        """Return up to `limit` risks in one matrix cell, in seq order from cursor `after`."""
+        first, last = seq_range or (1, self.count(store_id))
+        if after is not None:
+            first, last = (first, min(last, after - 1)) if descending else (max(first, after + 1), last)
+        rows = self._conn().execute(
+            "SELECT risk_name, likelihood, impact, score, priority, category, seq, recorded_at FROM risks "
+            "WHERE store_id = ? AND likelihood = ? AND impact = ? AND seq BETWEEN ? AND ? "
+            f"ORDER BY seq {'DESC' if descending else 'ASC'} LIMIT ?",
+            (store_id, likelihood, impact, first, last, limit))
+        return [dict(zip(RISK_RECORD_FIELDS, row)) for row in rows]
+
+    def iter_all(self, store_id):
+        rows = self._conn().execute(
+            "SELECT risk_name, likelihood, impact, score, priority, category, seq, recorded_at FROM risks "
+            "WHERE store_id = ? ORDER BY seq", (store_id,))
+        return (dict(zip(RISK_RECORD_FIELDS, row)) for row in rows)
+
+    def clear(self, store_id):
+        with self._transaction() as conn:
+            conn.execute("DELETE FROM risks WHERE store_id = ?", (store_id,))
+            # The row is kept, emptied, so the version keeps counting up.
+            conn.execute("UPDATE risk_stores SET risk_count = 0, version = version + 1 WHERE store_id = ?",
+                         (store_id,))
+            conn.execute("DELETE FROM risk_cells WHERE store_id = ?", (store_id,))
+
+
+def create_risk_repository():
+    """Build the risk repository selected by RISK_STORE (defaults to INCIDENT_STORE).
+
+    The SQLite database path comes from RISK_DB_PATH and defaults to the
+    Flask instance folder.
+    """
+    backend = os.environ.get('RISK_STORE', os.environ.get('INCIDENT_STORE', 'sqlite'))
+    if backend == 'memory':
+        return InMemoryRiskRepository()
+    if backend == 'sqlite':
+        path = os.environ.get('RISK_DB_PATH')
+        if not path:
+            os.makedirs(INSTANCE_PATH, exist_ok=True)
+            path = os.path.join(INSTANCE_PATH, 'risks.sqlite3')
+        return SQLiteRiskRepository(path)
+    raise ValueError(f"Unknown RISK_STORE backend: {backend!r}")
+
+
+risk_repository = create_risk_repository()
@@ -0,0 +1,115 @@
+import math
+import os
+import time
+from datetime import datetime, timezone
+
+import plotly.graph_objects as go
+
+import storage
+from storage import TREND_RESOLUTIONS, trend_bucket
+from triage import SEVERITY_LEVELS
+
+# --- Incident Trends ---
+# Trends are read from the per-bucket label counts the repositories keep (see
+# Trend Rollups in storage.py), so a trend chart reads a fixed number of
+# rollup rows however many incidents a store holds. High-severity spikes are
+# found from the same rollups: a bucket is a spike when its High count exceeds
+# the mean of the TREND_SPIKE_WINDOW buckets before it by
+# TREND_SPIKE_THRESHOLD standard deviations and is at least
+# TREND_SPIKE_MIN_COUNT.
+TREND_DEFAULT_BUCKETS = {'hour': 48, 'day': 90, 'week': 52}
+TREND_MAX_BUCKETS = 2000
+TREND_SPIKE_WINDOW = int(os.environ.get('TREND_SPIKE_WINDOW', 14))
+TREND_SPIKE_THRESHOLD = float(os.environ.get('TREND_SPIKE_THRESHOLD', 3.0))
+TREND_SPIKE_MIN_COUNT = int(os.environ.get('TREND_SPIKE_MIN_COUNT', 3))
+# Times outside these bounds cannot be turned back into datetimes, e.g. epoch
+# milliseconds mistaken for seconds, so they are rejected when parsed.
+TIMESTAMP_MIN = datetime(1, 1, 2, tzinfo=timezone.utc).timestamp()
+TIMESTAMP_MAX = datetime(9999, 12, 30, tzinfo=timezone.utc).timestamp()
+
+
+def parse_timestamp(value):
+    """Return UNIX seconds for a number or an ISO 8601 string (UTC unless an offset is given)."""
+    try:
+        seconds = float(value)
+    except (TypeError, ValueError):
+        if not isinstance(value, str):
+            raise ValueError(f"Invalid timestamp: {value!r}") from None
+        moment = datetime.fromisoformat(value.strip())
+        if moment.tzinfo is None:
+            moment = moment.replace(tzinfo=timezone.utc)
+        seconds = moment.timestamp()
+    if not math.isfinite(seconds) or not TIMESTAMP_MIN <= seconds <= TIMESTAMP_MAX:
+        raise ValueError(f"Invalid timestamp: {value!r}")
+    return seconds
+
+
+def detect_spikes(counts, window=None, threshold=None, min_count=None):
+    """Return the indexes of `counts` that spike above the `window` counts before them.
+
+    The standard deviation is floored at 1, so after a flat, quiet stretch a
+    single extra incident is not a spike. The first `window` counts are only
+    history and are never reported.
+    """
+    window = TREND_SPIKE_WINDOW if window is None else window
+    threshold = TREND_SPIKE_THRESHOLD if threshold is None else threshold
+    min_count = TREND_SPIKE_MIN_COUNT if min_count is None else min_count
+    spikes = []
+    for index in range(window, len(counts)):
+        history = counts[index - window:index]
+        mean = sum(history) / window
+        deviation = max(math.sqrt(sum((count - mean) ** 2 for count in history) / window), 1.0)
+        if counts[index] >= min_count and counts[index] > mean + threshold * deviation:
+            spikes.append(index)
+    return spikes
+
+
+def incident_trends(store_id, resolution, since=None, until=None):
+    """Return per-label incident counts for each `resolution` bucket of a store, with high-severity spikes.
+
+    Buckets run from the one holding `since` to the one holding `until`
+    (default: now); without `since`, the last TREND_DEFAULT_BUCKETS buckets.
+    Returns {'resolution', 'buckets': [start, ...], 'severity': {level:
+    [count, ...]}, 'category': {label: [count, ...]}, 'high_severity_spikes':
+    [start, ...]}, with categories by descending total.
+    """
+    width = TREND_RESOLUTIONS[resolution][0]
+    last = trend_bucket(time.time() if until is None else until, resolution)
+    first = last - (TREND_DEFAULT_BUCKETS[resolution] - 1) * width if since is None else trend_bucket(since, resolution)
+    count = (last - first) // width + 1
+    if not 1 <= count <= TREND_MAX_BUCKETS:
+        raise ValueError(f"A trend spans 1 to {TREND_MAX_BUCKETS} buckets; this one would span {count}")
+    # High counts are also read for the window before `first`, so the first
+    # buckets are judged against real history rather than zeros.
+    history = first - TREND_SPIKE_WINDOW * width
+    high = [0] * (TREND_SPIKE_WINDOW + count)
+    series = {'severity': {level: [0] * count for level in SEVERITY_LEVELS}, 'category': {}}
+    for bucket, kind, label, total in storage.incident_repository.trend_counts(store_id, resolution, history, last):
+        index = (bucket - first) // width
+        if kind == 'severity' and label == "High":
+            high[index + TREND_SPIKE_WINDOW] = total
+        if index >= 0:
+            series[kind].setdefault(label, [0] * count)[index] = total
+    categories = sorted(series['category'].items(), key=lambda item: (-sum(item[1]), item[0]))
+    return {'resolution': resolution, 'buckets': list(range(first, last + 1, width)),
+            'severity': series['severity'], 'category': dict(categories),
+            'high_severity_spikes': [first + (index - TREND_SPIKE_WINDOW) * width for index in detect_spikes(high)]}
+
+
+def build_incident_trend_figure(trends):
+    """Plot per-severity trend lines, per-category lines (hidden until picked in the legend) and spikes."""
+    times = [datetime.fromtimestamp(bucket, timezone.utc).isoformat() for bucket in trends['buckets']]
+    trend_fig = go.Figure()
+    for level, counts in trends['severity'].items():
+        trend_fig.add_trace(go.Scatter(x=times, y=counts, mode='lines', name=f"{level} severity"))
+    for category, counts in trends['category'].items():
+        trend_fig.add_trace(go.Scatter(x=times, y=counts, mode='lines', name=category, visible='legendonly'))
+    if trends['high_severity_spikes']:
+        high = dict(zip(trends['buckets'], trends['severity']["High"]))
+        trend_fig.add_trace(go.Scatter(
+            x=[datetime.fromtimestamp(bucket, timezone.utc).isoformat() for bucket in trends['high_severity_spikes']],
+            y=[high[bucket] for bucket in trends['high_severity_spikes']], mode='markers', name="High-severity spike",
+            marker=dict(color='red', size=12, symbol='x')))
+    trend_fig.update_layout(title_text=f"Incidents per {trends['resolution']}", title_x=0.5,
+                            xaxis_title="Occurred (UTC)", yaxis_title="Number of Incidents")
+    return trend_fig
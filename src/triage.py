@@ -0,0 +1,599 @@
+import hashlib
+import itertools
+import json
+import logging
+import os
+import re
+import threading
+import time
+from array import array
+from collections import Counter, OrderedDict
+from concurrent.futures.process import BrokenProcessPool
+
+from metrics import METRICS_ENABLED, metrics, timed
+from pools import get_process_pool, reset_process_pool
+from startup import np, shared_table
+
+logger = logging.getLogger(__name__)
+
+# --- Incident Analysis Logic (From Day 2 Project) ---
+TRIAGE_KEYWORDS = {
+    "Equipment Failure": ["malfunction", "faulty", "broke", "failure", "mechanical", "electrical", "sensor", "pump", "valve", "engine"],
+    "Human Error": ["mistake", "forgot", "misread", "missed", "oversight", "operator", "crew", "training", "procedure deviation", "communication breakdown"],
+    "Procedure/Process Issue": ["procedure", "protocol", "checklist", "SOP", "unclear", "ambiguous", "outdated", "steps", "process flow", "workflow"],
+    "Environmental Factor": ["weather", "rain", "wind", "slippery", "lighting", "visibility", "temperature", "noise", "vibration"],
+    "Maintenance Related": ["maintenance", "repair", "inspection", "servicing", "worn", "scheduled"],
+    "Communication Breakdown": ["communication", "handover", "briefing", "missed call", "misunderstood"]
+}
+
+ACTION_SUGGESTIONS = {
+    "Equipment Failure": "Schedule immediate inspection and maintenance; review equipment history for recurring issues.",
+    "Human Error": "Initiate procedure review; update documentation; conduct process walkthrough; provide targeted training.",
+    "Procedure/Process Issue": "Revise and simplify relevant procedures; implement stricter adherence checks; conduct process mapping.",
+    "Environmental Factor": "Develop contingency plans for adverse conditions; implement environmental monitoring systems.",
+    "Maintenance Related": "Implement predictive maintenance techniques; optimize maintenance schedules; conduct component-level failure analysis.",
+    "Communication Breakdown": "Establish clear communication protocols; implement read-back/verify procedures; improve shift handover processes."
+}
+
+DEFAULT_SUGGESTED_ACTION = "Conduct full root cause analysis (RCA) to understand contributing factors."
+
+# Simplified severity assignment for demonstration
+HIGH_SEVERITY_KEYWORDS = ["major", "critical", "shutdown"]
+LOW_SEVERITY_KEYWORDS = ["minor", "small"]
+
+HIGH_SEVERITY_FLAG = 1
+LOW_SEVERITY_FLAG = 2
+
+# Severity codes index SEVERITY_LEVELS. A high keyword wins over a low one,
+# and reports with neither are Medium.
+SEVERITY_LEVELS = ["Low", "Medium", "High"]
+SEVERITY_CODE_BY_FLAGS = (1, 2, 0, 2)
+
+
+def _keyword_trie_pattern(words):
+    """Build a regex alternation for `words` with shared prefixes factored out.
+
+    Python's `re` tries alternatives one after another, so a flat
+    `kw1|kw2|...` costs one attempt per keyword at every position. Folding the
+    keywords into a trie means each position only follows the branch for the
+    next character, and the greedy optional tail makes the longest keyword win.
+    """
+    trie = {}
+    for word in words:
+        node = trie
+        for char in word:
+            node = node.setdefault(char, {})
+        node[''] = {}
+
+    def build(node):
+        branches = [re.escape(char) + build(child) for char, child in sorted(node.items()) if char]
+        if not branches:
+            return ''
+        group = '(?:' + '|'.join(branches) + ')'
+        return group + '?' if '' in node else group
+
+    return build(trie)
+
+
+class TriageMatcher:
+    """Category and severity keyword matcher compiled once from a rule set.
+
+    Every keyword goes into a single trie-shaped regex, so a report is
+    lower-cased once and scanned in one pass instead of once per keyword.
+    Results are identical to plain `kw in report.lower()` substring checks:
+    keywords nested inside a hit are folded into that hit's masks, and the scan
+    resumes early enough to catch keywords that overlap the end of a hit. Like
+    the substring checks, keywords containing upper-case characters never
+    match the lower-cased report.
+    """
+
+    def __init__(self, keywords, action_suggestions, high_severity_keywords, low_severity_keywords,
+                 default_action=DEFAULT_SUGGESTED_ACTION):
+        self.categories = list(keywords)
+        self.action_suggestions = dict(action_suggestions)
+        self.default_action = default_action
+
+        masks = {}
+        for bit, kws in enumerate(keywords.values()):
+            for kw in kws:
+                masks.setdefault(kw, [0, 0])[0] |= 1 << bit
+        for kw in high_severity_keywords:
+            masks.setdefault(kw, [0, 0])[1] |= HIGH_SEVERITY_FLAG
+        for kw in low_severity_keywords:
+            masks.setdefault(kw, [0, 0])[1] |= LOW_SEVERITY_FLAG
+
+        # The regex reports only the longest keyword starting at a position.
+        # Each keyword therefore carries the masks of every keyword it
+        # contains, and the scan resumes at the first offset where a keyword
+        # could start inside the hit but run past its end.
+        self._hits = {}
+        for kw in masks:
+            category_mask, severity_mask = 0, 0
+            for other, (other_categories, other_severity) in masks.items():
+                if other in kw:
+                    category_mask |= other_categories
+                    severity_mask |= other_severity
+            resume = next((offset for offset in range(1, len(kw))
+                           if any(other.startswith(kw[offset:]) and len(other) > len(kw) - offset for other in masks)),
+                          len(kw))
+            self._hits[kw] = (category_mask, severity_mask, resume)
+
+        self._search = re.compile(_keyword_trie_pattern(masks)).search
+        self._results_by_mask = {}
+        # Suggested actions as a code table, for IncidentColumns.
+        self.actions = list(dict.fromkeys([self.action_suggestions.get(category, default_action)
+                                           for category in self.categories] + [default_action]))
+        self._action_codes = {action: code for code, action in enumerate(self.actions)}
+
+    def match(self, report):
+        """Return the (category_mask, severity_mask) of all keyword hits in `report`."""
+        text = report.lower()
+        category_mask, severity_mask = 0, 0
+        hit = self._search(text)
+        while hit:
+            hit_categories, hit_severity, resume = self._hits[hit.group()]
+            category_mask |= hit_categories
+            severity_mask |= hit_severity
+            hit = self._search(text, hit.start() + resume)
+        return category_mask, severity_mask
+
+    def categories_for_mask(self, category_mask):
+        """Return the category names set in `category_mask`, in rule-set order."""
+        return [category for bit, category in enumerate(self.categories) if category_mask >> bit & 1]
+
+    def mask_result(self, category_mask):
+        """Return (inferred_categories, suggested_action, action_code) for a category mask."""
+        # There are only 2**len(categories) combinations, so the joined label
+        # and suggested action are worked out once per combination.
+        result = self._results_by_mask.get(category_mask)
+        if result is None:
+            inferred_categories = self.categories_for_mask(category_mask) or ["Unknown"]
+            # Suggest action based on the first inferred category or a default
+            suggested_action = self.action_suggestions.get(inferred_categories[0], self.default_action)
+            result = self._results_by_mask[category_mask] = (", ".join(inferred_categories), suggested_action,
+                                                             self._action_codes[suggested_action])
+        return result
+
+    def triage_codes(self, report):
+        """Return (category_mask, severity_code, action_code) for one report."""
+        category_mask, severity_mask = self.match(report)
+        return category_mask, SEVERITY_CODE_BY_FLAGS[severity_mask], self.mask_result(category_mask)[2]
+
+    def triage(self, report):
+        """Return (inferred_categories, severity, suggested_action) for one report."""
+        category_mask, severity_mask = self.match(report)
+        result = self.mask_result(category_mask)
+        return result[0], SEVERITY_LEVELS[SEVERITY_CODE_BY_FLAGS[severity_mask]], result[1]
+
+
+# --- Triage Rules ---
+# The keyword tables above are the built-in rule set. TRIAGE_RULES_PATH may
+# name a JSON or YAML (with PyYAML installed) file overriding any of its keys:
+#
+#   {"categories": {"Equipment Failure": ["pump", "valve"], ...},
+#    "actions": {"Equipment Failure": "Inspect the equipment.", ...},
+#    "default_action": "...", "high_severity": [...], "low_severity": [...]}
+#
+# Each rule set is compiled into a TriageMatcher once and cached under its
+# version, a hash of its contents. The file's mtime is checked at most every
+# TRIAGE_RULES_CHECK_SECONDS; a changed file is compiled off to the side and
+# swapped in with a single assignment, so triage already under way finishes on
+# the matcher it started with and nothing waits for the reload. A file that
+# fails to load is logged and the previous rules (at startup, the built-in
+# ones) stay in force. Stored
+# incidents keep their labels until re-triaged (POST /incidents/retriage).
+TRIAGE_RULES_PATH = os.environ.get('TRIAGE_RULES_PATH') or None
+TRIAGE_RULES_CHECK_SECONDS = float(os.environ.get('TRIAGE_RULES_CHECK_SECONDS', 2))
+TRIAGE_RULES_CACHE_SIZE = 8
+DEFAULT_TRIAGE_RULES = {
+    "categories": TRIAGE_KEYWORDS,
+    "actions": ACTION_SUGGESTIONS,
+    "default_action": DEFAULT_SUGGESTED_ACTION,
+    "high_severity": HIGH_SEVERITY_KEYWORDS,
+    "low_severity": LOW_SEVERITY_KEYWORDS,
+}
+
+
+def parse_triage_rules(data):
+    """Validate a rules mapping and fill missing keys from DEFAULT_TRIAGE_RULES; raise ValueError if malformed."""
+    if not isinstance(data, dict):
+        raise ValueError("Triage rules must be a mapping")
+    unknown = set(data) - set(DEFAULT_TRIAGE_RULES)
+    if unknown:
+        raise ValueError(f"Unknown triage rule keys: {', '.join(sorted(unknown))}")
+    rules = {**DEFAULT_TRIAGE_RULES, **data}
+
+    def words(value, name):
+        if not isinstance(value, list) or not all(isinstance(word, str) and word for word in value):
+            raise ValueError(f"{name} must be a list of non-empty strings")
+        return list(value)
+
+    if not isinstance(rules["categories"], dict) or not rules["categories"]:
+        raise ValueError("categories must map category names to keyword lists")
+    if len(rules["categories"]) > 62:
+        raise ValueError("At most 62 categories are supported")
+    if not isinstance(rules["actions"], dict) or not all(isinstance(v, str) for v in rules["actions"].values()):
+        raise ValueError("actions must map category names to action text")
+    if not isinstance(rules["default_action"], str):
+        raise ValueError("default_action must be a string")
+    return {
+        "categories": {str(category): words(kws, f"Keywords for {category!r}")
+                       for category, kws in rules["categories"].items()},
+        "actions": {str(category): action for category, action in rules["actions"].items()},
+        "default_action": rules["default_action"],
+        "high_severity": words(rules["high_severity"], "high_severity"),
+        "low_severity": words(rules["low_severity"], "low_severity"),
+    }
+
+
+def load_triage_rules(path):
+    """Read and validate the rules file at `path` (.json, or .yaml/.yml with PyYAML)."""
+    with open(path, 'rb') as rules_file:
+        content = rules_file.read()
+    if path.lower().endswith(('.yaml', '.yml')):
+        try:
+            import yaml
+        except ImportError:
+            raise ValueError("Reading YAML triage rules needs PyYAML; use a .json file instead") from None
+        try:
+            data = yaml.safe_load(content)
+        except yaml.YAMLError as exc:
+            raise ValueError(f"Invalid YAML in {path}: {exc}") from None
+    else:
+        try:
+            data = json.loads(content)
+        except json.JSONDecodeError as exc:
+            raise ValueError(f"Invalid JSON in {path}: {exc}") from None
+    return parse_triage_rules(data)
+
+
+def triage_rules_version(rules):
+    return hashlib.sha256(json.dumps(rules, sort_keys=True).encode('utf-8')).hexdigest()[:12]
+
+
+class TriageRuleSet:
+    """The active TriageMatcher, recompiled when the rules file changes.
+
+    Compiled matchers are kept per rule version (up to TRIAGE_RULES_CACHE_SIZE),
+    so reverting the file, or a pool worker asked for a version it has seen
+    before, reuses the compiled matcher.
+    """
+
+    def __init__(self, path=None, check_seconds=TRIAGE_RULES_CHECK_SECONDS):
+        self.path = path
+        self.check_seconds = check_seconds
+        self._compiled = OrderedDict()
+        self._reload_lock = threading.Lock()
+        self._mtime = None
+        self.error = None
+        self.loaded_at = time.time()
+        self._matcher = self.compiled(DEFAULT_TRIAGE_RULES)
+        if path is not None:
+            self._reload_if_changed()
+
+    def compiled(self, rules, version=None):
+        """Return the TriageMatcher for `rules`, compiling it on first use."""
+        version = version or triage_rules_version(rules)
+        matcher = self._compiled.get(version)
+        if matcher is None:
+            matcher = TriageMatcher(rules["categories"], rules["actions"], rules["high_severity"],
+                                    rules["low_severity"], rules["default_action"])
+            matcher.rules, matcher.version = rules, version
+            self._compiled[version] = matcher
+            while len(self._compiled) > TRIAGE_RULES_CACHE_SIZE:
+                self._compiled.popitem(last=False)
+        return matcher
+
+    def current(self):
+        """Return the matcher for the current rules, reloading them first if the file changed."""
+        if self.path is not None and time.monotonic() - self._checked_at >= self.check_seconds:
+            # Requests arriving during a reload carry on with the previous matcher.
+            if self._reload_lock.acquire(blocking=False):
+                try:
+                    self._reload_if_changed()
+                finally:
+                    self._reload_lock.release()
+        return self._matcher
+
+    def _reload_if_changed(self):
+        self._checked_at = time.monotonic()
+        try:
+            mtime = os.stat(self.path).st_mtime_ns
+            if mtime == self._mtime:
+                return
+            self._mtime = mtime
+            matcher = self.compiled(load_triage_rules(self.path))
+        except (OSError, ValueError) as exc:
+            self.error = str(exc)
+            logger.error("Keeping triage rules %s: %s", self._matcher.version, exc)
+            return
+        self.error = None
+        if matcher is not self._matcher:
+            self._matcher, self.loaded_at = matcher, time.time()
+            logger.info("Triage rules %s loaded from %s", matcher.version, self.path)
+
+    def stats(self):
+        return {'path': self.path, 'version': self._matcher.version, 'loaded_at': self.loaded_at,
+                'categories': self._matcher.categories, 'error': self.error,
+                'cached_versions': list(self._compiled)}
+
+
+@shared_table
+def triage_rules():
+    """The TriageRuleSet serving triage_matcher(), read from TRIAGE_RULES_PATH if set."""
+    return TriageRuleSet(TRIAGE_RULES_PATH)
+
+
+def triage_matcher():
+    """The current rules' compiled TriageMatcher."""
+    return triage_rules().current()
+
+
+def automated_incident_triage(incident_reports, current_total_incidents):
+    return _build_incident_records(incident_reports, map(triage_matcher().triage, incident_reports),
+                                   current_total_incidents)
+
+
+def _build_incident_records(incident_reports, triage_results, current_total_incidents):
+    processed_reports = []
+    start_id = current_total_incidents + 1
+    for i, (report, (inferred_categories, severity, suggested_action)) in enumerate(zip(incident_reports,
+                                                                                          triage_results)):
+        processed_reports.append({
+            "Report_ID": f"INC-{start_id + i:03d}",
+            "Description": report,
+            "Severity": severity,
+            "Inferred_Categories": inferred_categories,
+            "Suggested_Action": suggested_action
+        })
+    return processed_reports
+
+# --- Parallel Batch Triage ---
+# Large batches are sharded across a process pool. Workers only return the
+# (category_mask, severity_code, action_code) integers for each report, so
+# results cross the process boundary cheaply. Report IDs are assigned in the
+# parent from the batch position, which keeps INC-nnn numbering identical to
+# serial triage.
+TRIAGE_WORKERS = int(os.environ.get('TRIAGE_WORKERS', os.cpu_count() or 1))
+TRIAGE_PARALLEL_THRESHOLD = int(os.environ.get('TRIAGE_PARALLEL_THRESHOLD', 2000))
+TRIAGE_CHUNKS_PER_WORKER = 4
+
+def _triage_chunk(rules_version, rules, incident_reports):
+    # Workers triage with the parent's rule version, whatever their own file says.
+    triage_codes = triage_rules().compiled(rules, rules_version).triage_codes
+    return [triage_codes(report) for report in incident_reports]
+
+
+def triage_batch(incident_reports, current_total_incidents, max_workers=None, parallel_threshold=None):
+    """Triage a list of reports, sharding the work across processes when it pays off.
+
+    Returns IncidentColumns holding the same incidents as
+    `automated_incident_triage` (its records() are equal), in input order,
+    with IDs numbered from `current_total_incidents` + 1. Batches smaller than
+    `parallel_threshold` (default TRIAGE_PARALLEL_THRESHOLD) or runs with a
+    single worker are triaged serially in this process, as is any batch whose
+    process pool breaks.
+    """
+    incident_reports = list(incident_reports)
+    started = time.perf_counter()
+    with timed('triage'):
+        processed_reports = _triage_batch(incident_reports, current_total_incidents, max_workers, parallel_threshold)
+    if METRICS_ENABLED:
+        metrics.record_triage(len(incident_reports), time.perf_counter() - started)
+    return processed_reports
+
+
+def _triage_batch(incident_reports, current_total_incidents, max_workers, parallel_threshold):
+    max_workers = TRIAGE_WORKERS if max_workers is None else max_workers
+    parallel_threshold = TRIAGE_PARALLEL_THRESHOLD if parallel_threshold is None else parallel_threshold
+    matcher = triage_matcher()
+    if max_workers <= 1 or len(incident_reports) < max(parallel_threshold, 2):
+        return IncidentColumns.triaged(matcher, incident_reports, map(matcher.triage_codes, incident_reports),
+                                       current_total_incidents + 1)
+
+    chunk_size = -(-len(incident_reports) // (max_workers * TRIAGE_CHUNKS_PER_WORKER))
+    chunks = [incident_reports[start:start + chunk_size] for start in range(0, len(incident_reports), chunk_size)]
+    pool = get_process_pool('triage', max_workers)
+    try:
+        chunk_results = list(pool.map(
+            _triage_chunk, itertools.repeat(matcher.version), itertools.repeat(matcher.rules), chunks))
+    except BrokenProcessPool:
+        logger.warning("Triage process pool broke; falling back to serial triage")
+        reset_process_pool(pool)
+        return IncidentColumns.triaged(matcher, incident_reports, map(matcher.triage_codes, incident_reports),
+                                       current_total_incidents + 1)
+
+    return IncidentColumns.triaged(matcher, incident_reports, itertools.chain.from_iterable(chunk_results),
+                                   current_total_incidents + 1)
+
+# --- Incident Columns ---
+# Triage hands its results over column-wise: the in-memory store keeps them
+# in this form, and the SQLite store writes their rows out as text.
+INCIDENT_FIELDS = ("Report_ID", "Description", "Severity", "Inferred_Categories", "Suggested_Action")
+
+
+class IncidentColumns:
+    """Triaged incidents held column-wise, with labels as small integer codes.
+
+    Severity codes index SEVERITY_LEVELS, action codes index `actions`, and
+    inferred categories are a bitmask over `categories` (0 is "Unknown"), so
+    each distinct label string is held once per table rather than once per
+    incident, and label counts are vectorised bit sums. Report IDs are kept as
+    their INC-nnn numbers. Dict records are only built when rows are read.
+    """
+
+    def __init__(self, categories=(), actions=()):
+        self.categories = list(categories)
+        self.actions = list(actions)
+        self._category_bits = {category: bit for bit, category in enumerate(self.categories)}
+        self._action_codes = {action: code for code, action in enumerate(self.actions)}
+        self._labels_by_mask = {}
+        self._masks_by_label = {}
+        self.numbers = array('q')
+        self.descriptions = []
+        self.severity = array('b')
+        self.category_mask = array('q')
+        self.action = array('h')
+
+    @classmethod
+    def triaged(cls, matcher, descriptions, codes, first_number):
+        """Build columns from `descriptions` and their TriageMatcher.triage_codes results."""
+        columns = cls(matcher.categories, matcher.actions)
+        columns.descriptions = list(descriptions)
+        columns.numbers = array('q', range(first_number, first_number + len(columns.descriptions)))
+        for category_mask, severity_code, action_code in codes:
+            columns.category_mask.append(category_mask)
+            columns.severity.append(severity_code)
+            columns.action.append(action_code)
+        return columns
+
+    @classmethod
+    def from_records(cls, records, categories=None, actions=None):
+        """Encode incident dicts against the given code tables (default: the triage matcher's).
+
+        Labels missing from the tables are added to them. Category names are
+        rendered back in table order, as triage joins them.
+        """
+        matcher = triage_matcher()
+        columns = cls(matcher.categories if categories is None else categories,
+                      matcher.actions if actions is None else actions)
+        for record in records:
+            columns.numbers.append(int(record["Report_ID"].rpartition('-')[2]))
+            columns.descriptions.append(record["Description"])
+            columns.severity.append(SEVERITY_LEVELS.index(record["Severity"]))
+            columns.category_mask.append(columns._mask_for_labels(record["Inferred_Categories"]))
+            columns.action.append(columns._action_code(record["Suggested_Action"]))
+        return columns
+
+    def __len__(self):
+        return len(self.descriptions)
+
+    def _category_bit(self, category):
+        bit = self._category_bits.get(category)
+        if bit is None:
+            bit = self._category_bits[category] = len(self.categories)
+            self.categories.append(category)
+        return bit
+
+    def _action_code(self, action):
+        code = self._action_codes.get(action)
+        if code is None:
+            code = self._action_codes[action] = len(self.actions)
+            self.actions.append(action)
+        return code
+
+    def _mask_for_labels(self, inferred_categories):
+        mask = self._masks_by_label.get(inferred_categories)
+        if mask is None:
+            mask = 0
+            for category in inferred_categories.split(', '):
+                if category != "Unknown":
+                    mask |= 1 << self._category_bit(category)
+            self._masks_by_label[inferred_categories] = mask
+            self._labels_by_mask.setdefault(mask, inferred_categories)
+        return mask
+
+    def category_labels(self, category_mask):
+        """Return the comma-joined category names for `category_mask`, as triage reports them."""
+        labels = self._labels_by_mask.get(category_mask)
+        if labels is None:
+            labels = ", ".join([category for bit, category in enumerate(self.categories)
+                                if category_mask >> bit & 1]) or "Unknown"
+            self._labels_by_mask[category_mask] = labels
+        return labels
+
+    def _translated_codes(self, other):
+        """Return `other`'s category masks and action codes re-encoded against these tables."""
+        category_bits = [self._category_bit(category) for category in other.categories]
+        action_codes = [self._action_code(action) for action in other.actions]
+        category_mask, action = other.category_mask, other.action
+        if category_bits != list(range(len(category_bits))):
+            # Few distinct masks occur, so each is translated once. The
+            # translated masks render in `other`'s category order, as triage
+            # under its rules would join them.
+            translated = {mask: sum(1 << category_bits[bit] for bit in range(len(category_bits)) if mask >> bit & 1)
+                          for mask in set(category_mask)}
+            for mask, own_mask in translated.items():
+                self._labels_by_mask[own_mask] = other.category_labels(mask)
+            category_mask = array('q', map(translated.__getitem__, category_mask))
+        if action_codes != list(range(len(action_codes))):
+            action = array('h', map(action_codes.__getitem__, action))
+        return category_mask, action
+
+    def extend(self, other):
+        """Append the rows of `other`, translating its codes if its tables differ."""
+        category_mask, action = self._translated_codes(other)
+        self.numbers.extend(other.numbers)
+        self.descriptions.extend(other.descriptions)
+        self.severity.extend(other.severity)
+        self.category_mask.extend(category_mask)
+        self.action.extend(action)
+
+    def relabel(self, start, other):
+        """Overwrite the labels of rows start, start + 1, ... with those of `other` (a re-triage of them)."""
+        category_mask, action = self._translated_codes(other)
+        stop = start + len(other)
+        self.severity[start:stop] = other.severity
+        self.category_mask[start:stop] = category_mask
+        self.action[start:stop] = action
+
+    def slice(self, start, stop):
+        """Return rows start..stop - 1 as IncidentColumns with the same code tables."""
+        part = IncidentColumns(self.categories, self.actions)
+        part.numbers = self.numbers[start:stop]
+        part.descriptions = self.descriptions[start:stop]
+        part.severity = self.severity[start:stop]
+        part.category_mask = self.category_mask[start:stop]
+        part.action = self.action[start:stop]
+        return part
+
+    def renumber(self, first_number):
+        """Number the rows first_number, first_number + 1, ... (their INC-nnn IDs)."""
+        self.numbers = array('q', range(first_number, first_number + len(self)))
+
+    def report_id(self, index):
+        return f"INC-{self.numbers[index]:03d}"
+
+    def row(self, index):
+        """Return row `index` as a tuple of INCIDENT_FIELDS values."""
+        return (self.report_id(index), self.descriptions[index], SEVERITY_LEVELS[self.severity[index]],
+                self.category_labels(self.category_mask[index]), self.actions[self.action[index]])
+
+    def rows(self):
+        return map(self.row, range(len(self)))
+
+    def records(self):
+        """Return the incidents as dicts, like automated_incident_triage."""
+        return [dict(zip(INCIDENT_FIELDS, row)) for row in self.rows()]
+
+    def severity_counts(self):
+        """Return {severity: count} for the severities present."""
+        if not self:
+            return {}
+        counts = np.bincount(np.frombuffer(self.severity, dtype=np.int8), minlength=len(SEVERITY_LEVELS))
+        return {level: int(count) for level, count in zip(SEVERITY_LEVELS, counts) if count}
+
+    def label_selections(self, first=0, stop=None):
+        """Return [(('severity' or 'category', label), boolean array)] over rows first..stop - 1, one per label."""
+        severity = np.frombuffer(self.severity, dtype=np.int8)[first:stop]
+        masks = np.frombuffer(self.category_mask, dtype=np.int64)[first:stop]
+        selections = [(('severity', level), severity == code) for code, level in enumerate(SEVERITY_LEVELS)]
+        selections += [(('category', category), masks & (1 << bit) != 0)
+                       for bit, category in enumerate(self.categories)]
+        selections.append((('category', "Unknown"), masks == 0))
+        return selections
+
+    def label_counts(self):
+        """Return the same Counter as count_incident_labels(self.records())."""
+        counts = Counter({('severity', level): count for level, count in self.severity_counts().items()})
+        if not self:
+            return counts
+        masks = np.frombuffer(self.category_mask, dtype=np.int64)
+        for bit, category in enumerate(self.categories):
+            count = int(np.count_nonzero(masks & (1 << bit)))
+            if count:
+                counts['category', category] += count
+        unknown = int(np.count_nonzero(masks == 0))
+        if unknown:
+            counts['category', "Unknown"] += unknown
+        return counts
@@ -0,0 +1,44 @@
+"""Shared fixtures: the app imported against throwaway databases, and each store backend in turn."""
+import os
+import sys
+import tempfile
+
+_workdir = tempfile.mkdtemp(prefix='rih-tests-')
+os.environ.setdefault('INCIDENT_DB_PATH', os.path.join(_workdir, 'incidents.sqlite3'))
+os.environ.setdefault('RISK_DB_PATH', os.path.join(_workdir, 'risks.sqlite3'))
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+# The benchmarks' seeded data generators and reference implementations double as test inputs.
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'benchmarks'))
+
+import pytest
+
+import app as hub
+import storage
+
+
+@pytest.fixture
+def client():
+    hub.app.config['TESTING'] = True
+    return hub.app.test_client()
+
+
+@pytest.fixture(params=['memory', 'sqlite'])
+def incident_store(request, tmp_path, monkeypatch):
+    """A fresh incident repository of each backend, installed as the app's."""
+    if request.param == 'memory':
+        repository = storage.InMemoryIncidentRepository()
+    else:
+        repository = storage.SQLiteIncidentRepository(str(tmp_path / 'incidents.sqlite3'))
+    monkeypatch.setattr(storage, 'incident_repository', repository)
+    return repository
+
+
+@pytest.fixture(params=['memory', 'sqlite'])
+def risk_store(request, tmp_path, monkeypatch):
+    """A fresh risk repository of each backend, installed as the app's."""
+    if request.param == 'memory':
+        repository = storage.InMemoryRiskRepository()
+    else:
+        repository = storage.SQLiteRiskRepository(str(tmp_path / 'risks.sqlite3'))
+    monkeypatch.setattr(storage, 'risk_repository', repository)
+    return repository
@@ -0,0 +1,99 @@
+"""Parity of the plain-Python and vectorised aggregation paths."""
+import math
+import random
+from collections import Counter
+
+import pytest
+
+import benchmarking
+import figures
+import storage
+import triage
+from synthetic import synthetic_benchmark_table, synthetic_reports
+
+
+def same_values(a, b):
+    a, b = [float(x) for x in a], [float(x) for x in b]
+    return len(a) == len(b) and all(x == y or (math.isnan(x) and math.isnan(y)) for x, y in zip(a, b))
+
+
+def comparison_inputs(count, seed):
+    """Random rows over every industry/metric ID plus unknown (-1) IDs and missing values."""
+    rng = random.Random(seed)
+    index = benchmarking.benchmark_index()
+    rows = []
+    for _ in range(count):
+        industry_id = rng.randrange(-1, len(index.industries))
+        metric_id = rng.randrange(-1, len(index.metrics))
+        pair = index._pairs.get((industry_id, metric_id))
+        value = float('nan') if rng.random() < 0.02 else round((pair[0] if pair else 1.0) * rng.uniform(0.5, 1.5), 2)
+        if pair and rng.random() < 0.05:
+            value = pair[0]
+        rows.append((industry_id, metric_id, value))
+    return [list(column) for column in zip(*rows)]
+
+
+@pytest.fixture
+def vector_threshold(monkeypatch):
+    """Set BENCHMARK_VECTOR_THRESHOLD for the test, with a cold figure cache."""
+    def force(threshold):
+        monkeypatch.setattr(benchmarking, 'BENCHMARK_VECTOR_THRESHOLD', threshold)
+        figures.figure_cache.clear()
+    return force
+
+
+def test_compare_parity_over_every_pair():
+    index = benchmarking.benchmark_index()
+    pairs = [(i, m) for i in range(-1, len(index.industries)) for m in range(-1, len(index.metrics))]
+    inputs = [[i for i, _ in pairs], [m for _, m in pairs], [1.0] * len(pairs)]
+    rows = index.compare(*inputs, vectorised=False)
+    vector = index.compare(*inputs, vectorised=True)
+    assert rows.keys() == vector.keys()
+    for key in vector:
+        assert same_values(rows[key], vector[key]), key
+
+
+@pytest.mark.parametrize("seed", [0, 1])
+def test_compare_parity_on_random_rows(seed):
+    index = benchmarking.benchmark_index()
+    inputs = comparison_inputs(5000, seed)
+    rows = index.compare(*inputs, vectorised=False)
+    vector = index.compare(*inputs, vectorised=True)
+    for key in vector:
+        assert same_values(rows[key], vector[key]), key
+
+
+def test_bulk_benchmark_parity(vector_threshold):
+    table = synthetic_benchmark_table(3, 2, seed=0)
+    outputs = []
+    for threshold in (0, 10 ** 9):
+        vector_threshold(threshold)
+        outputs.append(benchmarking.bulk_benchmark(table))
+    (vector, vector_summary), (rows, rows_summary) = outputs
+    assert vector.equals(rows)
+    assert vector_summary == rows_summary
+
+
+@pytest.mark.parametrize("form", [
+    *({'industry': industry, **{field: str(round(random.Random(n).uniform(0.5, 150), 2))
+                                for n, field in enumerate(benchmarking.METRIC_FORM_FIELDS.values())}}
+      for industry in benchmarking.BENCHMARKS),
+    {'industry': 'Manufacturing', 'oee': '85', 'defect_rate': ''},
+], ids=lambda form: form['industry'])
+def test_benchmarking_page_parity(client, vector_threshold, form):
+    pages = []
+    for threshold in (0, 10 ** 9):
+        vector_threshold(threshold)
+        pages.append(client.post('/benchmarking', data=form).get_data(as_text=True))
+    assert pages[0] == pages[1]
+
+
+def test_count_incident_labels_matches_index_keys():
+    incidents = triage.automated_incident_triage(synthetic_reports(5000, seed=0), 0)
+    expected = Counter(key for incident in incidents for key in storage.incident_index_keys(incident))
+    assert storage.count_incident_labels(incidents) == expected
+
+
+def test_incident_columns_label_counts_match_records():
+    columns = triage.triage_batch(synthetic_reports(2000, seed=1), 0)
+    assert columns.label_counts() == storage.count_incident_labels(columns.records())
@@ -0,0 +1,102 @@
+import io
+import json
+
+import numpy as np
+import pytest
+
+import dedup
+import ingest
+
+DAY = 86400
+
+REPORTS = [
+    "Hydraulic pump on line 3 leaked oil during the night shift after a seal failure.",
+    "Forklift collided with a storage rack in the north warehouse, no injuries reported.",
+    "hydraulic pump on line 3 leaked oil during the night shift after a seal failure!!",
+    "Server room temperature alarm triggered after the cooling unit tripped.",
+    "Hydraulic pump on line 3 leaked oil during the night shift after seal failure.",
+]
+
+
+@pytest.mark.parametrize("threshold, permutations", [(0.8, 64), (0.5, 64), (0.9, 128)])
+def test_lsh_bands_reach_the_recall_target(threshold, permutations):
+    bands, rows = dedup.lsh_bands(threshold, permutations)
+    assert bands * rows <= permutations
+    assert 1 - (1 - threshold ** rows) ** bands >= 0.95
+
+
+def test_signatures_ignore_case_punctuation_and_spacing():
+    index = dedup.NearDuplicateIndex()
+    signatures = index.signatures(["Pump  leak, line 3!", "pump leak line 3", "Conveyor belt jammed"])
+    assert signatures.shape == (3, dedup.INCIDENT_DEDUP_PERMUTATIONS)
+    assert (signatures[0] == signatures[1]).all()
+    assert not (signatures[0] == signatures[2]).all()
+
+
+def test_add_points_near_duplicates_at_their_first_report():
+    index = dedup.NearDuplicateIndex()
+    assert index.add(REPORTS[:2]).tolist() == [-1, -1]
+    assert index.add(REPORTS[2:]).tolist() == [0, -1, 0]
+    assert index.size == 3
+    # Later calls see earlier ones; distinct reports are never merged.
+    assert index.add([REPORTS[1].upper(), "Quarterly fire drill completed."]).tolist() == [1, -1]
+
+
+def test_add_numbers_reports_kept_within_one_call():
+    index = dedup.NearDuplicateIndex()
+    forklift = REPORTS[1].upper()
+    assert index.add([REPORTS[0], REPORTS[1], REPORTS[2], REPORTS[3], forklift]).tolist() == [-1, -1, 0, -1, 1]
+    assert index.size == 3
+    assert index.add([REPORTS[3].lower(), REPORTS[4]]).tolist() == [2, 0]
+
+
+def test_add_keeps_buckets_apart():
+    index = dedup.NearDuplicateIndex()
+    duplicate_of = index.add([REPORTS[0], REPORTS[2], REPORTS[4]], buckets=[0, DAY, 0])
+    assert duplicate_of.tolist() == [-1, -1, 0]
+    assert index.add([REPORTS[2]], buckets=[DAY]).tolist() == [1]
+
+
+def test_add_survives_run_merges():
+    index = dedup.NearDuplicateIndex()
+    rng = np.random.default_rng(0)
+    words = np.array("pump valve boiler leak fire alarm crane shift night line unit seal belt motor fan".split())
+    reports = [" ".join(rng.choice(words, size=12)) for _ in range(3000)]
+    for start in range(0, len(reports), 100):
+        assert (index.add(reports[start:start + 100]) < 0).all()
+    assert index.size == len(reports)
+    assert index.add(reports[::500]).tolist() == list(range(0, 3000, 500))
+    assert len(index._runs) < 12
+
+
+def test_threshold_is_validated():
+    with pytest.raises(ValueError):
+        dedup.NearDuplicateIndex(threshold=0)
+
+
+def _upload(lines):
+    return io.BytesIO("\n".join(json.dumps(line) for line in lines).encode())
+
+
+@pytest.mark.parametrize("mode, stored", [('off', 5), ('flag', 5), ('merge', 4)])
+def test_ingest_dedup_modes(incident_store, monkeypatch, mode, stored):
+    monkeypatch.setattr(ingest, 'INCIDENT_DEDUP', mode)
+    day = 1773792000
+    lines = [{"description": REPORTS[0], "occurred_at": day},
+             {"description": REPORTS[1], "occurred_at": day},
+             {"description": REPORTS[2], "occurred_at": day + 3600},
+             # The same event reported on another day is a new incident.
+             {"description": REPORTS[0], "occurred_at": day + DAY},
+             {"description": REPORTS[3]}]
+    stats = ingest.ingest_incident_lines('s', io.TextIOWrapper(_upload(lines)), '.jsonl', batch_size=2)
+    assert stats['reports'] == stored == incident_store.count('s')
+    if mode == 'off':
+        assert stats['duplicates'] == 0 and stats['largest_clusters'] == []
+    else:
+        assert stats['duplicates'] == 1 and stats['clusters'] == 1
+        first = next(incident_store.iter_all('s'))
+        assert stats['largest_clusters'] == [{'report_id': first['Report_ID'], 'duplicates': 1}]
+
+
+def test_dedup_is_off_by_default():
+    assert dedup.INCIDENT_DEDUP == 'off'
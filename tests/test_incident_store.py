@@ -0,0 +1,154 @@
+"""Behaviour shared by both incident store backends: counting, filtering and cursor pagination."""
+import threading
+
+import pytest
+
+import storage
+import triage
+from synthetic import synthetic_reports
+
+
+@pytest.fixture
+def filled_store(incident_store):
+    """Two stores, the first filled in three appends of synthetic incidents."""
+    reports = synthetic_reports(600, seed=4)
+    for start in range(0, 600, 250):
+        incident_store.append('s', triage.triage_batch(reports[start:start + 250], start))
+    incident_store.append('other', triage.triage_batch(["Power loss in server room"], 0))
+    return incident_store
+
+
+def walk(store, limit, **filters):
+    """Read every matching incident a page at a time through split_page cursors."""
+    seen, after = [], None
+    while True:
+        page, cursor = storage.split_page(store.query('s', after=after, limit=limit + 1, **filters), limit,
+                                      storage.incident_cursor)
+        seen.extend(page)
+        if cursor is None:
+            return seen
+        after = int(cursor)
+
+
+def test_count_and_aggregates(filled_store):
+    incidents = list(filled_store.iter_all('s'))
+    assert filled_store.count('s') == len(incidents) == 600
+    assert filled_store.count('other') == 1
+    assert filled_store.count('missing') == 0
+    expected = storage._split_label_counts(storage.count_incident_labels(incidents))
+    assert filled_store.aggregates('s') == expected
+    assert [incident["seq"] for incident in incidents] == list(range(1, 601))
+    assert [incident["Report_ID"] for incident in incidents[:2]] == ["INC-001", "INC-002"]
+
+
+@pytest.mark.parametrize("limit", [1, 7, 600, 1000])
+def test_cursor_pages_cover_the_store_once(filled_store, limit):
+    assert [incident["seq"] for incident in walk(filled_store, limit)] == list(range(1, 601))
+
+
+def test_descending_pages(filled_store):
+    page = filled_store.query('s', descending=True, limit=3)
+    assert [incident["seq"] for incident in page] == [600, 599, 598]
+    page = filled_store.query('s', descending=True, after=598, limit=3)
+    assert [incident["seq"] for incident in page] == [597, 596, 595]
+
+
+@pytest.mark.parametrize("filters", [
+    {'severity': 'High'},
+    {'category': 'Equipment Failure'},
+    {'severity': 'Low', 'category': 'Human Error'},
+])
+def test_filtered_pages_match_a_scan(filled_store, filters):
+    def matches(incident):
+        keys = set(storage.incident_index_keys(incident))
+        return all((kind, label) in keys for kind, label in filters.items())
+
+    expected = [incident["seq"] for incident in filled_store.iter_all('s') if matches(incident)]
+    assert expected
+    assert [incident["seq"] for incident in walk(filled_store, 25, **filters)] == expected
+
+
+def test_time_range(filled_store):
+    recorded = [incident["recorded_at"] for incident in filled_store.iter_all('s')]
+    assert recorded == sorted(recorded)
+    since, until = recorded[250], recorded[500]
+    page = filled_store.query('s', since=since, until=until, limit=1000)
+    assert [incident["seq"] for incident in page] == [seq for seq, moment in enumerate(recorded, 1)
+                                                      if since <= moment < until]
+    assert filled_store.query('s', until=recorded[0], limit=10) == []
+
+
+def test_retriage_updates_counts_and_filters(filled_store):
+    matcher = triage.triage_rules().compiled(dict(triage.DEFAULT_TRIAGE_RULES, high_severity=['the']))
+    before = list(filled_store.iter_all('s'))
+    changed = filled_store.retriage('s', 101, 400, matcher)
+    incidents = list(filled_store.iter_all('s'))
+    labels = [(incident["Inferred_Categories"], incident["Severity"], incident["Suggested_Action"])
+              for incident in incidents]
+    assert labels[100:400] == [matcher.triage(incident["Description"]) for incident in before[100:400]]
+    assert incidents[:100] == before[:100] and incidents[400:] == before[400:]
+    assert changed == sum(old != new for old, new in zip(before, incidents))
+    assert filled_store.aggregates('s') == storage._split_label_counts(storage.count_incident_labels(incidents))
+    for kind, label in [('severity', 'High'), ('severity', 'Medium'), ('category', 'Equipment Failure'),
+                        ('category', 'Unknown')]:
+        expected = [incident["seq"] for incident in incidents if (kind, label) in storage.incident_index_keys(incident)]
+        assert [incident["seq"] for incident in walk(filled_store, 50, **{kind: label})] == expected
+
+
+def test_clear(filled_store):
+    filled_store.clear('s')
+    assert filled_store.count('s') == 0
+    assert filled_store.query('s') == []
+    assert filled_store.aggregates('s') == {'severity': {}, 'category': {}}
+    assert filled_store.count('other') == 1
+
+
+def test_api_pages(client, incident_store):
+    reports = [f"Minor leak number {number}" for number in range(12)]
+    client.post('/', data={'incident_description': 'warm-up'})
+    with client.session_transaction() as session:
+        store_id = session.get('incident_store_id')
+    incident_store.append(store_id, triage.triage_batch(reports, incident_store.count(store_id)))
+
+    seen, cursor = [], None
+    while True:
+        response = client.get('/api/incidents', query_string={'limit': 5, **({'cursor': cursor} if cursor else {})})
+        body = response.get_json()
+        seen.extend(incident["Description"] for incident in body["incidents"])
+        cursor = body["next_cursor"]
+        if cursor is None:
+            break
+    assert seen == ['warm-up'] + reports
+    newest = client.get('/api/incidents', query_string={'sort': '-recorded_at', 'limit': 2}).get_json()
+    assert [incident["Description"] for incident in newest["incidents"]] == reports[-1:-3:-1]
+    assert client.get('/api/incidents?cursor=abc').status_code == 400
+    assert client.get('/api/incidents?severity=Urgent').status_code == 400
+
+
+def test_concurrent_appends_get_distinct_report_ids(incident_store):
+    batches = [triage.triage_batch([f"Pump leak {thread}-{number}" for number in range(50)], 0) for thread in range(8)]
+    start = threading.Barrier(len(batches))
+
+    def append(batch):
+        start.wait()
+        incident_store.append('s', batch)
+
+    threads = [threading.Thread(target=append, args=(batch,)) for batch in batches]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    stored = {incident["Report_ID"]: incident["Description"] for incident in incident_store.iter_all('s')}
+    assert sorted(stored) == [f"INC-{number:03d}" for number in range(1, 401)]
+    # Each caller's batch was renumbered to the IDs it was stored under.
+    for batch in batches:
+        assert all(stored[batch.report_id(index)] == batch.descriptions[index] for index in range(len(batch)))
+
+
+def test_sqlite_store_reopens_with_its_data(tmp_path):
+    path = str(tmp_path / 'incidents.sqlite3')
+    storage.SQLiteIncidentRepository(path).append('s', triage.triage_batch(["Pump leak", "Fire alarm"], 0), [1e9, None])
+    reopened = storage.SQLiteIncidentRepository(path)
+    assert reopened.count('s') == 2
+    assert [incident["occurred_at"] for incident in reopened.iter_all('s')][0] == 1e9
+    assert sum(reopened.aggregates('s')['severity'].values()) == 2
@@ -0,0 +1,58 @@
+import io
+
+import pytest
+
+import ingest
+import jobs
+
+
+def reports(text, upload_format, skipped=None):
+    return list(ingest.iter_incident_reports(io.StringIO(text), upload_format, skipped))
+
+
+def test_txt_and_csv_reports():
+    assert reports("Pump leak\n\n  Fire alarm  \n", '.txt') == [("Pump leak", None), ("Fire alarm", None)]
+    text = "Description,Timestamp\nPump leak,1700000000\n,1700000000\nFire alarm,\n"
+    assert reports(text, '.csv') == [("Pump leak", 1700000000.0), ("Fire alarm", None)]
+    with pytest.raises(ValueError):
+        reports("summary\nPump leak\n", '.csv')
+
+
+def test_jsonl_skips_lines_that_are_not_objects():
+    skipped = []
+    text = '{"description": "Pump leak"}\n[1, 2]\n"text"\n42\nnull\n\n{"description": "Fire alarm", "time": 5}\n'
+    assert reports(text, '.jsonl', lambda: skipped.append(1)) == [("Pump leak", None), ("Fire alarm", 5.0)]
+    assert len(skipped) == 4
+
+
+def test_jsonl_errors():
+    with pytest.raises(ValueError):
+        reports('{"description": "Pump leak"\n', '.jsonl')
+    with pytest.raises(ValueError):
+        reports('{"summary": "Pump leak"}\n', '.jsonl')
+
+
+def test_ingest_counts_skipped_lines(incident_store):
+    lines = io.StringIO('{"description": "Pump leak"}\n[1]\n7\n{"description": "Fire alarm"}\n')
+    stats = ingest.ingest_incident_lines('s', lines, '.jsonl')
+    assert (stats['lines'], stats['skipped'], stats['reports']) == (4, 2, 2)
+    assert incident_store.count('s') == 2
+
+
+def test_upload_reports_skipped_lines(client, incident_store):
+    upload = io.BytesIO(b'{"description": "Pump leak"}\n["Fire alarm"]\n')
+    client.post('/upload_incidents', data={'incident_file': (upload, 'incidents.jsonl')})
+    with client.session_transaction() as session:
+        assert session['last_ingest']['skipped'] == 1
+        assert session['last_ingest']['reports'] == 1
+    assert 'held no report object' in client.get('/').get_data(as_text=True)
+
+
+def test_queued_events_name_the_job_kind():
+    upload = jobs.IngestJob('s', 'reports.txt', '.txt', '/nonexistent')
+    retriage = jobs.RetriageJob('s')
+    assert {key: upload.events[0][key] for key in ('event', 'kind', 'filename')} == {
+        'event': 'queued', 'kind': 'ingest', 'filename': 'reports.txt'}
+    assert retriage.events[0] == {'event': 'queued', 'job_id': retriage.id, 'kind': 'retriage'}
+    assert upload.snapshot()['filename'] == 'reports.txt'
+    assert 'filename' not in retriage.snapshot() and retriage.snapshot()['kind'] == 'retriage'
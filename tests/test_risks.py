@@ -0,0 +1,123 @@
+import io
+import json
+
+import pandas as pd
+import pytest
+
+import app as hub
+import risks
+import storage
+from synthetic import synthetic_risk_register
+
+
+def test_score_risk_register_skips_missing_names_and_labels():
+    register = pd.DataFrame([
+        {"Risk Name": "Pump failure", "Likelihood": "Likely", "Impact": "Major"},
+        {"Risk Name": None, "Likelihood": "Likely", "Impact": "Major"},
+        {"Likelihood": "Rare", "Impact": "Minor"},
+        {"Risk Name": "  ", "Likelihood": "Rare", "Impact": "Minor"},
+        {"Risk Name": "Bad label", "Likelihood": "Sometimes", "Impact": None},
+    ])
+    scored, skipped = risks.score_risk_register(register)
+    assert skipped == 4
+    assert scored["Risk Name"].tolist() == ["Pump failure"]
+    assert scored["Score"].tolist() == [risks.calculate_risk_score("Likely", "Major")]
+
+
+def test_import_with_nameless_rows_counts_them_skipped(client, risk_store):
+    rows = [{"Risk Name": "Boiler leak", "Likelihood": "Possible", "Impact": "Moderate"},
+            {"Likelihood": "Rare", "Impact": "Minor"},
+            {"Risk Name": None, "Likelihood": "Rare", "Impact": "Minor"}]
+    upload = "\n".join(json.dumps(row) for row in rows).encode()
+    response = client.post('/risk_navigator/import', data={'risk_register': (io.BytesIO(upload), 'register.jsonl')})
+    assert response.status_code == 302
+
+    response = client.post('/risk_navigator/import', json=rows)
+    assert response.status_code == 200
+    assert response.get_json()["imported"] == 1
+    assert response.get_json()["skipped"] == 2
+
+    listing = client.get('/api/risks')
+    assert listing.status_code == 200
+    assert [risk["Risk Name"] for risk in json.loads(listing.get_data())["risks"]] == ["Boiler leak"] * 2
+
+
+@pytest.fixture
+def filled_risks(risk_store):
+    scored, _ = risks.score_risk_register(synthetic_risk_register(400, seed=2))
+    for start in range(0, 400, 150):
+        risks.store_scored_risks('r', scored.iloc[start:start + 150])
+    return list(risk_store.iter_all('r'))
+
+
+def walk_risks(limit, **filters):
+    seen, cursor = [], None
+    while True:
+        page, next_cursor = storage.split_page(risks.query_risks('r', cursor=cursor, limit=limit + 1, **filters), limit,
+                                           lambda risk: risks.risk_cursor(risk, filters.get('sort', 'recorded_at')))
+        seen.extend(page)
+        if next_cursor is None:
+            return seen
+        cursor = tuple(int(part) for part in next_cursor.split(':'))
+
+
+def test_cell_counts(risk_store, filled_risks):
+    assert risk_store.count('r') == len(filled_risks) == 400
+    expected = {}
+    for risk in filled_risks:
+        cell = (risk["Likelihood"], risk["Impact"])
+        expected[cell] = expected.get(cell, 0) + 1
+    assert risk_store.cell_counts('r') == expected
+
+
+@pytest.mark.parametrize("sort, descending", [('recorded_at', False), ('recorded_at', True),
+                                              ('score', False), ('score', True)])
+@pytest.mark.parametrize("limit", [1, 9, 400])
+def test_risk_cursor_pages_follow_the_sort(filled_risks, sort, descending, limit):
+    key = (lambda risk: (risk["Score"], risk["seq"])) if sort == 'score' else (lambda risk: risk["seq"])
+    expected = [risk["seq"] for risk in sorted(filled_risks, key=key, reverse=descending)]
+    assert [risk["seq"] for risk in walk_risks(limit, sort=sort, descending=descending)] == expected
+
+
+def test_risk_filters(filled_risks):
+    expected = [risk["seq"] for risk in sorted(filled_risks, key=lambda risk: (risk["Score"], risk["seq"]))
+                if risk["Priority"] == "High" and risk["Category"] == risks.HSHF_CATEGORY]
+    assert expected
+    pages = walk_risks(7, sort='score', priorities={"High"}, categories={risks.HSHF_CATEGORY})
+    assert [risk["seq"] for risk in pages] == expected
+
+
+def test_version_changes_on_append_and_clear(risk_store):
+    versions = [risk_store.version('r')]
+    risk_store.append('r', [("Pump failure", "Likely", "Major", 16, "High", risks.HSHF_CATEGORY)])
+    versions.append(risk_store.version('r'))
+    risk_store.clear('r')
+    versions.append(risk_store.version('r'))
+    risk_store.append('r', [("Roof leak", "Likely", "Major", 16, "High", risks.HSHF_CATEGORY)])
+    versions.append(risk_store.version('r'))
+    assert len(set(versions)) == 4
+    assert risk_store.count('r') == 1
+    assert risk_store.version('other') == 0
+
+
+def test_points_figure_follows_the_store(client, risk_store, monkeypatch):
+    monkeypatch.setattr(hub, 'RISK_MATRIX_MODE', 'points')
+    form = {'likelihood': 'Likely', 'impact': 'Major'}
+    client.post('/risk_navigator', data=dict(form, risk_name='Pump failure'))
+    assert 'Risk: Pump failure' in client.get('/risk_navigator').get_data(as_text=True)
+    client.post('/risk_navigator', data={'clear_all_risks': '1'})
+    client.post('/risk_navigator', data=dict(form, risk_name='Roof leak'))
+    page = client.get('/risk_navigator').get_data(as_text=True)
+    assert 'Risk: Roof leak' in page and 'Risk: Pump failure' not in page
+
+
+def test_api_risk_cursor_validation(client):
+    assert client.get('/api/risks?sort=score&cursor=12').status_code == 400
+    assert client.get('/api/risks?sort=score&cursor=12:3').status_code == 200
+    assert client.get('/api/risks?priority=Urgent').status_code == 400
+
+
+def test_sqlite_risk_store_has_only_risk_methods():
+    assert not issubclass(storage.SQLiteRiskRepository, storage.SQLiteIncidentRepository)
+    for name in ('query', 'retriage', 'aggregates', 'trend_counts'):
+        assert not hasattr(storage.SQLiteRiskRepository, name)
@@ -0,0 +1,138 @@
+import io
+import random
+from concurrent.futures import Future
+from concurrent.futures.process import BrokenProcessPool
+
+import pytest
+
+import pools
+import routines
+from synthetic import ROUTINE_STEPS, synthetic_cases
+
+
+def lcs_length(a, b):
+    previous = [0] * (len(b) + 1)
+    for x in a:
+        current = [0]
+        for j, y in enumerate(b):
+            current.append(previous[j] + 1 if x == y else max(previous[j + 1], current[j]))
+        previous = current
+    return previous[-1]
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_myers_pairs_are_a_longest_common_subsequence(seed):
+    rng = random.Random(seed)
+    a = [rng.randrange(5) for _ in range(rng.randrange(0, 30))]
+    b = [rng.randrange(5) for _ in range(rng.randrange(0, 30))]
+    pairs = routines._myers_matched_pairs(a, b)
+    assert all(a[i] == b[j] for i, j in pairs)
+    assert all(i1 < i2 and j1 < j2 for (i1, j1), (i2, j2) in zip(pairs, pairs[1:]))
+    assert len(pairs) == lcs_length(a, b)
+
+
+def test_myers_handles_empty_and_identical_sequences():
+    assert routines._myers_matched_pairs([], []) == []
+    assert routines._myers_matched_pairs([1, 2], []) == []
+    assert routines._myers_matched_pairs([1, 2, 3], [1, 2, 3]) == [(0, 0), (1, 1), (2, 2)]
+
+
+def test_conformance_buckets_every_step():
+    documented = ["Setup", "Verify", "Start", "Monitor", "Shutdown"]
+    performed = ["Setup", "Start", "Verify", "Monitor", "Call Supervisor"]
+    result = routines.check_routine_conformance(documented, performed)
+    assert result["followed"] == ["Setup", "Start", "Monitor"]
+    assert result["reordered"] == ["Verify"]
+    assert result["omitted"] == ["Shutdown"]
+    assert result["added"] == ["Call Supervisor"]
+    assert result["score"] == pytest.approx(2 * 3 / 10)
+    assert [row["Step_Number"] for row in result["alignment"]] == list(range(1, len(result["alignment"]) + 1))
+
+
+def test_conformance_of_identical_and_empty_routines():
+    assert routines.check_routine_conformance(ROUTINE_STEPS, ROUTINE_STEPS)["score"] == 1.0
+    assert routines.check_routine_conformance([], [])["score"] == 1.0
+    assert routines.check_routine_conformance(ROUTINE_STEPS, [])["omitted"] == ROUTINE_STEPS
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_conformance_accounts_for_every_step(seed):
+    for performed in synthetic_cases(ROUTINE_STEPS, 50, drift_rate=0.6, seed=seed):
+        result = routines.check_routine_conformance(ROUTINE_STEPS, performed)
+        assert len(result["followed"]) == lcs_length(ROUTINE_STEPS, performed)
+        documented_side = len(result["followed"]) + len(result["omitted"])
+        performed_side = len(result["followed"]) + len(result["added"])
+        reordered = len(result["reordered"])
+        assert documented_side + reordered == len(ROUTINE_STEPS)
+        assert performed_side + reordered == len(performed)
+
+
+def test_batch_conformance_matches_case_by_case():
+    cases = list(synthetic_cases(ROUTINE_STEPS, 200, seed=3))
+    summary = routines.batch_routine_conformance(ROUTINE_STEPS, iter(cases), max_workers=1, chunk_cases=32)
+    scores = [routines.check_routine_conformance(ROUTINE_STEPS, case)["score"] for case in cases]
+    assert summary["cases"] == len(cases)
+    assert summary["mean_score"] == pytest.approx(sum(scores) / len(scores))
+
+
+class _BreakingPool:
+    """Stands in for the process pool: runs `working` chunks, then reports the pool broken."""
+
+    def __init__(self, working):
+        self.working = working
+
+    def submit(self, func, *args):
+        future = Future()
+        if self.working:
+            self.working -= 1
+            future.set_result(func(*args))
+        else:
+            future.set_exception(BrokenProcessPool("worker died"))
+        return future
+
+
+@pytest.mark.parametrize("get_pool", [
+    lambda purpose, max_workers: _BreakingPool(working=0),
+    lambda purpose, max_workers: _BreakingPool(working=3),
+    lambda purpose, max_workers: (_ for _ in ()).throw(OSError("cannot start workers")),
+], ids=['broken', 'breaks-later', 'cannot-start'])
+def test_batch_conformance_falls_back_to_serial(monkeypatch, get_pool):
+    cases = list(synthetic_cases(ROUTINE_STEPS, 300, seed=5))
+    expected = routines.batch_routine_conformance(ROUTINE_STEPS, iter(cases), max_workers=1, chunk_cases=16)
+    monkeypatch.setattr(pools, 'get_process_pool', get_pool)
+    summary = routines.batch_routine_conformance(ROUTINE_STEPS, iter(cases), max_workers=2, chunk_cases=16)
+    assert summary == expected
+
+
+def test_process_pools_are_kept_per_purpose(monkeypatch):
+    monkeypatch.setattr(pools, '_process_pools', {})
+    monkeypatch.setattr(pools, '_process_pools_pid', None)
+    triage = pools.get_process_pool('triage', 2)
+    try:
+        conformance = pools.get_process_pool('conformance', 1)
+        assert conformance is not triage
+        assert pools.get_process_pool('triage', 2) is triage
+        assert triage.submit(sum, [1, 2]).result() == 3
+        pools.reset_process_pool(conformance)
+        assert pools.get_process_pool('triage', 2) is triage
+    finally:
+        for pool in (triage, conformance):
+            pool.shutdown()
+
+
+def test_event_log_skips_jsonl_lines_that_are_not_objects():
+    skipped = []
+    lines = io.StringIO('[1]\n{"case": "a", "step": "x", "timestamp": "t1"}\n"text"\nnull\n'
+                        '{"case": "a", "step": "y", "timestamp": "t2"}\n')
+    events = list(routines.iter_event_log(lines, '.jsonl', lambda: skipped.append(1)))
+    assert events == [("a", "x", "t1"), ("a", "y", "t2")]
+    assert len(skipped) == 3
+
+
+def test_batch_routines_reports_skipped_lines(client):
+    upload = io.BytesIO(b'{"case":"a","step":"x"}\n[1]\n{"case":"a","step":"y"}\n42\n')
+    response = client.post('/routines/batch', data={'documented_routine': 'x, y',
+                                                    'event_log': (upload, 'events.jsonl')})
+    assert response.status_code == 200
+    body = response.get_json()
+    assert (body["cases"], body["conformant_cases"], body["skipped_lines"]) == (1, 1, 2)
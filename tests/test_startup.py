@@ -0,0 +1,36 @@
+import gc
+import os
+import subprocess
+import sys
+
+import startup
+
+SRC = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src')
+
+
+def test_import_builds_no_tables_and_freezes_nothing(tmp_path):
+    check = ("import gc, inspect, app, startup; assert gc.get_freeze_count() == 0; "
+             "print(sum(1 for get in startup._shared_tables if inspect.getclosurevars(get).nonlocals['built']))")
+    env = dict(os.environ, LAZY_IMPORTS='0', INCIDENT_DB_PATH=str(tmp_path / 'incidents.sqlite3'),
+               RISK_DB_PATH=str(tmp_path / 'risks.sqlite3'))
+    output = subprocess.run([sys.executable, '-c', check], cwd=SRC, env=env, capture_output=True, text=True)
+    assert output.returncode == 0, output.stderr
+    assert output.stdout.strip() == '0'
+
+
+def test_shared_tables_are_built_once():
+    first = [get() for get in startup._shared_tables]
+    assert [get() for get in startup._shared_tables] == first
+    assert all(a is b for a, b in zip(first, [get() for get in startup._shared_tables]))
+    assert gc.isenabled()
+
+
+def test_lazy_imports_serve_every_page(tmp_path):
+    check = ("import app; client = app.app.test_client(); "
+             "print([client.get(route).status_code for route in ('/api/incidents', '/', '/benchmarking', "
+             "'/risk_navigator')])")
+    env = dict(os.environ, LAZY_IMPORTS='1', INCIDENT_DB_PATH=str(tmp_path / 'incidents.sqlite3'),
+               RISK_DB_PATH=str(tmp_path / 'risks.sqlite3'))
+    output = subprocess.run([sys.executable, '-c', check], cwd=SRC, env=env, capture_output=True, text=True)
+    assert output.returncode == 0, output.stderr
+    assert output.stdout.strip() == '[200, 200, 200, 200]'
@@ -0,0 +1,102 @@
+import io
+import random
+from collections import Counter
+from datetime import datetime, timezone
+
+import pytest
+
+import app as hub
+import storage
+import trends
+import triage
+from synthetic import synthetic_reports
+
+DAY = 86400
+NOW = datetime(2026, 3, 18, 12, 30, tzinfo=timezone.utc).timestamp()
+
+
+@pytest.mark.parametrize("value, expected", [
+    ("1700000000", 1700000000.0),
+    (1700000000.5, 1700000000.5),
+    ("2024-01-02T03:04:05", datetime(2024, 1, 2, 3, 4, 5, tzinfo=timezone.utc).timestamp()),
+    ("2024-01-02T03:04:05+02:00", datetime(2024, 1, 2, 1, 4, 5, tzinfo=timezone.utc).timestamp()),
+])
+def test_parse_timestamp(value, expected):
+    assert trends.parse_timestamp(value) == expected
+
+
+@pytest.mark.parametrize("value", ["1700000000000", -1e15, "nan", "inf", "yesterday", None, {}])
+def test_parse_timestamp_rejects_unrepresentable_values(value):
+    with pytest.raises(ValueError):
+        trends.parse_timestamp(value)
+
+
+def test_api_time_tolerates_out_of_range_values():
+    assert hub._api_time(0) == "1970-01-01T00:00:00+00:00"
+    assert hub._api_time(1700000000000) is None
+
+
+def test_upload_with_millisecond_times_is_rejected(client, incident_store):
+    upload = b"description,timestamp\nPump leak,1700000000\nValve leak,1700000000000\n"
+    client.post('/upload_incidents', data={'incident_file': (io.BytesIO(upload), 'incidents.csv')})
+    with client.session_transaction() as session:
+        assert 'Invalid occurrence time' in session['last_ingest']['error']
+    assert client.get('/api/incidents').status_code == 200
+
+
+def test_trend_bucket_weeks_start_on_monday():
+    monday = datetime(2026, 3, 16, tzinfo=timezone.utc).timestamp()
+    assert storage.trend_bucket(NOW, 'week') == monday
+    assert storage.trend_bucket(NOW, 'day') == monday + 2 * DAY
+    assert storage.trend_bucket(NOW, 'hour') == NOW - 30 * 60
+
+
+def test_rollups_follow_appends_and_retriage(incident_store):
+    reports = ["Critical pump failure", "Minor valve leak", "Operator skipped procedure"]
+    times = [NOW - 2 * DAY, NOW - DAY, None]
+    incident_store.append('s', triage.triage_batch(reports, 0), times)
+    result = trends.incident_trends('s', 'day', until=NOW)
+    assert len(result['buckets']) == trends.TREND_DEFAULT_BUCKETS['day']
+    assert result['severity']['High'][-3:] == [1, 0, 0]
+    assert result['severity']['Low'][-3:] == [0, 1, 0]
+    # The third incident had no time, so it occurred when it was recorded (now, not NOW).
+    assert sum(sum(series) for series in result['severity'].values()) == 2
+
+    matcher = triage.triage_rules().compiled(dict(triage.DEFAULT_TRIAGE_RULES, high_severity=['leak']))
+    assert incident_store.retriage('s', 1, 3, matcher) >= 1
+    result = trends.incident_trends('s', 'day', until=NOW)
+    assert result['severity']['High'][-3:] == [0, 1, 0]
+    assert result['severity']['Medium'][-3:] == [1, 0, 0]
+
+
+@pytest.mark.parametrize("resolution", sorted(storage.TREND_RESOLUTIONS))
+def test_rollups_match_a_scan_of_the_incidents(incident_store, resolution):
+    rng = random.Random(6)
+    reports = synthetic_reports(1200, seed=6)
+    for start in range(0, len(reports), 500):
+        batch = reports[start:start + 500]
+        incident_store.append('s', triage.triage_batch(batch, 0), [NOW - rng.uniform(0, 60 * DAY) for _ in batch])
+    result = trends.incident_trends('s', resolution, since=NOW - 60 * DAY, until=NOW)
+
+    first, width = result['buckets'][0], storage.TREND_RESOLUTIONS[resolution][0]
+    scanned = Counter()
+    for incident in incident_store.iter_all('s'):
+        index = (storage.trend_bucket(incident["occurred_at"], resolution) - first) // width
+        for kind, label in storage.incident_index_keys(incident):
+            scanned[kind, label, index] += 1
+    rolled_up = Counter({(kind, label, index): count for kind in ('severity', 'category')
+                         for label, series in result[kind].items() for index, count in enumerate(series) if count})
+    assert rolled_up == scanned
+
+
+def test_detect_spikes():
+    quiet = [1, 0, 2, 1, 1, 0, 1, 2, 1, 1, 0, 1, 1, 2]
+    assert trends.detect_spikes(quiet + [12], window=len(quiet)) == [len(quiet)]
+    assert trends.detect_spikes(quiet + [3], window=len(quiet)) == []
+    assert trends.detect_spikes([0] * 14 + [2], window=14) == []
+
+
+def test_trends_api(client, incident_store):
+    assert client.get('/api/incidents/trends?resolution=hour').get_json()['resolution'] == 'hour'
+    assert client.get('/api/incidents/trends?resolution=month').status_code == 400
+    assert client.get('/api/incidents/trends?since=1700000000000').status_code == 400
@@ -0,0 +1,17 @@
+import pytest
+
+import triage
+from bench_triage import legacy_incident_triage
+from synthetic import synthetic_reports
+
+
+def test_compiled_matcher_matches_the_legacy_loop():
+    reports = synthetic_reports(3000, keyword_rate=0.2, seed=7)
+    assert triage.automated_incident_triage(reports, 0) == legacy_incident_triage(reports, 0)
+
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_triage_batch_matches_serial_triage(workers):
+    reports = synthetic_reports(1000, seed=8)
+    result = triage.triage_batch(reports, 41, max_workers=workers, parallel_threshold=0)
+    assert result.records() == triage.automated_incident_triage(reports, 41)